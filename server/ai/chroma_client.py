@@ -5,13 +5,50 @@ Handles all vector database operations for the RAG system
 
 import chromadb
 from chromadb.config import Settings
+import numpy as np
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple, Union
+from functools import lru_cache
+from itertools import islice
 import os
 from pathlib import Path
 
+from config import settings
+from .vector_index import ExactIndex, PersistentEmbeddingMatrix
+
 logger = logging.getLogger(__name__)
 
+CHROMA_BATCH_SIZE = 200  # Embeddings per upsert call when writing in bulk
+
+# HNSW index settings: higher M for recall, lower search_ef for latency (see benchmark_hnsw.py)
+HNSW_SETTINGS = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 50,
+}
+
+def _embedding_tables():
+    """Database tables mirrored by each recommendation collection, as (model, vector column)"""
+    from models.embeddings import UserEmbedding, EventEmbedding, GroupEmbedding
+    return {
+        "users": (UserEmbedding, UserEmbedding.profile_embedding),
+        "events": (EventEmbedding, EventEmbedding.event_embedding),
+        "groups": (GroupEmbedding, GroupEmbedding.group_embedding),
+    }
+
+def _clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop None and empty-list values, which Chroma rejects in metadata"""
+    return {key: value for key, value in metadata.items() if value is not None and value != []}
+
+def _normalize(embedding: Union[List[float], np.ndarray]) -> List[float]:
+    """L2-normalize an embedding as float32 so cosine and L2 rankings agree"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector.tolist()
+
 class ChromaClient:
     """ChromaDB client for embedding storage and similarity search"""
     
@@ -20,6 +57,7 @@ class ChromaClient:
         # Create chroma data directory if it doesn't exist
         chroma_path = Path("./chroma_data")
         chroma_path.mkdir(exist_ok=True)
+        self.chroma_path = chroma_path
         
         # Initialize ChromaDB with persistent storage
         self.client = chromadb.PersistentClient(
@@ -31,21 +69,56 @@ class ChromaClient:
         )
         
         # Initialize collections
+        self.empty_collections = set()  # Holding nothing at startup: new, moved or rebuilt
+        self.resized_collections = set()  # Rebuilt for a new EMBEDDING_DIMENSIONS
         self._initialize_collections()
         
         logger.info("ChromaDB client initialized")
     
+    def _get_embedding_collection(self, name: str):
+        """Get or create a collection sized for the configured embedding dimensions"""
+        metadata = {"dimensions": settings.EMBEDDING_DIMENSIONS, **HNSW_SETTINGS}
+        collection = self.client.get_or_create_collection(name=name, metadata=metadata)
+        
+        # Index size and HNSW settings are fixed at creation - rebuild; mirror_database_embeddings refills it
+        current = collection.metadata or {}
+        if any(current.get(key) != value for key, value in metadata.items()):
+            logger.warning(f"Recreating ChromaDB collection '{name}' with {metadata}")
+            self.client.delete_collection(name=name)
+            collection = self.client.create_collection(name=name, metadata=metadata)
+            if current.get("dimensions") != settings.EMBEDDING_DIMENSIONS:
+                self.resized_collections.add(name)
+        
+        if not collection.count():
+            self.empty_collections.add(name)
+        
+        return collection
+    
     def _initialize_collections(self):
         """Initialize all required collections"""
         try:
             # Users collection for friend recommendations
-            self.users_collection = self.client.get_or_create_collection(name="users")
+            self.users_collection = self._get_embedding_collection("users")
             
             # Events collection for event recommendations
-            self.events_collection = self.client.get_or_create_collection(name="events")
+            self.events_collection = self._get_embedding_collection("events")
             
             # Groups collection for group analysis
-            self.groups_collection = self.client.get_or_create_collection(name="groups")
+            self.groups_collection = self._get_embedding_collection("groups")
+            
+            # Content-hash caches so unchanged text/images never hit OpenAI twice
+            self.embedding_cache_collection = self._get_embedding_collection("embedding_cache")
+            self.description_cache_collection = self.client.get_or_create_collection(name="image_description_cache")
+            
+            # Exact in-memory search for the recommendation collections (FAISS, or NumPy without it)
+            self.users_index = ExactIndex(self.users_collection, "user_id")
+            # Event vectors are also kept in a memory-mapped matrix so restarts don't rebuild it from Chroma
+            self.events_index = ExactIndex(
+                self.events_collection, "event_id",
+                store=PersistentEmbeddingMatrix(self.chroma_path, "events", settings.EMBEDDING_DIMENSIONS)
+            )
+            
+            self._warm_up()
             
             logger.info("All ChromaDB collections initialized successfully")
             
@@ -53,161 +126,337 @@ class ChromaClient:
             logger.error(f"Failed to initialize ChromaDB collections: {e}")
             raise
     
+    def mirror_database_embeddings(self):
+        """
+        Startup step: refill the recommendation collections that came up empty from the embedding
+        rows in the database. Rows whose vectors no longer fit a resized collection are deleted
+        instead, so backfill and the embedding tasks regenerate them
+        """
+        names = self.empty_collections & _embedding_tables().keys()
+        if not names:
+            return
+        
+        from database import SessionLocal
+        
+        db = SessionLocal()
+        try:
+            for name in sorted(names):
+                if name in self.resized_collections:
+                    self._drop_resized_embeddings(db, name)
+                mirrored = self._mirror_collection(db, name)
+                logger.info(f"Mirrored {mirrored} {name} embeddings from the database into ChromaDB")
+                self.empty_collections.discard(name)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to mirror database embeddings into {sorted(names)}: {e}")
+        finally:
+            db.close()
+    
+    def _drop_resized_embeddings(self, db, name: str):
+        """Delete embedding rows sized for the collection's old dimensions"""
+        model, column = _embedding_tables()[name]
+        stale_ids = [
+            row.id for row in db.query(model.id, column).yield_per(CHROMA_BATCH_SIZE)
+            if row[1] is None or len(row[1]) != settings.EMBEDDING_DIMENSIONS
+        ]
+        for start in range(0, len(stale_ids), CHROMA_BATCH_SIZE):
+            db.query(model).filter(model.id.in_(stale_ids[start:start + CHROMA_BATCH_SIZE])).delete(synchronize_session=False)
+        db.commit()
+        if stale_ids:
+            logger.warning(f"Deleted {len(stale_ids)} {name} embedding rows of the old size, for regeneration")
+    
+    def _mirror_collection(self, db, name: str) -> int:
+        """Upsert a collection's database rows of active entities, with the metadata the embedding tasks write"""
+        from models import User, Event, GroupChat
+        from models.embeddings import UserEmbedding, EventEmbedding, GroupEmbedding
+        
+        if name == "users":
+            query = db.query(UserEmbedding, User.username).join(User, User.id == UserEmbedding.user_id).filter(User.is_active == True)
+        elif name == "events":
+            query = db.query(EventEmbedding, Event).join(Event, Event.id == EventEmbedding.event_id).filter(Event.is_active == True)
+        else:
+            query = db.query(GroupEmbedding, GroupChat).join(GroupChat, GroupChat.id == GroupEmbedding.group_id).filter(GroupChat.is_active == True)
+        
+        # Rows without a vector of the configured size can't go into the collection
+        vector_key = _embedding_tables()[name][1].key
+        rows = (
+            row for row in query.yield_per(CHROMA_BATCH_SIZE)
+            if getattr(row[0], vector_key) is not None and len(getattr(row[0], vector_key)) == settings.EMBEDDING_DIMENSIONS
+        )
+        
+        mirrored = 0
+        while batch := list(islice(rows, CHROMA_BATCH_SIZE)):
+            if name == "users":
+                added = self.add_user_embedding_batch(
+                    [embedding.user_id for embedding, _ in batch],
+                    [embedding.profile_embedding for embedding, _ in batch],
+                    [embedding.message_embedding for embedding, _ in batch],
+                    [{"username": username} for _, username in batch]
+                )
+            elif name == "events":
+                added = self.add_event_embedding_batch(
+                    [event.id for _, event in batch],
+                    [embedding.event_embedding for embedding, _ in batch],
+                    [{
+                        "title": event.title,
+                        "location_name": event.location_name,
+                        "creator_id": event.creator_id,
+                        "visibility": event.visibility,
+                        "start_time": event.start_time.isoformat()
+                    } for _, event in batch]
+                )
+            else:
+                added = self.add_group_embedding_batch(
+                    [group.id for _, group in batch],
+                    [embedding.group_embedding for embedding, _ in batch],
+                    [{
+                        "group_name": group.name,
+                        "member_count": group.member_count,
+                        "group_interests": group.group_interests or []
+                    } for _, group in batch]
+                )
+            if added:
+                mirrored += len(batch)
+        return mirrored
+    
+    def _warm_up(self):
+        """Load index files into memory now so the first real query doesn't pay for it"""
+        try:
+            # Ask the OS to read the persisted segment files ahead of use
+            if hasattr(os, "posix_fadvise"):
+                for path in self.chroma_path.rglob("*"):
+                    if path.is_file():
+                        with open(path, "rb") as f:
+                            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            
+            # One throwaway query per collection forces its HNSW index to load
+            probe = [1.0] + [0.0] * (settings.EMBEDDING_DIMENSIONS - 1)
+            for collection in (self.users_collection, self.events_collection, self.groups_collection):
+                if collection.count():
+                    collection.query(query_embeddings=[probe], n_results=1)
+            
+            for index in (self.users_index, self.events_index):
+                if index:
+                    index.search([probe], 1)
+            
+            logger.debug("ChromaDB indexes warmed up")
+            
+        except Exception as e:
+            logger.warning(f"ChromaDB warm-up failed: {e}")
+    
+    def _upsert_chunked(self, collection, index: Optional[ExactIndex], prefix: str, entity_ids: List[int],
+                        embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        """Upsert normalized embeddings in chunks of CHROMA_BATCH_SIZE, mirroring them into the in-memory index"""
+        normalized = [_normalize(embedding) for embedding in embeddings]
+        metadatas = [_clean_metadata(metadata) for metadata in metadatas]
+        
+        for start in range(0, len(entity_ids), CHROMA_BATCH_SIZE):
+            end = start + CHROMA_BATCH_SIZE
+            collection.upsert(
+                ids=[f"{prefix}_{entity_id}" for entity_id in entity_ids[start:end]],
+                embeddings=normalized[start:end],
+                metadatas=metadatas[start:end]
+            )
+            if index:
+                index.upsert_batch(entity_ids[start:end], normalized[start:end], metadatas[start:end])
+    
     def add_user_embedding(self, user_id: int, profile_embedding: List[float], 
                           message_embedding: List[float], metadata: Dict[str, Any] = None) -> bool:
         """Add or update user embeddings (simplified for testing - uses only profile embedding)"""
+        return self.add_user_embedding_batch([user_id], [profile_embedding], [message_embedding], [metadata])
+    
+    def add_user_embedding_batch(self, user_ids: List[int], profile_embeddings: List[List[float]],
+                                 message_embeddings: List[List[float]],
+                                 metadatas: List[Optional[Dict[str, Any]]] = None) -> bool:
+        """Add or update many users' embeddings in batched upserts"""
         try:
-            # For testing: use only profile embedding (ignore message_embedding)
-            # This simplifies the system and removes dependency on message history
-            embedding_to_use = profile_embedding
-            
             # Prepare minimal metadata - interests should be in the embedding, not metadata
-            user_metadata = {
+            user_metadatas = [{
                 "user_id": user_id,
                 "type": "user",
                 "username": metadata.get("username", "") if metadata else ""
-            }
+            } for user_id, metadata in zip(user_ids, metadatas or [None] * len(user_ids))]
             
-            # Add to collection
-            self.users_collection.upsert(
-                ids=[f"user_{user_id}"],
-                embeddings=[embedding_to_use],
-                metadatas=[user_metadata]
-            )
+            # For testing: use only profile embedding (ignore message_embedding)
+            # This simplifies the system and removes dependency on message history
+            self._upsert_chunked(self.users_collection, self.users_index, "user",
+                                 user_ids, profile_embeddings, user_metadatas)
             
-            logger.debug(f"Added user embedding for user {user_id} (profile-only for testing)")
+            logger.debug(f"Added {len(user_ids)} user embeddings (profile-only for testing)")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to add user embedding for user {user_id}: {e}")
+            logger.error(f"Failed to add user embeddings for users {user_ids}: {e}")
             return False
     
     def add_event_embedding(self, event_id: int, event_embedding: List[float], 
                            metadata: Dict[str, Any] = None) -> bool:
         """Add event embedding"""
+        return self.add_event_embedding_batch([event_id], [event_embedding], [metadata])
+    
+    def add_event_embedding_batch(self, event_ids: List[int], event_embeddings: List[List[float]],
+                                  metadatas: List[Optional[Dict[str, Any]]] = None) -> bool:
+        """Add or update many event embeddings in batched upserts"""
         try:
             # Prepare metadata
-            event_metadata = {
+            event_metadatas = [{
                 "event_id": event_id,
                 "type": "event",
                 **(metadata or {})
-            }
+            } for event_id, metadata in zip(event_ids, metadatas or [None] * len(event_ids))]
             
-            # Add to collection
-            self.events_collection.upsert(
-                ids=[f"event_{event_id}"],
-                embeddings=[event_embedding],
-                metadatas=[event_metadata]
-            )
+            self._upsert_chunked(self.events_collection, self.events_index, "event",
+                                 event_ids, event_embeddings, event_metadatas)
             
-            logger.debug(f"Added event embedding for event {event_id}")
+            logger.debug(f"Added {len(event_ids)} event embeddings")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to add event embedding for event {event_id}: {e}")
+            logger.error(f"Failed to add event embeddings for events {event_ids}: {e}")
             return False
     
     def add_group_embedding(self, group_id: int, group_embedding: List[float], 
                            metadata: Dict[str, Any] = None) -> bool:
         """Add or update group embedding"""
+        return self.add_group_embedding_batch([group_id], [group_embedding], [metadata])
+    
+    def add_group_embedding_batch(self, group_ids: List[int], group_embeddings: List[List[float]],
+                                  metadatas: List[Optional[Dict[str, Any]]] = None) -> bool:
+        """Add or update many group embeddings in batched upserts"""
         try:
             # Prepare metadata
-            group_metadata = {
+            group_metadatas = [{
                 "group_id": group_id,
                 "type": "group",
                 **(metadata or {})
-            }
+            } for group_id, metadata in zip(group_ids, metadatas or [None] * len(group_ids))]
             
-            # Add to collection
-            self.groups_collection.upsert(
-                ids=[f"group_{group_id}"],
-                embeddings=[group_embedding],
-                metadatas=[group_metadata]
-            )
+            self._upsert_chunked(self.groups_collection, None, "group",
+                                 group_ids, group_embeddings, group_metadatas)
             
-            logger.debug(f"Added group embedding for group {group_id}")
+            logger.debug(f"Added {len(group_ids)} group embeddings")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to add group embedding for group {group_id}: {e}")
+            logger.error(f"Failed to add group embeddings for groups {group_ids}: {e}")
             return False
     
+    def _query_batch(self, collection, index: Optional[ExactIndex], id_field: str,
+                     query_embeddings: List[List[float]], n_results: int,
+                     include_ids: List[int] = None, exclude_ids: List[int] = None) -> List[List[Dict[str, Any]]]:
+        """Run several similarity queries in one call, one result list per query"""
+        # Embeddings are unit length from generation; one vectorized pass guards against
+        # float16 rounding and older rows so distances stay in Chroma's cosine range
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms > 0, norms, 1)
+        prefix = id_field.split("_")[0]
+        
+        # The exact index masks filtered IDs inside the search itself
+        if index:
+            matches = index.search(
+                queries, n_results,
+                include_ids=set(include_ids) if include_ids else None,
+                exclude_ids=set(exclude_ids) if exclude_ids else None
+            )
+            if matches is not None:
+                return [[{
+                    "id": f"{prefix}_{match['entity_id']}",
+                    id_field: match['entity_id'],
+                    "distance": match['distance'],
+                    "metadata": match['metadata']
+                } for match in query_matches] for query_matches in matches]
+        
+        # Exclusions are dropped in Python from an over-fetched result set. A $nin filter is
+        # checked per HNSW candidate and under-fills results once a user has many friends
+        excluded = set(exclude_ids) if exclude_ids and not include_ids else set()
+        where_filter = {id_field: {"$in": include_ids}} if include_ids else None
+        
+        # Query collection
+        results = collection.query(
+            query_embeddings=queries,
+            n_results=n_results + len(excluded),
+            where=where_filter
+        )
+        
+        # Format results - zip the parallel result arrays instead of indexing each one
+        if not results['ids']:
+            return [[] for _ in queries]
+        
+        distance_rows = results['distances'] if results.get('distances') else [[None] * len(ids) for ids in results['ids']]
+        return [[{
+            "id": result_id,
+            id_field: metadata[id_field],
+            "distance": distance,
+            "metadata": metadata
+        } for result_id, distance, metadata in zip(ids, distances, metadatas)
+            if metadata[id_field] not in excluded][:n_results]
+            for ids, distances, metadatas in zip(results['ids'], distance_rows, results['metadatas'])]
+    
     def query_similar_users(self, query_embedding: List[float], n_results: int = 10, 
-                           exclude_user_ids: List[int] = None) -> List[Dict[str, Any]]:
-        """Query for similar users"""
+                           exclude_user_ids: List[int] = None, user_ids: List[int] = None) -> List[Dict[str, Any]]:
+        """Query for similar users, optionally restricted to an allowlist of user IDs"""
         try:
-            # Prepare where filter to exclude specific users
-            where_filter = {}
-            if exclude_user_ids:
-                where_filter = {"user_id": {"$nin": exclude_user_ids}}
-            
-            # Query collection
-            results = self.users_collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_filter if where_filter else None
-            )
-            
-            # Format results
-            formatted_results = []
-            if results['ids'] and results['ids'][0]:
-                for i in range(len(results['ids'][0])):
-                    formatted_results.append({
-                        "id": results['ids'][0][i],
-                        "user_id": results['metadatas'][0][i]['user_id'],
-                        "distance": results['distances'][0][i] if results.get('distances') else None,
-                        "metadata": results['metadatas'][0][i]
-                    })
-            
-            return formatted_results
+            return self._query_batch(
+                self.users_collection, self.users_index, "user_id",
+                [query_embedding], n_results, include_ids=user_ids, exclude_ids=exclude_user_ids
+            )[0]
             
         except Exception as e:
             logger.error(f"Failed to query similar users: {e}")
             return []
     
+    def query_similar_users_batch(self, query_embeddings: List[List[float]], n_results: int = 10,
+                                  exclude_user_ids: List[int] = None,
+                                  user_ids: List[int] = None) -> List[List[Dict[str, Any]]]:
+        """Query for similar users for several embeddings in one request"""
+        try:
+            return self._query_batch(
+                self.users_collection, self.users_index, "user_id",
+                query_embeddings, n_results, include_ids=user_ids, exclude_ids=exclude_user_ids
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to batch query similar users: {e}")
+            return [[] for _ in query_embeddings]
+    
     def query_similar_events(self, query_embedding: List[float], n_results: int = 10,
                             event_ids: List[int] = None) -> List[Dict[str, Any]]:
         """Query for similar events, optionally filtered by event IDs"""
         try:
-            # Prepare where filter
-            where_filter = {}
-            if event_ids:
-                where_filter = {"event_id": {"$in": event_ids}}
-            
-            # Query collection
-            results = self.events_collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_filter if where_filter else None
-            )
-            
-            # Format results
-            formatted_results = []
-            if results['ids'] and results['ids'][0]:
-                for i in range(len(results['ids'][0])):
-                    formatted_results.append({
-                        "id": results['ids'][0][i],
-                        "event_id": results['metadatas'][0][i]['event_id'],
-                        "distance": results['distances'][0][i] if results.get('distances') else None,
-                        "metadata": results['metadatas'][0][i]
-                    })
-            
-            return formatted_results
+            return self._query_batch(
+                self.events_collection, self.events_index, "event_id",
+                [query_embedding], n_results, include_ids=event_ids
+            )[0]
             
         except Exception as e:
             logger.error(f"Failed to query similar events: {e}")
             return []
     
-    def get_group_embedding(self, group_id: int) -> Optional[List[float]]:
-        """Get group embedding by ID"""
+    def query_similar_events_batch(self, query_embeddings: List[List[float]], n_results: int = 10,
+                                   event_ids: List[int] = None) -> List[List[Dict[str, Any]]]:
+        """Query for similar events for several embeddings in one request"""
+        try:
+            return self._query_batch(
+                self.events_collection, self.events_index, "event_id",
+                query_embeddings, n_results, include_ids=event_ids
+            )
+            
+        except Exception as e:
+            logger.error(f"Failed to batch query similar events: {e}")
+            return [[] for _ in query_embeddings]
+    
+    def get_group_embedding(self, group_id: int) -> Optional[np.ndarray]:
+        """Get group embedding by ID as a float32 array"""
         try:
             results = self.groups_collection.get(
                 ids=[f"group_{group_id}"],
                 include=["embeddings"]
             )
             
-            if results['embeddings'] and results['embeddings'][0]:
-                return results['embeddings'][0]
+            # Chroma already returns numpy rows - keep them as arrays instead of building Python lists
+            if results['ids'] and results['embeddings'] is not None and len(results['embeddings']):
+                return np.asarray(results['embeddings'][0], dtype=np.float32)
             
             return None
             
@@ -215,37 +464,115 @@ class ChromaClient:
             logger.error(f"Failed to get group embedding for group {group_id}: {e}")
             return None
     
+    def _delete_chunked(self, collection, index: Optional[ExactIndex], prefix: str, entity_ids: List[int]):
+        """Delete embeddings in chunks of CHROMA_BATCH_SIZE, mirroring the deletes into the in-memory index"""
+        for start in range(0, len(entity_ids), CHROMA_BATCH_SIZE):
+            chunk = entity_ids[start:start + CHROMA_BATCH_SIZE]
+            collection.delete(ids=[f"{prefix}_{entity_id}" for entity_id in chunk])
+            if index:
+                index.delete_batch(chunk)
+    
     def delete_user_embedding(self, user_id: int) -> bool:
         """Delete user embedding"""
+        return self.delete_user_embeddings_batch([user_id])
+    
+    def delete_user_embeddings_batch(self, user_ids: List[int]) -> bool:
+        """Delete many users' embeddings in batched deletes"""
         try:
-            self.users_collection.delete(ids=[f"user_{user_id}"])
-            logger.debug(f"Deleted user embedding for user {user_id}")
+            self._delete_chunked(self.users_collection, self.users_index, "user", user_ids)
+            logger.debug(f"Deleted {len(user_ids)} user embeddings")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to delete user embedding for user {user_id}: {e}")
+            logger.error(f"Failed to delete user embeddings for users {user_ids}: {e}")
             return False
     
     def delete_event_embedding(self, event_id: int) -> bool:
         """Delete event embedding"""
+        return self.delete_event_embeddings_batch([event_id])
+    
+    def delete_event_embeddings_batch(self, event_ids: List[int]) -> bool:
+        """Delete many event embeddings in batched deletes"""
         try:
-            self.events_collection.delete(ids=[f"event_{event_id}"])
-            logger.debug(f"Deleted event embedding for event {event_id}")
+            self._delete_chunked(self.events_collection, self.events_index, "event", event_ids)
+            logger.debug(f"Deleted {len(event_ids)} event embeddings")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to delete event embedding for event {event_id}: {e}")
+            logger.error(f"Failed to delete event embeddings for events {event_ids}: {e}")
             return False
     
     def delete_group_embedding(self, group_id: int) -> bool:
         """Delete group embedding"""
+        return self.delete_group_embeddings_batch([group_id])
+    
+    def delete_group_embeddings_batch(self, group_ids: List[int]) -> bool:
+        """Delete many group embeddings in batched deletes"""
         try:
-            self.groups_collection.delete(ids=[f"group_{group_id}"])
-            logger.debug(f"Deleted group embedding for group {group_id}")
+            self._delete_chunked(self.groups_collection, None, "group", group_ids)
+            logger.debug(f"Deleted {len(group_ids)} group embeddings")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to delete group embeddings for groups {group_ids}: {e}")
+            return False
+    
+    @lru_cache(maxsize=4096)
+    def _load_cached_embedding(self, cache_key: str) -> Tuple[float, ...]:
+        """Load a cached embedding from ChromaDB (raises KeyError on miss so misses aren't memoized)"""
+        results = self.embedding_cache_collection.get(ids=[cache_key], include=["embeddings"])
+        if not results['ids']:
+            raise KeyError(cache_key)
+        return tuple(float(x) for x in results['embeddings'][0])
+    
+    def get_cached_embedding(self, cache_key: str) -> Optional[List[float]]:
+        """Get a cached embedding by content hash"""
+        try:
+            return list(self._load_cached_embedding(cache_key))
+        except KeyError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to read embedding cache for {cache_key}: {e}")
+            return None
+    
+    def cache_embedding(self, cache_key: str, embedding: List[float]) -> bool:
+        """Store an embedding under its content hash"""
+        try:
+            self.embedding_cache_collection.upsert(
+                ids=[cache_key],
+                embeddings=[embedding]
+            )
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to write embedding cache for {cache_key}: {e}")
+            return False
+    
+    def get_cached_description(self, cache_key: str) -> Optional[str]:
+        """Get a cached image description by content hash"""
+        try:
+            results = self.description_cache_collection.get(ids=[cache_key], include=["documents"])
+            if results['ids'] and results['documents']:
+                return results['documents'][0]
+            return None
+            
+        except Exception as e:
+            logger.error(f"Failed to read description cache for {cache_key}: {e}")
+            return None
+    
+    def cache_description(self, cache_key: str, description: str) -> bool:
+        """Store an image description under its content hash"""
+        try:
+            # Descriptions are looked up by ID only, so a placeholder vector is enough
+            self.description_cache_collection.upsert(
+                ids=[cache_key],
+                embeddings=[[0.0]],
+                documents=[description]
+            )
             return True
             
         except Exception as e:
-            logger.error(f"Failed to delete group embedding for group {group_id}: {e}")
+            logger.error(f"Failed to write description cache for {cache_key}: {e}")
             return False
     
     def get_collection_stats(self) -> Dict[str, int]:
@@ -264,6 +591,7 @@ class ChromaClient:
         """Reset all collections (for development/testing)"""
         try:
             self.client.reset()
+            self._load_cached_embedding.cache_clear()
             self._initialize_collections()
             logger.warning("All ChromaDB collections have been reset")
             return True
@@ -272,5 +600,7 @@ class ChromaClient:
             logger.error(f"Failed to reset collections: {e}")
             return False
 
-# Global instance
-chroma_client = ChromaClient() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_chroma_client() -> ChromaClient:
+    """Get the shared ChromaDB client, created on first use rather than at import"""
+    return ChromaClient() 
\ No newline at end of file
@@ -4,22 +4,129 @@ Handles text and image processing for the RAG system
 """
 
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, and_, or_
 import base64
+import io
+import hashlib
+import heapq
+from itertools import chain
 import requests
 from pathlib import Path
 import os
+import aiofiles
+import httpx
+import numpy as np
+import tiktoken
+from functools import lru_cache
+from datasketch import MinHash
+from cachetools import LRUCache
+
+from config import settings
 
 # Import models
-from models import User, DirectMessage, GroupMessage, Snap, Event, GroupChat
+from models import User, DirectMessage, GroupMessage, Snap, SnapGroup, Event, GroupChat
 from utils.media_storage import media_storage
+from .chroma_client import get_chroma_client
 
 logger = logging.getLogger(__name__)
 
+# OpenAI embedding settings
+EMBEDDING_BATCH_SIZE = 256  # Inputs per embeddings.create call (API max is 2048)
+VISION_MODEL = "gpt-4o-mini"
+MAX_CONCURRENT_REQUESTS = 20  # In-flight OpenAI requests, to respect rate limits
+SNAP_CONCURRENCY = 5  # Snaps described at once per embedding
+RECENT_MESSAGE_LIMIT = 25  # Text messages feeding a user's message embedding
+VISION_IMAGE_SIZE = 512  # Longest side sent to the vision model (it downsamples anyway)
+VISION_JPEG_QUALITY = 80
+MAX_INPUT_TOKENS = 8000  # Headroom under the 8191-token embedding input limit
+
+# Fixed closing sentences for embedding inputs
+_PROFILE_SUFFIX = "This person is looking to make friends and connect with others who share similar interests and values."
+_EVENT_SUFFIX = "This is a social event where people can meet, connect, and enjoy activities together."
+_MESSAGE_SUFFIX = "This represents how this person communicates and what they share with friends."
+_GROUP_SUFFIX = "This represents the collective interests, communication style, and activities of this group."
+
+# Near-duplicate reuse: small edits (typos, punctuation) to an entity keep its own previous embedding
+FUZZY_NUM_PERM = 64
+FUZZY_MATCH_JACCARD = 0.95
+SHINGLE_SIZE = 5
+FUZZY_CACHE_SIZE = 50000  # Entities whose last embedding is kept for the near-duplicate check
+
+def _unit_vectors(embeddings: List[List[float]]) -> List[List[float]]:
+    """L2-normalize once at generation, so every stored copy is unit length and similarity is a dot product"""
+    # One (n, dims) array and one row-norm pass for the whole response
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms > 0, norms, 1)).tolist()
+
+def _content_hash(model: str, content: bytes) -> str:
+    """Cache key for a model input - identical content always maps to the same key"""
+    return hashlib.sha256(model.encode() + b":" + content).hexdigest()
+
+@lru_cache(maxsize=1)
+def _get_encoder() -> Optional[tiktoken.Encoding]:
+    """Load the tokenizer for the embedding model once"""
+    try:
+        return tiktoken.encoding_for_model(settings.EMBEDDING_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, falling back to character estimates: {e}")
+        return None
+
+def _count_tokens(text: str) -> int:
+    """Count tokens in text (about 4 characters per token without tiktoken)"""
+    encoder = _get_encoder()
+    return len(encoder.encode(text)) if encoder else len(text) // 4 + 1
+
+def _join_within_tokens(parts: List[str], max_tokens: int) -> str:
+    """Space-join parts in order, stopping once the token budget is used up"""
+    encoder = _get_encoder()
+    kept = []
+    remaining = max_tokens
+    
+    for part in parts:
+        tokens = _count_tokens(part) + 1  # Plus the joining space
+        if tokens > remaining:
+            # Keep whatever fits of the part that crosses the limit
+            if remaining > 1:
+                kept.append(encoder.decode(encoder.encode(part)[:remaining - 1]) if encoder else part[:(remaining - 1) * 4])
+            break
+        kept.append(part)
+        remaining -= tokens
+    
+    return " ".join(kept)
+
+def _shrink_image(image_bytes: bytes) -> bytes:
+    """Downscale an image to a small JPEG for the vision API (original bytes if Pillow is unavailable)"""
+    try:
+        from PIL import Image
+        
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.thumbnail((VISION_IMAGE_SIZE, VISION_IMAGE_SIZE))
+            buffer = io.BytesIO()
+            img.convert("RGB").save(buffer, "JPEG", quality=VISION_JPEG_QUALITY)
+            return buffer.getvalue()
+    except ImportError:
+        logger.warning("PIL not available, sending full-size image")
+        return image_bytes
+
+def _text_minhash(fields: List[Optional[str]]) -> MinHash:
+    """MinHash over character shingles of the whitespace/case-normalized fields (user-supplied text only)"""
+    normalized = " ".join(" ".join(field or "" for field in fields).lower().split())
+    shingles = {
+        normalized[i:i + SHINGLE_SIZE].encode()
+        for i in range(max(len(normalized) - SHINGLE_SIZE + 1, 1))
+    }
+    minhash = MinHash(num_perm=FUZZY_NUM_PERM)
+    minhash.update_batch(shingles)
+    return minhash
+
 class EmbeddingService:
     """Service for generating embeddings using OpenAI's APIs"""
     
@@ -31,8 +138,97 @@ class EmbeddingService:
             logger.warning("OPENAI_API_KEY not found")
             self.client = None
         else:
-            self.client = OpenAI(api_key=api_key)
+            # One pooled HTTP client so TCP/TLS connections are reused across calls
+            http_client = openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+            )
+            self.client = AsyncOpenAI(api_key=api_key, http_client=http_client)
             logger.info("OpenAI client initialized")
+        
+        # Short profile/event texts lose little recall at a small model and 512 dims
+        self.embed_model = settings.EMBEDDING_MODEL
+        self.embed_dims = settings.EMBEDDING_DIMENSIONS
+        
+        # Bounds concurrent API calls across all callers
+        self._request_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        # Last embedding per entity key ("user_1", "event_2") -> (minhash of its fields, embedding)
+        self._fuzzy_entries: LRUCache = LRUCache(maxsize=FUZZY_CACHE_SIZE)
+    
+    def _find_near_duplicate(self, entity_key: str, fields: List[Optional[str]]) -> Tuple[MinHash, Optional[List[float]]]:
+        """
+        Return the MinHash of an entity's fields, plus its previous embedding if they barely changed.
+        Only ever compared with the same entity: short profiles of different users look alike
+        """
+        minhash = _text_minhash(fields)
+        previous = self._fuzzy_entries.get(entity_key)
+        if previous and minhash.jaccard(previous[0]) >= FUZZY_MATCH_JACCARD:
+            return minhash, previous[1]
+        return minhash, None
+    
+    def _remember_embedding(self, entity_key: str, minhash: MinHash, embedding: List[float]):
+        """Keep a freshly generated embedding for the entity's next near-duplicate check"""
+        self._fuzzy_entries[entity_key] = (minhash, embedding)
+    
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for many texts, returned in input order"""
+        embeddings = [[] for _ in texts]
+        cache_model = f"{self.embed_model}@{self.embed_dims}"
+        cache_keys = [_content_hash(cache_model, text.encode()) for text in texts]
+        
+        # Serve unchanged texts from the embedding cache
+        pending = []
+        for i, cache_key in enumerate(cache_keys):
+            cached = get_chroma_client().get_cached_embedding(cache_key)
+            if cached:
+                embeddings[i] = cached
+            else:
+                pending.append(i)
+        
+        if pending and not self.client:
+            logger.error("OpenAI client not initialized")
+            return embeddings
+        
+        async def embed_chunk(chunk: List[int]):
+            try:
+                async with self._request_semaphore:
+                    response = await self.client.embeddings.create(
+                        model=self.embed_model,
+                        input=[texts[i] for i in chunk],
+                        dimensions=self.embed_dims  # Truncated + renormalized by the API
+                    )
+                
+                # Match results back to inputs by index
+                unit_vectors = _unit_vectors([item.embedding for item in response.data])
+                for item, embedding in zip(response.data, unit_vectors):
+                    i = chunk[item.index]
+                    embeddings[i] = embedding
+                    get_chroma_client().cache_embedding(cache_keys[i], embeddings[i])
+                
+            except Exception as e:
+                logger.error(f"Failed to generate embeddings for batch of {len(chunk)} texts: {e}")
+        
+        # Chunks are independent, so send them concurrently
+        await asyncio.gather(*(
+            embed_chunk(pending[start:start + EMBEDDING_BATCH_SIZE])
+            for start in range(0, len(pending), EMBEDDING_BATCH_SIZE)
+        ))
+        
+        return embeddings
+    
+    def _profile_fields(self, user: User) -> List[Optional[str]]:
+        """The user-supplied parts of a profile embedding's text"""
+        return [user.bio, ", ".join(user.interests or [])]
+    
+    def _build_profile_text(self, user: User) -> str:
+        """Construct the text used for a user's profile embedding"""
+        lines = ["User Profile:"]
+        if user.bio:
+            lines.append(f"Bio: {user.bio}")
+        if user.interests:
+            lines.append(f"Interests: {', '.join(user.interests)}")
+        lines.append(_PROFILE_SUFFIX)
+        return "\n".join(lines)
     
     async def generate_user_profile_embedding(self, user: User) -> List[float]:
         """Generate embedding from user's bio and interests"""
@@ -41,25 +237,17 @@ class EmbeddingService:
             return []
         
         try:
-            # Construct profile text
-            bio_text = user.bio or "No bio provided"
-            interests_text = ", ".join(user.interests or []) if user.interests else "No interests listed"
-            
-            profile_text = f"""
-            User Profile:
-            Bio: {bio_text}
-            Interests: {interests_text}
-            
-            This person is looking to make friends and connect with others who share similar interests and values.
-            """
-            
-            # Generate embedding (remove await - OpenAI client is synchronous)
-            response = self.client.embeddings.create(
-                model="text-embedding-3-large",
-                input=profile_text.strip()
-            )
+            profile_text = self._build_profile_text(user)
             
-            embedding = response.data[0].embedding
+            # Reuse the stored embedding if the profile only changed slightly
+            minhash, embedding = self._find_near_duplicate(f"user_{user.id}", self._profile_fields(user))
+            if embedding:
+                logger.debug(f"Reusing near-duplicate profile embedding for user {user.id}")
+                return embedding
+            
+            embedding = (await self.generate_embeddings_batch([profile_text]))[0]
+            if embedding:
+                self._remember_embedding(f"user_{user.id}", minhash, embedding)
             logger.debug(f"Generated profile embedding for user {user.id}, length: {len(embedding)}")
             return embedding
             
@@ -67,6 +255,34 @@ class EmbeddingService:
             logger.error(f"Failed to generate profile embedding for user {user.id}: {e}")
             return []
     
+    async def generate_user_profile_embeddings(self, users: List[User]) -> List[List[float]]:
+        """Generate profile embeddings for many users in batched API calls (same order as users)"""
+        if not self.client:
+            logger.error("OpenAI client not initialized")
+            return [[] for _ in users]
+        
+        embeddings = [[] for _ in users]
+        minhashes = []
+        pending = []
+        
+        for i, user in enumerate(users):
+            profile_text = self._build_profile_text(user)
+            minhash, embedding = self._find_near_duplicate(f"user_{user.id}", self._profile_fields(user))
+            minhashes.append(minhash)
+            if embedding:
+                embeddings[i] = embedding
+            else:
+                pending.append((i, profile_text))
+        
+        generated = await self.generate_embeddings_batch([text for _, text in pending])
+        for (i, _), embedding in zip(pending, generated):
+            embeddings[i] = embedding
+            if embedding:
+                self._remember_embedding(f"user_{users[i].id}", minhashes[i], embedding)
+        
+        logger.debug(f"Generated {sum(1 for e in embeddings if e)} of {len(users)} profile embeddings")
+        return embeddings
+    
     async def generate_user_message_embedding(self, user_id: int, db: Session) -> List[float]:
         """Generate embedding from user's recent messages and snaps"""
         if not self.client:
@@ -74,28 +290,26 @@ class EmbeddingService:
             return []
         
         try:
-            # Get recent text messages (25 most recent)
-            recent_direct_messages = db.query(DirectMessage).filter(
+            # Get recent text messages (25 most recent), fetching only the columns we need
+            recent_direct_messages = db.query(DirectMessage.content, DirectMessage.created_at).filter(
                 DirectMessage.sender_id == user_id,
                 DirectMessage.message_type == "text",
                 DirectMessage.content.isnot(None)
-            ).order_by(desc(DirectMessage.created_at)).limit(25).all()
+            ).order_by(desc(DirectMessage.created_at)).limit(RECENT_MESSAGE_LIMIT).all()
             
-            recent_group_messages = db.query(GroupMessage).filter(
+            recent_group_messages = db.query(GroupMessage.content, GroupMessage.created_at).filter(
                 GroupMessage.sender_id == user_id,
                 GroupMessage.message_type == "text",
                 GroupMessage.content.isnot(None)
-            ).order_by(desc(GroupMessage.created_at)).limit(25).all()
-            
-            # Combine and limit to 25 total
-            all_text_messages = []
-            for msg in recent_direct_messages:
-                all_text_messages.append(msg.content)
-            for msg in recent_group_messages:
-                all_text_messages.append(msg.content)
+            ).order_by(desc(GroupMessage.created_at)).limit(RECENT_MESSAGE_LIMIT).all()
             
-            # Sort by timestamp and take most recent 25
-            all_text_messages = all_text_messages[:25]
+            # Merge both sources and keep the 25 most recent overall
+            most_recent = heapq.nlargest(
+                RECENT_MESSAGE_LIMIT,
+                chain(recent_direct_messages, recent_group_messages),
+                key=lambda row: row.created_at
+            )
+            all_text_messages = [row.content for row in most_recent]
             
             # Get recent snaps (10 most recent)
             recent_snaps = db.query(Snap).filter(
@@ -109,31 +323,19 @@ class EmbeddingService:
             if all_text_messages:
                 message_texts.extend(all_text_messages)
             
-            # Process snaps
-            for snap in recent_snaps:
-                snap_description = await self._process_snap_content(snap)
-                if snap_description:
-                    message_texts.append(snap_description)
+            # Process snaps concurrently (each may need a vision API call)
+            message_texts.extend(await self._process_snaps(recent_snaps))
             
             # Create combined text
             if not message_texts:
                 combined_text = "This user hasn't sent many messages yet. They are looking to connect and make friends."
             else:
-                combined_text = f"""
-                Recent communication style and content from this user:
-                
-                {' '.join(message_texts[:50])}  # Limit to prevent token overflow
-                
-                This represents how this person communicates and what they share with friends.
-                """
+                header = "Recent communication style and content from this user:"
+                budget = MAX_INPUT_TOKENS - _count_tokens(header) - _count_tokens(_MESSAGE_SUFFIX) - 2
+                combined_text = "\n".join([header, _join_within_tokens(message_texts, budget), _MESSAGE_SUFFIX])
             
             # Generate embedding
-            response = self.client.embeddings.create(
-                model="text-embedding-3-large",
-                input=combined_text.strip()
-            )
-            
-            embedding = response.data[0].embedding
+            embedding = (await self.generate_embeddings_batch([combined_text]))[0]
             logger.debug(f"Generated message embedding for user {user_id}, length: {len(embedding)}")
             return embedding
             
@@ -148,14 +350,14 @@ class EmbeddingService:
             return []
         
         try:
-            # Get group info
-            group = db.query(GroupChat).filter(GroupChat.id == group_id).first()
+            # Get group info (only the columns the embedding text uses)
+            group = db.query(GroupChat.name, GroupChat.description).filter(GroupChat.id == group_id).first()
             if not group:
                 logger.error(f"Group {group_id} not found")
                 return []
             
             # Get recent text messages (50 most recent)
-            recent_messages = db.query(GroupMessage).filter(
+            recent_messages = db.query(GroupMessage.content).filter(
                 GroupMessage.group_id == group_id,
                 GroupMessage.message_type == "text",
                 GroupMessage.content.isnot(None),
@@ -163,8 +365,8 @@ class EmbeddingService:
             ).order_by(desc(GroupMessage.created_at)).limit(50).all()
             
             # Get recent snaps sent to this group (20 most recent)
-            recent_snaps = db.query(Snap).filter(
-                Snap.group_ids.contains([group_id])
+            recent_snaps = db.query(Snap).join(SnapGroup, SnapGroup.snap_id == Snap.id).filter(
+                SnapGroup.group_id == group_id
             ).order_by(desc(Snap.created_at)).limit(20).all()
             
             # Combine content
@@ -180,31 +382,19 @@ class EmbeddingService:
                 if msg.content:
                     content_texts.append(msg.content)
             
-            # Process snaps
-            for snap in recent_snaps:
-                snap_description = await self._process_snap_content(snap)
-                if snap_description:
-                    content_texts.append(snap_description)
+            # Process snaps concurrently (each may need a vision API call)
+            content_texts.extend(await self._process_snaps(recent_snaps))
             
             # Create combined text
             if not content_texts:
                 combined_text = f"This is a group chat named '{group.name}'. The group is just getting started and looking to build community."
             else:
-                combined_text = f"""
-                Group Chat Analysis for '{group.name}':
-                
-                {' '.join(content_texts[:100])}  # Limit to prevent token overflow
-                
-                This represents the collective interests, communication style, and activities of this group.
-                """
+                header = f"Group Chat Analysis for '{group.name}':"
+                budget = MAX_INPUT_TOKENS - _count_tokens(header) - _count_tokens(_GROUP_SUFFIX) - 2
+                combined_text = "\n".join([header, _join_within_tokens(content_texts, budget), _GROUP_SUFFIX])
             
             # Generate embedding
-            response = self.client.embeddings.create(
-                model="text-embedding-3-large",
-                input=combined_text.strip()
-            )
-            
-            embedding = response.data[0].embedding
+            embedding = (await self.generate_embeddings_batch([combined_text]))[0]
             logger.debug(f"Generated group embedding for group {group_id}, length: {len(embedding)}")
             return embedding
             
@@ -212,6 +402,22 @@ class EmbeddingService:
             logger.error(f"Failed to generate group embedding for group {group_id}: {e}")
             return []
     
+    def _event_fields(self, event: Event) -> List[Optional[str]]:
+        """The user-supplied parts of an event embedding's text"""
+        return [event.title, event.location_name, event.description, event.story]
+    
+    def _build_event_text(self, event: Event) -> str:
+        """Construct the text used for an event embedding"""
+        lines = [f"Event: {event.title or 'Event'}"]
+        if event.location_name:
+            lines.append(f"Location: {event.location_name}")
+        if event.description:
+            lines.append(f"Description: {event.description}")
+        if event.story:
+            lines.append(f"Story: {event.story}")
+        lines.append(_EVENT_SUFFIX)
+        return "\n".join(lines)
+    
     async def generate_event_embedding(self, event: Event) -> List[float]:
         """Generate embedding from event title and description"""
         if not self.client:
@@ -219,31 +425,17 @@ class EmbeddingService:
             return []
         
         try:
-            # Construct event text
-            title = event.title or "Event"
-            description = event.description or ""
-            story = event.story or ""
-            location = event.location_name or ""
+            event_text = self._build_event_text(event)
             
-            event_text = f"""
-            Event: {title}
+            # Reuse the stored embedding if the event text only changed slightly
+            minhash, embedding = self._find_near_duplicate(f"event_{event.id}", self._event_fields(event))
+            if embedding:
+                logger.debug(f"Reusing near-duplicate event embedding for event {event.id}")
+                return embedding
             
-            Location: {location}
-            
-            Description: {description}
-            
-            Story: {story}
-            
-            This is a social event where people can meet, connect, and enjoy activities together.
-            """
-            
-            # Generate embedding (remove await - OpenAI client is synchronous)
-            response = self.client.embeddings.create(
-                model="text-embedding-3-large",
-                input=event_text.strip()
-            )
-            
-            embedding = response.data[0].embedding
+            embedding = (await self.generate_embeddings_batch([event_text]))[0]
+            if embedding:
+                self._remember_embedding(f"event_{event.id}", minhash, embedding)
             logger.debug(f"Generated event embedding for event {event.id}, length: {len(embedding)}")
             return embedding
             
@@ -251,6 +443,45 @@ class EmbeddingService:
             logger.error(f"Failed to generate event embedding for event {event.id}: {e}")
             return []
     
+    async def generate_event_embeddings(self, events: List[Event]) -> List[List[float]]:
+        """Generate embeddings for many events in batched API calls (same order as events)"""
+        if not self.client:
+            logger.error("OpenAI client not initialized")
+            return [[] for _ in events]
+        
+        embeddings = [[] for _ in events]
+        minhashes = []
+        pending = []
+        
+        for i, event in enumerate(events):
+            event_text = self._build_event_text(event)
+            minhash, embedding = self._find_near_duplicate(f"event_{event.id}", self._event_fields(event))
+            minhashes.append(minhash)
+            if embedding:
+                embeddings[i] = embedding
+            else:
+                pending.append((i, event_text))
+        
+        generated = await self.generate_embeddings_batch([text for _, text in pending])
+        for (i, _), embedding in zip(pending, generated):
+            embeddings[i] = embedding
+            if embedding:
+                self._remember_embedding(f"event_{events[i].id}", minhashes[i], embedding)
+        
+        logger.debug(f"Generated {sum(1 for e in embeddings if e)} of {len(events)} event embeddings")
+        return embeddings
+    
+    async def _process_snaps(self, snaps: List[Snap]) -> List[str]:
+        """Describe several snaps concurrently, dropping failures and empty results"""
+        semaphore = asyncio.Semaphore(SNAP_CONCURRENCY)
+        
+        async def process(snap: Snap) -> Optional[str]:
+            async with semaphore:
+                return await self._process_snap_content(snap)
+        
+        descriptions = await asyncio.gather(*[process(snap) for snap in snaps], return_exceptions=True)
+        return [d for d in descriptions if d and not isinstance(d, BaseException)]
+    
     async def _process_snap_content(self, snap: Snap) -> Optional[str]:
         """Process snap content (image description + caption)"""
         try:
@@ -262,7 +493,13 @@ class EmbeddingService:
             
             # Process image if it's an image snap
             if snap.media_type and snap.media_type.startswith('image') and snap.media_url:
-                image_description = await self._describe_image(snap.media_url)
+                # Snaps are immutable, so a snap ID hit skips reading the file at all
+                snap_key = _content_hash(VISION_MODEL, f"snap_{snap.id}".encode())
+                image_description = get_chroma_client().get_cached_description(snap_key)
+                if not image_description:
+                    image_description = await self._describe_image(snap.media_url)
+                    if image_description:
+                        get_chroma_client().cache_description(snap_key, image_description)
                 if image_description:
                     content_parts.append(f"Image: {image_description}")
             
@@ -290,34 +527,51 @@ class EmbeddingService:
                     logger.warning(f"Image file not found: {image_url}")
                     return None
                 
-                with open(full_path, 'rb') as image_file:
-                    image_data = base64.b64encode(image_file.read()).decode('utf-8')
-                    image_url_for_api = f"data:image/jpeg;base64,{image_data}"
+                async with aiofiles.open(full_path, 'rb') as image_file:
+                    image_bytes = await image_file.read()
+                
+                cache_key = _content_hash(VISION_MODEL, image_bytes)
+                cached = get_chroma_client().get_cached_description(cache_key)
+                if cached:
+                    return cached
+                
+                # Resized and encoded only on a cache miss
+                image_bytes = await asyncio.to_thread(_shrink_image, image_bytes)
+                image_data = base64.b64encode(image_bytes).decode('utf-8')
+                image_url_for_api = f"data:image/jpeg;base64,{image_data}"
             else:
                 # Assume it's already a URL
                 image_url_for_api = image_url
-            
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text", 
-                                "text": "Describe what you see in this image. Focus on activities, interests, social context, and what this might tell us about the person who posted it. Keep it concise but informative."
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {"url": image_url_for_api}
-                            }
-                        ]
-                    }
-                ],
-                max_tokens=150  # Keep descriptions concise
-            )
+                
+                cache_key = _content_hash(VISION_MODEL, image_url.encode())
+                cached = get_chroma_client().get_cached_description(cache_key)
+                if cached:
+                    return cached
+            
+            async with self._request_semaphore:
+                response = await self.client.chat.completions.create(
+                    model=VISION_MODEL,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "text", 
+                                    "text": "Describe what you see in this image. Focus on activities, interests, social context, and what this might tell us about the person who posted it. Keep it concise but informative."
+                                },
+                                {
+                                    "type": "image_url",
+                                    "image_url": {"url": image_url_for_api, "detail": "low"}
+                                }
+                            ]
+                        }
+                    ],
+                    max_tokens=150  # Keep descriptions concise
+                )
             
             description = response.choices[0].message.content
+            if description:
+                get_chroma_client().cache_description(cache_key, description)
             logger.debug(f"Generated image description for {image_url}")
             return description
             
@@ -332,16 +586,13 @@ class EmbeddingService:
             return []
         
         try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-large",
-                input=text
-            )
-            
-            return response.data[0].embedding
+            return (await self.generate_embeddings_batch([text]))[0]
             
         except Exception as e:
             logger.error(f"Failed to generate text embedding: {e}")
             return []
 
-# Global instance
-embedding_service = EmbeddingService() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    """Get the shared embedding service, created on first use rather than at import"""
+    return EmbeddingService() 
\ No newline at end of file
@@ -2,138 +2,189 @@
 Background tasks for updating embeddings every 24 hours
 """
 
+import asyncio
 import logging
+from itertools import islice
+from typing import Iterable, Iterator, List
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, select, update
 
 from database import SessionLocal
 from models import User, GroupChat, Event
 from models.embeddings import UserEmbedding, GroupEmbedding, EventEmbedding
-from .embedding_service import embedding_service
-from .chroma_client import chroma_client
+from .embedding_service import get_embedding_service
+from .chroma_client import get_chroma_client
+from .rag_engine import get_rag_engine
 from utils.background_tasks import task_manager
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_REFRESH_INTERVAL = timedelta(hours=24)
+YIELD_PER = 500  # Rows fetched per round trip when streaming stale entities
+COMMIT_BATCH_SIZE = 500  # Rows written per transaction
+USER_EMBEDDING_CONCURRENCY = 16  # Users whose embeddings are generated at once
+
+def _batched(rows: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of up to size rows from an iterable"""
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+async def _generate_user_embeddings(user: User, db: Session, semaphore: asyncio.Semaphore):
+    """Generate a user's profile and message embeddings concurrently; (None, None) on failure"""
+    async with semaphore:
+        try:
+            return await asyncio.gather(
+                get_embedding_service().generate_user_profile_embedding(user),
+                get_embedding_service().generate_user_message_embedding(user.id, db)
+            )
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings for user {user.id}: {e}")
+            return None, None
+
 async def update_user_embeddings():
     """Update user embeddings every 24 hours"""
     logger.info("Starting user embeddings update task")
     
+    # Stale users stream from one session while another commits each batch,
+    # since committing would close the streaming cursor
     db = SessionLocal()
+    write_db = SessionLocal()
     try:
-        users = db.query(User).filter(User.is_active == True).all()
+        semaphore = asyncio.Semaphore(USER_EMBEDDING_CONCURRENCY)
+        
+        # Users with no embedding or a stale one, paired with their embedding row in one query
+        cutoff = datetime.now(timezone.utc) - EMBEDDING_REFRESH_INTERVAL
+        stale_users = db.query(User, UserEmbedding).outerjoin(
+            UserEmbedding, UserEmbedding.user_id == User.id
+        ).filter(
+            User.is_active == True,
+            or_(UserEmbedding.last_updated == None, UserEmbedding.last_updated < cutoff)
+        ).yield_per(YIELD_PER)
         updated_count = 0
         
-        for user in users:
-            try:
-                existing = db.query(UserEmbedding).filter(UserEmbedding.user_id == user.id).first()
-                
-                needs_update = True
-                if existing and existing.last_updated:
-                    time_since_update = datetime.now(timezone.utc) - existing.last_updated
-                    needs_update = time_since_update > timedelta(hours=24)
-                
-                if not needs_update:
-                    continue
-                
-                profile_emb = await embedding_service.generate_user_profile_embedding(user)
-                message_emb = await embedding_service.generate_user_message_embedding(user.id, db)
-                
-                if profile_emb and message_emb:
-                    if existing:
-                        existing.profile_embedding = profile_emb
-                        existing.message_embedding = message_emb
-                        existing.last_updated = datetime.now(timezone.utc)
-                    else:
-                        new_embedding = UserEmbedding(
-                            user_id=user.id,
-                            profile_embedding=profile_emb,
-                            message_embedding=message_emb
-                        )
-                        db.add(new_embedding)
-                    
-                    chroma_client.add_user_embedding(user.id, profile_emb, message_emb)
-                    db.commit()
-                    updated_count += 1
+        for batch in _batched(stale_users, COMMIT_BATCH_SIZE):
+            # Generate first so the SQLite write lock is only held for the batch write
+            results = await asyncio.gather(*[_generate_user_embeddings(user, db, semaphore) for user, _ in batch])
+            generated = [(user, existing, profile_emb, message_emb)
+                         for (user, existing), (profile_emb, message_emb) in zip(batch, results)
+                         if profile_emb and message_emb]
+            
+            # One transaction per batch; a savepoint per user keeps one bad row from losing the rest
+            pending_chroma = []
+            for user, existing, profile_emb, message_emb in generated:
+                try:
+                    with write_db.begin_nested():
+                        if existing:
+                            write_db.execute(
+                                update(UserEmbedding).where(UserEmbedding.id == existing.id).values(
+                                    profile_embedding=profile_emb,
+                                    message_embedding=message_emb,
+                                    last_updated=datetime.now(timezone.utc)
+                                )
+                            )
+                        else:
+                            new_embedding = UserEmbedding(
+                                user_id=user.id,
+                                profile_embedding=profile_emb,
+                                message_embedding=message_emb
+                            )
+                            write_db.add(new_embedding)
+                    pending_chroma.append((user.id, profile_emb, message_emb))
                     
-            except Exception as e:
-                logger.error(f"Failed to update embeddings for user {user.id}: {e}")
-                db.rollback()
+                except Exception as e:
+                    logger.error(f"Failed to update embeddings for user {user.id}: {e}")
+            
+            write_db.commit()
+            
+            if pending_chroma:
+                user_ids, profile_embs, message_embs = zip(*pending_chroma)
+                get_chroma_client().add_user_embedding_batch(list(user_ids), list(profile_embs), list(message_embs))
+            updated_count += len(pending_chroma)
         
         logger.info(f"Updated {updated_count} user embeddings")
         
     finally:
+        write_db.close()
         db.close()
 
 async def update_group_embeddings():
     """Update group embeddings every 24 hours"""
     logger.info("Starting group embeddings update task")
     
+    # Stale groups stream from one session while another commits each batch,
+    # since committing would close the streaming cursor
     db = SessionLocal()
+    write_db = SessionLocal()
     try:
-        # Get all active groups
-        groups = db.query(GroupChat).filter(GroupChat.is_active == True).all()
+        # Active groups with no embedding or one older than 24 hours
+        cutoff = datetime.now(timezone.utc) - EMBEDDING_REFRESH_INTERVAL
+        stale_groups = db.query(GroupChat, GroupEmbedding).outerjoin(
+            GroupEmbedding, GroupEmbedding.group_id == GroupChat.id
+        ).filter(
+            GroupChat.is_active == True,
+            or_(GroupEmbedding.last_updated == None, GroupEmbedding.last_updated < cutoff)
+        ).yield_per(YIELD_PER)
         updated_count = 0
         
-        for group in groups:
-            try:
-                # Check if embeddings need update (older than 24 hours)
-                existing = db.query(GroupEmbedding).filter(GroupEmbedding.group_id == group.id).first()
-                
-                needs_update = True
-                if existing and existing.last_updated:
-                    time_since_update = datetime.now(timezone.utc) - existing.last_updated
-                    needs_update = time_since_update > timedelta(hours=24)
-                
-                if not needs_update:
-                    continue
-                
-                logger.debug(f"Updating embedding for group {group.id}")
-                
-                # Generate new embedding
-                group_emb = await embedding_service.generate_group_embedding(group.id, db)
-                
-                if not group_emb:
-                    logger.warning(f"Failed to generate embedding for group {group.id}")
-                    continue
-                
-                # Update or create embedding record
-                if existing:
-                    existing.group_embedding = group_emb
-                    existing.last_updated = datetime.now(timezone.utc)
-                else:
-                    new_embedding = GroupEmbedding(
-                        group_id=group.id,
-                        group_embedding=group_emb,
-                        last_updated=datetime.now(timezone.utc)
-                    )
-                    db.add(new_embedding)
-                
-                # Update ChromaDB
-                chroma_client.add_group_embedding(
-                    group.id,
-                    group_emb,
-                    metadata={
+        for batch in _batched(stale_groups, COMMIT_BATCH_SIZE):
+            # Generate first so the SQLite write lock is only held for the batch write
+            generated = []
+            for group, existing in batch:
+                try:
+                    logger.debug(f"Updating embedding for group {group.id}")
+                    group_emb = await get_embedding_service().generate_group_embedding(group.id, db)
+                    if group_emb:
+                        generated.append((group, existing, group_emb))
+                    else:
+                        logger.warning(f"Failed to generate embedding for group {group.id}")
+                except Exception as e:
+                    logger.error(f"Failed to generate embedding for group {group.id}: {e}")
+            
+            # One transaction per batch; a savepoint per group keeps one bad row from losing the rest
+            pending_chroma = []
+            for group, existing, group_emb in generated:
+                try:
+                    with write_db.begin_nested():
+                        # Update or create embedding record
+                        if existing:
+                            write_db.execute(
+                                update(GroupEmbedding).where(GroupEmbedding.id == existing.id).values(
+                                    group_embedding=group_emb,
+                                    last_updated=datetime.now(timezone.utc)
+                                )
+                            )
+                        else:
+                            new_embedding = GroupEmbedding(
+                                group_id=group.id,
+                                group_embedding=group_emb,
+                                last_updated=datetime.now(timezone.utc)
+                            )
+                            write_db.add(new_embedding)
+                    pending_chroma.append((group.id, group_emb, {
                         "group_name": group.name,
                         "member_count": group.member_count,
                         "group_interests": group.group_interests or []
-                    }
-                )
-                
-                db.commit()
-                updated_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to update embedding for group {group.id}: {e}")
-                db.rollback()
-                continue
+                    }))
+                    
+                except Exception as e:
+                    logger.error(f"Failed to update embedding for group {group.id}: {e}")
+            
+            write_db.commit()
+            
+            # Update ChromaDB once the batch is committed
+            if pending_chroma:
+                group_ids, group_embs, metadatas = zip(*pending_chroma)
+                get_chroma_client().add_group_embedding_batch(list(group_ids), list(group_embs), list(metadatas))
+            updated_count += len(pending_chroma)
         
         logger.info(f"Group embeddings update completed. Updated {updated_count} groups.")
         
     except Exception as e:
         logger.error(f"Failed to update group embeddings: {e}")
     finally:
+        write_db.close()
         db.close()
 
 async def create_event_embeddings():
@@ -142,54 +193,54 @@ async def create_event_embeddings():
     
     db = SessionLocal()
     try:
-        # Get events without embeddings
-        events_without_embeddings = db.query(Event).filter(
+        # Get events without embeddings (anti-join rather than NOT IN over every embedded event)
+        events_without_embeddings = db.query(Event).outerjoin(
+            EventEmbedding, EventEmbedding.event_id == Event.id
+        ).filter(
             Event.is_active == True,
-            ~Event.id.in_(
-                db.query(EventEmbedding.event_id)
-            )
+            EventEmbedding.event_id == None
         ).all()
         
         created_count = 0
         
-        for event in events_without_embeddings:
-            try:
-                logger.debug(f"Creating embedding for event {event.id}")
-                
-                # Generate embedding
-                event_emb = await embedding_service.generate_event_embedding(event)
-                
+        # Generate all embeddings up front in batched API calls
+        event_embeddings = await get_embedding_service().generate_event_embeddings(events_without_embeddings)
+        
+        for batch in _batched(zip(events_without_embeddings, event_embeddings), COMMIT_BATCH_SIZE):
+            # One transaction per batch; a savepoint per event keeps one bad row from losing the rest
+            pending_chroma = []
+            for event, event_emb in batch:
                 if not event_emb:
                     logger.warning(f"Failed to generate embedding for event {event.id}")
                     continue
                 
-                # Create embedding record
-                new_embedding = EventEmbedding(
-                    event_id=event.id,
-                    event_embedding=event_emb
-                )
-                db.add(new_embedding)
-                
-                # Add to ChromaDB
-                chroma_client.add_event_embedding(
-                    event.id,
-                    event_emb,
-                    metadata={
+                try:
+                    logger.debug(f"Creating embedding for event {event.id}")
+                    with db.begin_nested():
+                        new_embedding = EventEmbedding(
+                            event_id=event.id,
+                            event_embedding=event_emb
+                        )
+                        db.add(new_embedding)
+                    # Read before the commit expires the event
+                    pending_chroma.append((event.id, event_emb, {
                         "title": event.title,
                         "location_name": event.location_name,
                         "creator_id": event.creator_id,
                         "visibility": event.visibility,
                         "start_time": event.start_time.isoformat()
-                    }
-                )
-                
-                db.commit()
-                created_count += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to create embedding for event {event.id}: {e}")
-                db.rollback()
-                continue
+                    }))
+                    
+                except Exception as e:
+                    logger.error(f"Failed to create embedding for event {event.id}: {e}")
+            
+            db.commit()
+            
+            # Add to ChromaDB once the batch is committed
+            if pending_chroma:
+                event_ids, event_embs, metadatas = zip(*pending_chroma)
+                get_chroma_client().add_event_embedding_batch(list(event_ids), list(event_embs), list(metadatas))
+            created_count += len(pending_chroma)
         
         logger.info(f"Event embeddings creation completed. Created {created_count} embeddings.")
         
@@ -206,35 +257,25 @@ async def cleanup_expired_embeddings():
     try:
         cleanup_count = 0
         
-        # Clean up user embeddings for inactive users
-        inactive_user_embeddings = db.query(UserEmbedding).join(User).filter(
-            User.is_active == False
-        ).all()
-        
-        for embedding in inactive_user_embeddings:
-            chroma_client.delete_user_embedding(embedding.user_id)
-            db.delete(embedding)
-            cleanup_count += 1
-        
-        # Clean up event embeddings for inactive events
-        inactive_event_embeddings = db.query(EventEmbedding).join(Event).filter(
-            Event.is_active == False
-        ).all()
-        
-        for embedding in inactive_event_embeddings:
-            chroma_client.delete_event_embedding(embedding.event_id)
-            db.delete(embedding)
-            cleanup_count += 1
-        
-        # Clean up group embeddings for inactive groups
-        inactive_group_embeddings = db.query(GroupEmbedding).join(GroupChat).filter(
-            GroupChat.is_active == False
-        ).all()
+        # For each kind: collect the IDs in one query, batch-delete from Chroma,
+        # then remove the rows with a single bulk DELETE
+        cleanups = [
+            (UserEmbedding, UserEmbedding.user_id, User, get_chroma_client().delete_user_embeddings_batch),
+            (EventEmbedding, EventEmbedding.event_id, Event, get_chroma_client().delete_event_embeddings_batch),
+            (GroupEmbedding, GroupEmbedding.group_id, GroupChat, get_chroma_client().delete_group_embeddings_batch),
+        ]
         
-        for embedding in inactive_group_embeddings:
-            chroma_client.delete_group_embedding(embedding.group_id)
-            db.delete(embedding)
-            cleanup_count += 1
+        for embedding_model, owner_id, owner_model, delete_from_chroma in cleanups:
+            inactive_ids = db.scalars(
+                select(owner_id).join(owner_model, owner_model.id == owner_id).where(owner_model.is_active == False)
+            ).all()
+            if not inactive_ids:
+                continue
+            
+            delete_from_chroma(inactive_ids)
+            cleanup_count += db.query(embedding_model).filter(
+                owner_id.in_(inactive_ids)
+            ).delete(synchronize_session=False)
         
         db.commit()
         logger.info(f"Embedding cleanup completed. Cleaned up {cleanup_count} embeddings.")
@@ -258,4 +299,7 @@ async def initialize_embedding_tasks():
         cleanup_expired_embeddings
     ]
     
+    # Background writer for Chroma updates queued by the recommendation engine
+    get_rag_engine().start_chroma_writer()
+    
     logger.info(f"Registered {len(tasks)} embedding tasks") 
\ No newline at end of file
@@ -3,34 +3,195 @@ RAG Recommendation Engine for LadChat
 Provides AI-powered recommendations for friends, events, and group members
 """
 
+import asyncio
 import logging
-from typing import List, Dict, Optional, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, not_
-import math
-from datetime import datetime, timezone
+import time
+from typing import List, Dict, Optional, Any, Set, Tuple, Callable, NamedTuple, Union
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import and_, or_, not_, case, func, select, bindparam, Float
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import islice
 
 # Import services and models
-from .chroma_client import chroma_client
-from .embedding_service import embedding_service
-from models import User, Event, GroupChat, Friendship, FriendRequest
+from .chroma_client import get_chroma_client
+from .embedding_service import get_embedding_service
+from models import User, Event, EventRsvp, GroupChat, Friendship, FriendRequest
+from models.embeddings import UserEmbedding, GroupEmbedding, EventEmbedding, uses_pgvector
 from database import SessionLocal
+from config import settings
 
 logger = logging.getLogger(__name__)
 
+EARTH_RADIUS_MILES = 3956
+CHROMA_WRITE_QUEUE_SIZE = 10000  # Pending background Chroma writes before writing inline
+PROFILE_REFRESH_INTERVAL = timedelta(hours=24)  # Age at which a served profile embedding is refreshed
+RECO_CACHE_SIZE = 10000  # Users whose last recommendations are kept, per kind
+RECO_CACHE_TTL = 600  # Seconds a cached recommendation list is served
+RECO_REFRESH_AHEAD = 60  # Refresh in the background once a hit is this close to expiry
+
+class _CachedRecommendations(NamedTuple):
+    """Last recommendation list computed for a user, with the arguments it was computed for"""
+    params: Tuple
+    limit: int
+    recommendations: List[Dict[str, Any]]
+    created_at: float
+
+def _is_stale(last_updated: Optional[datetime]) -> bool:
+    """Whether a stored embedding is older than PROFILE_REFRESH_INTERVAL"""
+    if last_updated is None:
+        return True
+    return datetime.now(timezone.utc) - last_updated > PROFILE_REFRESH_INTERVAL
+
+def _friend_ids_select(user_id: int):
+    """SELECT of a user's friend IDs, whichever side of the friendship they are on"""
+    return select(
+        case((Friendship.user1_id == user_id, Friendship.user2_id), else_=Friendship.user1_id)
+    ).where(or_(Friendship.user1_id == user_id, Friendship.user2_id == user_id))
+
+def _cosine_distance(column, query_embedding):
+    """pgvector cosine distance between a vector column and a query embedding"""
+    return column.op("<=>", return_type=Float)(bindparam("query_embedding", query_embedding, type_=column.type))
+
 class RAGRecommendationEngine:
     """AI-powered recommendation engine using RAG"""
     
     def __init__(self):
-        self.chroma_client = chroma_client
-        self.embedding_service = embedding_service
+        self.chroma_client = get_chroma_client()
+        self.embedding_service = get_embedding_service()
+        
+        # Chroma writes are queued and applied by a background worker, off the request path
+        self._chroma_write_queue: Optional[asyncio.Queue] = None
+        self._chroma_writer: Optional[asyncio.Task] = None
+        
+        # In-flight stale-while-revalidate profile refreshes, keyed by user ID
+        self._profile_refreshes: Dict[int, asyncio.Task] = {}
+        
+        # Last recommendations per user, served until they expire or are invalidated
+        self._friend_reco_cache = TTLCache(maxsize=RECO_CACHE_SIZE, ttl=RECO_CACHE_TTL)
+        self._event_reco_cache = TTLCache(maxsize=RECO_CACHE_SIZE, ttl=RECO_CACHE_TTL)
+        self._reco_refreshes: Dict[Tuple[int, int], asyncio.Task] = {}
+        self._reco_generation = 0  # Bumped on every invalidation
         logger.info("RAG Recommendation Engine initialized")
     
-    async def recommend_friends(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+    def start_chroma_writer(self):
+        """Start the background Chroma writer on the running event loop if it isn't running"""
+        if self._chroma_writer is None or self._chroma_writer.done():
+            self._chroma_write_queue = asyncio.Queue(maxsize=CHROMA_WRITE_QUEUE_SIZE)
+            self._chroma_writer = asyncio.create_task(self._chroma_writer_task())
+    
+    async def stop_chroma_writer(self):
+        """Apply any queued writes, then stop the background writer"""
+        if self._chroma_writer is None or self._chroma_writer.done():
+            return
+        
+        await self._chroma_write_queue.join()
+        self._chroma_writer.cancel()
+        try:
+            await self._chroma_writer
+        except asyncio.CancelledError:
+            pass
+    
+    async def _chroma_writer_task(self):
+        """Apply queued Chroma writes one at a time in a worker thread"""
+        queue = self._chroma_write_queue
+        while True:
+            write, args = await queue.get()
+            try:
+                await asyncio.to_thread(write, *args)
+            except Exception as e:
+                logger.error(f"Queued ChromaDB write {write.__name__} failed: {e}")
+            finally:
+                queue.task_done()
+    
+    def _queue_chroma_write(self, write: Callable, *args):
+        """Queue a ChromaDB client write (e.g. add_user_embedding) without waiting for it"""
+        self.start_chroma_writer()
+        try:
+            self._chroma_write_queue.put_nowait((write, args))
+        except asyncio.QueueFull:
+            # Writer has fallen far behind - write inline rather than drop the update
+            logger.warning("ChromaDB write queue full, writing synchronously")
+            write(*args)
+    
+    async def _cached_recommendations(self, cache: TTLCache, user_id: int, params: Tuple, limit: int,
+                                      compute: Callable, db: Session) -> List[Dict[str, Any]]:
+        """Serve recommendations from cache, computing them on a miss and refreshing them near expiry"""
+        entry = cache.get(user_id)
+        if entry and entry.params == params and entry.limit >= limit:
+            if time.monotonic() - entry.created_at > RECO_CACHE_TTL - RECO_REFRESH_AHEAD:
+                self._schedule_reco_refresh(cache, user_id, params, entry.limit, compute)
+            return entry.recommendations[:limit]
+        
+        return await self._compute_and_cache(cache, user_id, params, limit, compute, db)
+    
+    async def _compute_and_cache(self, cache: TTLCache, user_id: int, params: Tuple, limit: int,
+                                 compute: Callable, db: Session) -> List[Dict[str, Any]]:
+        """Compute recommendations and cache them; empty results (often failures) are not cached"""
+        generation = self._reco_generation
+        recommendations = await compute(limit, db)
+        
+        # Skip if an invalidation landed while computing, so stale results aren't cached
+        if recommendations and generation == self._reco_generation:
+            cache[user_id] = _CachedRecommendations(params, limit, recommendations, time.monotonic())
+        return recommendations
+    
+    def _schedule_reco_refresh(self, cache: TTLCache, user_id: int, params: Tuple, limit: int, compute: Callable):
+        """Recompute a user's cached recommendations in the background unless already running"""
+        key = (id(cache), user_id)
+        if key in self._reco_refreshes:
+            return
+        
+        task = asyncio.create_task(self._refresh_recommendations_bg(cache, user_id, params, limit, compute))
+        self._reco_refreshes[key] = task
+        task.add_done_callback(lambda _: self._reco_refreshes.pop(key, None))
+    
+    async def _refresh_recommendations_bg(self, cache: TTLCache, user_id: int, params: Tuple, limit: int,
+                                          compute: Callable):
+        """Background refreshes outlive the request, so they use their own session"""
+        db = SessionLocal()
+        try:
+            await self._compute_and_cache(cache, user_id, params, limit, compute, db)
+        finally:
+            db.close()
+    
+    def invalidate_friend_recommendations(self, *user_ids: int):
+        """Drop cached friend recommendations for the given users"""
+        self._invalidate(self._friend_reco_cache, user_ids)
+    
+    def invalidate_event_recommendations(self, *user_ids: int):
+        """Drop cached event recommendations for the given users, or for everyone if none are given"""
+        self._invalidate(self._event_reco_cache, user_ids)
+    
+    def _invalidate(self, cache: TTLCache, user_ids: Tuple[int, ...]):
+        """Evict users from a recommendation cache"""
+        self._reco_generation += 1  # In-flight computations started before this won't be cached
+        if not user_ids:
+            cache.clear()
+        for user_id in user_ids:
+            cache.pop(user_id, None)
+    
+    async def recommend_friends(self, user_id: int, db: Session, limit: int = 10) -> List[Dict[str, Any]]:
         """Recommend potential friends based on embedding similarity"""
+        return await self._cached_recommendations(
+            self._friend_reco_cache, user_id, (), limit,
+            lambda n, session: self._compute_friend_recommendations(user_id, n, session), db
+        )
+    
+    async def recommend_events_to_user(self, user_id: int, user_lat: float, user_lng: float, db: Session,
+                                     limit: int = 10) -> List[Dict[str, Any]]:
+        """Recommend events based on similarity (location filtering disabled for testing)"""
+        # Distances are part of the result, so the caller's location is part of the cache entry
+        return await self._cached_recommendations(
+            self._event_reco_cache, user_id, (user_lat, user_lng), limit,
+            lambda n, session: self._compute_event_recommendations(user_id, user_lat, user_lng, n, session), db
+        )
+    
+    async def _compute_friend_recommendations(self, user_id: int, limit: int, db: Session) -> List[Dict[str, Any]]:
+        """Rank potential friends for a user, bypassing the cache"""
         try:
-            db = SessionLocal()
-            
             # Get current user
             current_user = db.query(User).filter(User.id == user_id).first()
             if not current_user or not current_user.open_to_friends:
@@ -38,33 +199,56 @@ class RAGRecommendationEngine:
             
             # Get user's profile embedding (simplified for testing)
             user_embedding = await self._get_user_profile_embedding(user_id, db)
-            if not user_embedding:
+            if user_embedding is None:
                 logger.warning(f"No embedding found for user {user_id}")
                 return []
             
             # Get users to exclude (existing friends, pending requests, declined requests)
-            exclude_user_ids = await self._get_excluded_user_ids(user_id, db)
-            exclude_user_ids.append(user_id)  # Exclude self
-            
-            # Query ChromaDB for similar users (no location filtering for testing)
-            similar_users = self.chroma_client.query_similar_users(
-                query_embedding=user_embedding,
-                n_results=limit * 3,  # Get extra to filter out excluded users
-                exclude_user_ids=exclude_user_ids
+            # The friend set is fetched once here and reused for mutual-friend counts
+            exclude_user_ids, friend_ids = await self._get_excluded_user_ids(user_id, db)
+            exclude_user_ids.add(user_id)  # Exclude self
+            
+            # Resolve eligible candidates in SQL so ChromaDB only ranks users we can recommend
+            candidate_ids = db.execute(
+                select(User.id).where(
+                    User.is_active == True,
+                    User.open_to_friends == True,
+                    User.id.not_in(exclude_user_ids)
+                )
+            ).scalars().all()
+            if not candidate_ids:
+                return []
+            
+            # With pgvector the database ranks candidates itself; otherwise ChromaDB does
+            if uses_pgvector(db.get_bind().dialect):
+                similar_users = self._rank_users_in_sql(user_embedding, candidate_ids, limit, db)
+            else:
+                # Query ChromaDB for similar users (no location filtering for testing)
+                similar_users = self.chroma_client.query_similar_users(
+                    query_embedding=user_embedding,
+                    n_results=limit,
+                    user_ids=candidate_ids
+                )
+            
+            # Mutual friend counts for every candidate in one grouped query
+            mutual_counts = self._batch_mutual_friend_counts(
+                friend_ids, [result['user_id'] for result in similar_users], db
             )
             
+            # Load every recommended user in one query
+            users_by_id = {user.id: user for user in db.query(User).filter(
+                User.id.in_([result['user_id'] for result in similar_users]),
+                User.is_active == True,
+                User.open_to_friends == True
+            ).all()}
+            
             # Format recommendations with user details
             recommendations = []
-            for result in similar_users[:limit]:
-                user_detail = db.query(User).filter(
-                    User.id == result['user_id'],
-                    User.is_active == True,
-                    User.open_to_friends == True
-                ).first()
+            for result in similar_users:
+                user_detail = users_by_id.get(result['user_id'])
                 
-                if user_detail and user_detail.id not in exclude_user_ids:
-                    # Get mutual friends count
-                    mutual_count = self._get_mutual_friends_count(user_id, user_detail.id, db)
+                if user_detail:
+                    mutual_count = mutual_counts.get(user_detail.id, 0)
                     
                     recommendations.append({
                         "user_id": user_detail.id,
@@ -78,7 +262,6 @@ class RAGRecommendationEngine:
                         "reason": self._generate_friend_reason(current_user, user_detail)
                     })
             
-            db.close()
             logger.info(f"Generated {len(recommendations)} friend recommendations for user {user_id}")
             return recommendations
             
@@ -86,70 +269,46 @@ class RAGRecommendationEngine:
             logger.error(f"Failed to generate friend recommendations for user {user_id}: {e}")
             return []
     
-    async def recommend_events_to_user(self, user_id: int, user_lat: float, user_lng: float, 
-                                     limit: int = 10) -> List[Dict[str, Any]]:
-        """Recommend events based on similarity (location filtering disabled for testing)"""
+    async def _compute_event_recommendations(self, user_id: int, user_lat: float, user_lng: float,
+                                             limit: int, db: Session) -> List[Dict[str, Any]]:
+        """Rank events for a user, bypassing the cache"""
         try:
-            db = SessionLocal()
-            
             # Get user's profile embedding (simplified for testing)
             user_embedding = await self._get_user_profile_embedding(user_id, db)
-            if not user_embedding:
+            if user_embedding is None:
                 return []
             
-            # Get all public events (no location filtering for testing)
-            all_events = db.query(Event).filter(
-                Event.is_active == True,
-                Event.visibility == "public"  # Only recommend public events
-            ).all()
-            
-            if not all_events:
-                logger.info(f"No public events available for user {user_id}")
-                return []
-            
-            # Get events user has declined
-            declined_event_ids = self._get_declined_event_ids(user_id, db)
+            # With pgvector, filtering, ranking and the limit happen in one SQL query
+            if uses_pgvector(db.get_bind().dialect):
+                matches = self._rank_events_in_sql(user_embedding, limit, db, self._get_declined_event_ids(user_id, db))
+            else:
+                matches = self._rank_events_in_chroma(user_id, user_embedding, limit, db)
             
-            # Filter out declined events and expired events
-            valid_events = [e for e in all_events if e.id not in declined_event_ids and not e.is_expired()]
-            if not valid_events:
-                return []
-            
-            # Query ChromaDB for similar events
-            event_ids = [event.id for event in valid_events]
-            similar_events = self.chroma_client.query_similar_events(
-                query_embedding=user_embedding,
-                n_results=limit,
-                event_ids=event_ids
-            )
+            # Calculate all distances at once if coordinates provided (for display only)
+            distances = None
+            if user_lat and user_lng:
+                distances = self._calculate_distances(user_lat, user_lng, [event for _, event in matches])
             
             # Format recommendations
             recommendations = []
-            for result in similar_events:
-                event = next((e for e in valid_events if e.id == result['event_id']), None)
-                if event and event.is_active and not event.is_expired():
-                    # Calculate distance if coordinates provided (for display only)
-                    distance_miles = None
-                    if user_lat and user_lng:
-                        distance_miles = self._calculate_distance(
-                            user_lat, user_lng, event.latitude, event.longitude
-                        )
-                    
-                    recommendations.append({
-                        "event_id": event.id,
-                        "title": event.title,
-                        "description": event.description,
-                        "location_name": event.location_name,
-                        "start_time": event.start_time.isoformat(),
-                        "end_time": event.end_time.isoformat(),
-                        "attendee_count": event.attendee_count,
-                        "distance_miles": round(distance_miles, 2) if distance_miles else None,
-                        "similarity_score": 1.0 - (result.get('distance', 0.5)),
-                        "can_rsvp": event.can_rsvp(user_id),
-                        "reason": self._generate_event_reason(event)
-                    })
+            now = datetime.now(timezone.utc)
+            for i, (result, event) in enumerate(matches):
+                distance_miles = float(distances[i]) if distances is not None else None
+                
+                recommendations.append({
+                    "event_id": event.id,
+                    "title": event.title,
+                    "description": event.description,
+                    "location_name": event.location_name,
+                    "start_time": event.start_time,
+                    "end_time": event.end_time,
+                    "attendee_count": event.attendee_count,
+                    "distance_miles": round(distance_miles, 2) if distance_miles else None,
+                    "similarity_score": 1.0 - (result.get('distance', 0.5)),
+                    "can_rsvp": event.can_rsvp(user_id, now),
+                    "reason": self._generate_event_reason(event)
+                })
             
-            db.close()
             logger.info(f"Generated {len(recommendations)} event recommendations for user {user_id}")
             return recommendations
             
@@ -157,62 +316,109 @@ class RAGRecommendationEngine:
             logger.error(f"Failed to generate event recommendations for user {user_id}: {e}")
             return []
     
-    async def recommend_events_to_group(self, group_id: int, admin_lat: float, admin_lng: float, 
+    def _rank_events_in_chroma(self, user_id: int, user_embedding, limit: int,
+                               db: Session) -> List[Tuple[Dict[str, Any], Event]]:
+        """Rank a user's candidate events by ChromaDB similarity, as (result, event) pairs"""
+        # Get all unexpired public events (no location filtering for testing)
+        all_events = db.query(Event).filter(
+            Event.is_active == True,
+            Event.visibility == "public",  # Only recommend public events
+            Event.expires_at > datetime.now(timezone.utc)
+        ).options(*Event.listing_options(user_id)).all()
+        
+        if not all_events:
+            logger.info(f"No public events available for user {user_id}")
+            return []
+        
+        # Get events user has declined
+        declined_event_ids = self._get_declined_event_ids(user_id, db)
+        
+        # Filter out declined events
+        valid_events = [e for e in all_events if e.id not in declined_event_ids]
+        if not valid_events:
+            return []
+        
+        # Query ChromaDB for similar events
+        event_ids = [event.id for event in valid_events]
+        similar_events = self.chroma_client.query_similar_events(
+            query_embedding=user_embedding,
+            n_results=limit,
+            event_ids=event_ids
+        )
+        
+        # Pair each result with its event
+        events_by_id = {event.id: event for event in valid_events}
+        matches = [(result, events_by_id.get(result['event_id'])) for result in similar_events]
+        return [(result, event) for result, event in matches if event]
+    
+    def _rank_users_in_sql(self, query_embedding, candidate_ids: List[int], limit: int,
+                           db: Session) -> List[Dict[str, Any]]:
+        """Rank candidate users by pgvector cosine distance to a profile embedding"""
+        distance = _cosine_distance(UserEmbedding.profile_embedding, query_embedding)
+        rows = db.execute(
+            select(UserEmbedding.user_id, distance.label("distance"))
+            .where(UserEmbedding.user_id.in_(candidate_ids))
+            .order_by(distance)
+            .limit(limit)
+        ).all()
+        return [{"user_id": user_id, "distance": distance} for user_id, distance in rows]
+    
+    def _rank_events_in_sql(self, query_embedding, limit: int, db: Session,
+                            exclude_event_ids=()) -> List[Tuple[Dict[str, Any], Event]]:
+        """Rank candidate events by pgvector cosine distance, as (result, event) pairs"""
+        distance = _cosine_distance(EventEmbedding.event_embedding, query_embedding)
+        rows = db.execute(
+            select(Event, distance.label("distance"))
+            .join(EventEmbedding, EventEmbedding.event_id == Event.id)
+            .where(
+                Event.is_active == True,
+                Event.visibility == "public",  # Only recommend public events
+                Event.expires_at > datetime.now(timezone.utc),
+                Event.id.not_in(exclude_event_ids)
+            )
+            .order_by(distance)
+            .limit(limit)
+            .options(raiseload("*"))
+        ).all()
+        return [({"event_id": event.id, "distance": distance}, event) for event, distance in rows]
+    
+    async def recommend_events_to_group(self, group_id: int, admin_lat: float, admin_lng: float, db: Session,
                                       limit: int = 5) -> List[Dict[str, Any]]:
         """Recommend events to group admins (location filtering disabled for testing)"""
         try:
-            db = SessionLocal()
-            
-            # Get group embedding
-            group_embedding = self.chroma_client.get_group_embedding(group_id)
-            if not group_embedding:
-                logger.warning(f"No embedding found for group {group_id}")
-                return []
-            
-            # Get all public events (no location filtering for testing)
-            all_events = db.query(Event).filter(
-                Event.is_active == True,
-                Event.visibility == "public"
-            ).all()
-            
-            if not all_events:
-                return []
-            
-            # Query ChromaDB for similar events
-            event_ids = [event.id for event in all_events if event.is_active and not event.is_expired()]
-            if not event_ids:
-                return []
+            if uses_pgvector(db.get_bind().dialect):
+                # The group's stored embedding is the query; ranking happens in SQL
+                group_embedding = db.execute(
+                    select(GroupEmbedding.group_embedding).where(GroupEmbedding.group_id == group_id)
+                ).scalar()
+                if group_embedding is None:
+                    logger.warning(f"No embedding found for group {group_id}")
+                    return []
+                matches = self._rank_events_in_sql(group_embedding, limit, db)
+            else:
+                matches = self._rank_group_events_in_chroma(group_id, limit, db)
             
-            similar_events = self.chroma_client.query_similar_events(
-                query_embedding=group_embedding,
-                n_results=limit,
-                event_ids=event_ids
-            )
+            # Calculate all distances at once if coordinates provided (for display only)
+            distances = None
+            if admin_lat and admin_lng:
+                distances = self._calculate_distances(admin_lat, admin_lng, [event for _, event in matches])
             
             # Format recommendations
             recommendations = []
-            for result in similar_events:
-                event = next((e for e in all_events if e.id == result['event_id']), None)
-                if event:
-                    # Calculate distance if coordinates provided (for display only)
-                    distance_miles = None
-                    if admin_lat and admin_lng:
-                        distance_miles = self._calculate_distance(
-                            admin_lat, admin_lng, event.latitude, event.longitude
-                        )
-                    
-                    recommendations.append({
-                        "event_id": event.id,
-                        "title": event.title,
-                        "description": event.description,
-                        "location_name": event.location_name,
-                        "start_time": event.start_time.isoformat(),
-                        "distance_miles": round(distance_miles, 2) if distance_miles else None,
-                        "similarity_score": 1.0 - (result.get('distance', 0.5)),
-                        "reason": f"This event aligns with your group's interests and activities"
-                    })
+            for i, (result, event) in enumerate(matches):
+                distance_miles = float(distances[i]) if distances is not None else None
+                
+                recommendations.append({
+                    "event_id": event.id,
+                    "title": event.title,
+                    "description": event.description,
+                    "location_name": event.location_name,
+                    "start_time": event.start_time,
+                    "distance_miles": round(distance_miles, 2) if distance_miles else None,
+                    "similarity_score": 1.0 - (result.get('distance', 0.5)),
+                    "reason": f"This event aligns with your group's interests and activities"
+                })
             
-            db.close()
             logger.info(f"Generated {len(recommendations)} event recommendations for group {group_id}")
             return recommendations
             
@@ -220,174 +426,213 @@ class RAGRecommendationEngine:
             logger.error(f"Failed to generate event recommendations for group {group_id}: {e}")
             return []
     
-    async def _get_user_profile_embedding(self, user_id: int, db: Session) -> Optional[List[float]]:
+    def _rank_group_events_in_chroma(self, group_id: int, limit: int,
+                                     db: Session) -> List[Tuple[Dict[str, Any], Event]]:
+        """Rank events for a group by ChromaDB similarity to its embedding, as (result, event) pairs"""
+        # Get group embedding
+        group_embedding = self.chroma_client.get_group_embedding(group_id)
+        if group_embedding is None:
+            logger.warning(f"No embedding found for group {group_id}")
+            return []
+        
+        # Get all unexpired public events (no location filtering for testing)
+        all_events = db.query(Event).filter(
+            Event.is_active == True,
+            Event.visibility == "public",
+            Event.expires_at > datetime.now(timezone.utc)
+        ).options(raiseload("*")).all()
+        
+        if not all_events:
+            return []
+        
+        # Query ChromaDB for similar events
+        event_ids = [event.id for event in all_events]
+        similar_events = self.chroma_client.query_similar_events(
+            query_embedding=group_embedding,
+            n_results=limit,
+            event_ids=event_ids
+        )
+        
+        # Pair each result with its event
+        events_by_id = {event.id: event for event in all_events}
+        matches = [(result, events_by_id.get(result['event_id'])) for result in similar_events]
+        return [(result, event) for result, event in matches if event]
+    
+    async def _get_user_profile_embedding(self, user_id: int, db: Session) -> Optional[Union[List[float], np.ndarray]]:
         """Get user's profile embedding from database or generate new one (simplified for testing)"""
         try:
-            from models.embeddings import UserEmbedding
-            
             # First try to get from database
             user_embedding = db.query(UserEmbedding).filter(UserEmbedding.user_id == user_id).first()
             
-            if user_embedding and user_embedding.profile_embedding:
+            # Embeddings stored before a dimension change are regenerated below
+            if (user_embedding and user_embedding.profile_embedding is not None
+                    and len(user_embedding.profile_embedding) == settings.EMBEDDING_DIMENSIONS):
+                # Serve the stored embedding now; refresh a stale one in the background
+                if _is_stale(user_embedding.last_updated):
+                    self._schedule_profile_refresh(user_id)
                 return user_embedding.profile_embedding
             
-            # If not in database, try to generate new embedding
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                return None
-            
-            profile_emb = await self.embedding_service.generate_user_profile_embedding(user)
-            
-            if profile_emb:
-                # Save to database
-                if user_embedding:
-                    user_embedding.profile_embedding = profile_emb
-                    user_embedding.last_updated = datetime.now(timezone.utc)
-                else:
-                    user_embedding = UserEmbedding(
-                        user_id=user_id,
-                        profile_embedding=profile_emb,
-                        message_embedding=None  # Not using message embeddings for testing
-                    )
-                    db.add(user_embedding)
-                
-                db.commit()
-                
-                # Add to ChromaDB with only profile embedding
-                self.chroma_client.add_user_embedding(user_id, profile_emb, [])
-                
-                return profile_emb
-            
-            return None
+            # Nothing usable cached - generate while the caller waits
+            return await self._generate_profile_embedding(user_id, user_embedding, db)
             
         except Exception as e:
             logger.error(f"Failed to get profile embedding for user {user_id}: {e}")
             return None
     
-    async def _get_excluded_user_ids(self, user_id: int, db: Session) -> List[int]:
-        """Get list of user IDs to exclude from recommendations"""
-        excluded_ids = []
+    async def _generate_profile_embedding(self, user_id: int, user_embedding, db: Session) -> Optional[List[float]]:
+        """Generate a user's profile embedding and store it in the database and ChromaDB"""
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return None
         
-        try:
-            # Get existing friends
-            friendships = db.query(Friendship).filter(
-                or_(
-                    Friendship.user1_id == user_id,
-                    Friendship.user2_id == user_id
+        profile_emb = await self.embedding_service.generate_user_profile_embedding(user)
+        
+        if profile_emb:
+            # Save to database
+            if user_embedding:
+                user_embedding.profile_embedding = profile_emb
+                user_embedding.last_updated = datetime.now(timezone.utc)
+            else:
+                user_embedding = UserEmbedding(
+                    user_id=user_id,
+                    profile_embedding=profile_emb,
+                    message_embedding=None  # Not using message embeddings for testing
                 )
-            ).all()
+                db.add(user_embedding)
+            
+            db.commit()
+            
+            # Add to ChromaDB with only profile embedding, in the background
+            self._queue_chroma_write(self.chroma_client.add_user_embedding, user_id, profile_emb, [])
+            
+            return profile_emb
+        
+        return None
+    
+    def _schedule_profile_refresh(self, user_id: int):
+        """Start a background refresh of a user's profile embedding unless one is already running"""
+        if user_id in self._profile_refreshes:
+            return
+        
+        task = asyncio.create_task(self._refresh_user_embedding_bg(user_id))
+        self._profile_refreshes[user_id] = task
+        task.add_done_callback(lambda _: self._profile_refreshes.pop(user_id, None))
+    
+    async def _refresh_user_embedding_bg(self, user_id: int):
+        """Regenerate a stale profile embedding with its own session"""
+        from models.embeddings import UserEmbedding
+        
+        db = SessionLocal()
+        try:
+            user_embedding = db.query(UserEmbedding).filter(UserEmbedding.user_id == user_id).first()
+            await self._generate_profile_embedding(user_id, user_embedding, db)
+            logger.debug(f"Refreshed stale profile embedding for user {user_id}")
             
-            for friendship in friendships:
-                friend_id = friendship.user2_id if friendship.user1_id == user_id else friendship.user1_id
-                excluded_ids.append(friend_id)
+        except Exception as e:
+            logger.error(f"Failed to refresh profile embedding for user {user_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
+    async def _get_excluded_user_ids(self, user_id: int, db: Session) -> Tuple[Set[int], Set[int]]:
+        """Get user IDs to exclude from recommendations, plus the user's own friend IDs"""
+        try:
+            # Get existing friends
+            friend_ids = set(db.execute(_friend_ids_select(user_id)).scalars())
             
             # Get pending/declined friend requests
-            requests = db.query(FriendRequest).filter(
+            requests = db.query(FriendRequest.sender_id, FriendRequest.recipient_id).filter(
                 or_(
                     FriendRequest.sender_id == user_id,
                     FriendRequest.recipient_id == user_id
                 )
             ).all()
             
-            for request in requests:
-                other_id = request.recipient_id if request.sender_id == user_id else request.sender_id
-                excluded_ids.append(other_id)
+            excluded_ids = set(friend_ids)
+            for sender_id, recipient_id in requests:
+                excluded_ids.add(recipient_id if sender_id == user_id else sender_id)
             
-            return list(set(excluded_ids))  # Remove duplicates
+            return excluded_ids, friend_ids
             
         except Exception as e:
             logger.error(f"Failed to get excluded user IDs: {e}")
-            return []
+            return set(), set()
     
-    def _get_mutual_friends_count(self, user1_id: int, user2_id: int, db: Session) -> int:
-        """Get count of mutual friends between two users"""
+    def _batch_mutual_friend_counts(self, friend_ids: Set[int], candidate_ids: List[int],
+                                    db: Session) -> Dict[int, int]:
+        """Count mutual friends between the caller (given their friend IDs) and each candidate"""
+        if not friend_ids or not candidate_ids:
+            return {}
+        
         try:
-            # Get user1's friends
-            user1_friends = db.query(Friendship).filter(
-                or_(
-                    Friendship.user1_id == user1_id,
-                    Friendship.user2_id == user1_id
-                )
+            # Friendships are stored one way round, so take both orientations of each row
+            pairs = select(
+                Friendship.user1_id.label("candidate_id"), Friendship.user2_id.label("friend_id")
+            ).union_all(
+                select(Friendship.user2_id, Friendship.user1_id)
+            ).subquery()
+            
+            rows = db.execute(
+                select(pairs.c.candidate_id, func.count())
+                .where(pairs.c.candidate_id.in_(candidate_ids), pairs.c.friend_id.in_(friend_ids))
+                .group_by(pairs.c.candidate_id)
             ).all()
-            
-            user1_friend_ids = set()
-            for f in user1_friends:
-                friend_id = f.user2_id if f.user1_id == user1_id else f.user1_id
-                user1_friend_ids.add(friend_id)
-            
-            # Get user2's friends
-            user2_friends = db.query(Friendship).filter(
-                or_(
-                    Friendship.user1_id == user2_id,
-                    Friendship.user2_id == user2_id
-                )
-            ).all()
-            
-            user2_friend_ids = set()
-            for f in user2_friends:
-                friend_id = f.user2_id if f.user1_id == user2_id else f.user1_id
-                user2_friend_ids.add(friend_id)
-            
-            # Count mutual friends
-            return len(user1_friend_ids.intersection(user2_friend_ids))
+            return dict(rows)
             
         except Exception as e:
-            logger.error(f"Failed to get mutual friends count: {e}")
-            return 0
+            logger.error(f"Failed to get mutual friend counts: {e}")
+            return {}
     
-    def _get_declined_event_ids(self, user_id: int, db: Session) -> List[int]:
-        """Get list of event IDs user has declined"""
+    def _get_declined_event_ids(self, user_id: int, db: Session) -> Set[int]:
+        """Get IDs of events the user has declined"""
         try:
-            declined_ids = []
-            events = db.query(Event).filter(Event.is_active == True).all()
-            
-            for event in events:
-                user_rsvp = event.get_user_rsvp(user_id)
-                if user_rsvp and user_rsvp.get('status') == 'no':
-                    declined_ids.append(event.id)
-            
-            return declined_ids
+            declined = db.execute(
+                select(EventRsvp.event_id)
+                .join(Event, Event.id == EventRsvp.event_id)
+                .where(
+                    EventRsvp.user_id == user_id,
+                    EventRsvp.status == "no",
+                    Event.is_active == True
+                )
+            ).scalars()
+            return set(declined)
             
         except Exception as e:
             logger.error(f"Failed to get declined event IDs: {e}")
-            return []
+            return set()
     
-    def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calculate distance in miles using Haversine formula"""
-        # Convert latitude and longitude from degrees to radians
-        lat1, lng1, lat2, lng2 = map(math.radians, [lat1, lng1, lat2, lng2])
+    def _calculate_distances(self, lat: float, lng: float, events: List[Event]) -> np.ndarray:
+        """Calculate distances in miles from a point to each event using the Haversine formula"""
+        # Convert latitude and longitude from degrees to radians, whole array at once
+        lat0, lng0 = np.radians(lat), np.radians(lng)
+        lats = np.radians(np.fromiter((event.latitude for event in events), dtype=np.float64, count=len(events)))
+        lngs = np.radians(np.fromiter((event.longitude for event in events), dtype=np.float64, count=len(events)))
         
         # Haversine formula
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlng/2)**2
-        c = 2 * math.asin(math.sqrt(a))
+        dlat = lats - lat0
+        dlng = lngs - lng0
+        a = np.sin(dlat * 0.5) ** 2 + np.cos(lat0) * np.cos(lats) * np.sin(dlng * 0.5) ** 2
         
-        # Radius of earth in miles
-        r = 3956
-        
-        return c * r
+        return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
     
     def _generate_friend_reason(self, current_user: User, potential_friend: User) -> str:
         """Generate a reason why users might be compatible"""
-        reasons = []
-        
-        # Check for common interests
-        current_interests = set(current_user.interests or [])
-        potential_interests = set(potential_friend.interests or [])
-        common_interests = current_interests.intersection(potential_interests)
+        current_interests = current_user.interests
+        potential_interests = potential_friend.interests
         
-        if common_interests:
-            if len(common_interests) == 1:
-                reasons.append(f"You both love {list(common_interests)[0]}")
-            else:
-                reasons.append(f"You share interests in {', '.join(list(common_interests)[:2])}")
+        # New users often have no interests yet - skip building sets entirely
+        if not current_interests or not potential_interests:
+            return "You might have a lot in common"
         
-        # Default reason
-        if not reasons:
-            reasons.append("You might have a lot in common")
+        # Only the first two shared interests are shown, so stop looking after two
+        potential_set = set(potential_interests)
+        common_interests = list(islice((i for i in dict.fromkeys(current_interests) if i in potential_set), 2))
         
-        return reasons[0]
+        if not common_interests:
+            return "You might have a lot in common"
+        if len(common_interests) == 1:
+            return f"You both love {common_interests[0]}"
+        return f"You share interests in {', '.join(common_interests)}"
     
     def _generate_event_reason(self, event: Event) -> str:
         """Generate a reason why an event might be interesting"""
@@ -398,5 +643,16 @@ class RAGRecommendationEngine:
         else:
             return "Great opportunity to meet new people"
 
-# Global instance
-rag_engine = RAGRecommendationEngine() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_rag_engine() -> RAGRecommendationEngine:
+    """Get the shared recommendation engine, created on first use rather than at import"""
+    return RAGRecommendationEngine()
+
+def invalidate_recommendations(*user_ids: int, friends: bool = False, events: bool = False):
+    """Drop cached recommendations after a change; a no-op if the engine hasn't been created"""
+    if not get_rag_engine.cache_info().currsize:
+        return
+    if friends:
+        get_rag_engine().invalidate_friend_recommendations(*user_ids)
+    if events:
+        get_rag_engine().invalidate_event_recommendations(*user_ids) 
\ No newline at end of file
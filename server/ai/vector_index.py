@@ -0,0 +1,369 @@
+"""
+In-memory exact vector index for LadChat
+Mirrors a ChromaDB collection into FAISS (or a NumPy matrix) for fast brute-force search on small collections
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Any, Set, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+try:
+    import fcntl
+except ImportError:  # Windows - persisted matrices are then disabled, as a single writer can't be enforced
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Above this size exact search stops paying off - fall back to Chroma's HNSW
+EXACT_MAX_VECTORS = 100_000
+# FAISS keeps vectors as float16 codes: half the memory and bandwidth, same rankings for unit vectors
+FAISS_QUANTIZER = "QT_fp16"
+MIN_MATRIX_CAPACITY = 1024  # Rows preallocated by an empty EmbeddingMatrix
+
+class EmbeddingMatrix:
+    """(N, D) float32 matrix with a parallel int64 ID array; deleted rows are nulled out with ID -1"""
+
+    def __init__(self, dims: int):
+        self.dims = dims
+        self._vectors = np.zeros((0, dims), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._used = 0  # Rows handed out so far, live or deleted
+        self._rows: Dict[int, int] = {}
+
+    def _allocate(self, capacity: int) -> Tuple[np.ndarray, np.ndarray]:
+        """New storage for capacity rows"""
+        return np.zeros((capacity, self.dims), dtype=np.float32), np.full(capacity, -1, dtype=np.int64)
+
+    def _replace_storage(self, vectors: np.ndarray, ids: np.ndarray):
+        """Swap in storage returned by _allocate"""
+        self._vectors, self._ids = vectors, ids
+
+    def reset(self, entity_ids: np.ndarray, vectors: np.ndarray):
+        """Replace the contents, leaving room to grow"""
+        count = len(entity_ids)
+        new_vectors, new_ids = self._allocate(max(2 * count, MIN_MATRIX_CAPACITY))
+        new_vectors[:count] = vectors
+        new_ids[:count] = entity_ids
+        self._replace_storage(new_vectors, new_ids)
+        self._used = count
+        self._rows = {int(entity_id): row for row, entity_id in enumerate(entity_ids)}
+
+    def upsert(self, entity_ids: List[int], vectors: np.ndarray):
+        """Overwrite existing rows in place and append new ones"""
+        for entity_id, vector in zip(entity_ids, vectors):
+            row = self._rows.get(entity_id)
+            if row is None:
+                if self._used == len(self._ids):
+                    self.reset(*self.live())  # Compacts deleted rows and doubles capacity
+                row = self._used
+                self._used += 1
+                self._ids[row] = entity_id
+                self._rows[entity_id] = row
+            self._vectors[row] = vector
+
+    def delete(self, entity_ids: List[int]):
+        """Null out rows; their space is reclaimed on the next resize"""
+        for entity_id in entity_ids:
+            row = self._rows.pop(entity_id, None)
+            if row is not None:
+                self._ids[row] = -1
+                self._vectors[row] = 0
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Matrix and IDs of every handed-out row, without copying; deleted rows have ID -1"""
+        return self._vectors[:self._used], self._ids[:self._used]
+
+    def live(self) -> Tuple[np.ndarray, np.ndarray]:
+        """IDs and vectors of the live rows only"""
+        vectors, ids = self.view()
+        keep = ids >= 0
+        return ids[keep], vectors[keep]
+
+    def entity_ids(self) -> Set[int]:
+        """IDs of the live rows"""
+        return set(self._rows)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+class PersistentEmbeddingMatrix(EmbeddingMatrix):
+    """
+    EmbeddingMatrix kept in memory-mapped .npy files, so a restart maps it back instead of rebuilding it.
+    Only the process holding the lock file writes them, and a marker file exists only while they
+    mirror the collection - any other write to the collection removes it, forcing a rebuild
+    """
+
+    def __init__(self, directory: Path, name: str, dims: int):
+        self.vectors_path = Path(directory) / f"{name}.f32.npy"
+        self.ids_path = Path(directory) / f"{name}.ids.i64.npy"
+        self.lock_path = Path(directory) / f"{name}.lock"
+        self.synced_path = Path(directory) / f"{name}.synced"
+        self._lock_file = None
+        super().__init__(dims)
+
+    def acquire(self) -> bool:
+        """Become the files' single writer for the life of the process; False if another process is"""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return False
+
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def mark_synced(self):
+        """Record that the files now hold exactly the collection's vectors"""
+        self.synced_path.touch()
+
+    def invalidate(self):
+        """The collection changed without the files following it - the next open() must fail"""
+        try:
+            self.synced_path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Failed to invalidate embedding matrix {self.vectors_path}: {e}")
+
+    def _allocate(self, capacity: int) -> Tuple[np.ndarray, np.ndarray]:
+        """New memory-mapped files next to the live ones, renamed into place by _replace_storage"""
+        vectors = np.lib.format.open_memmap(
+            self.vectors_path.with_suffix(".tmp"), mode="w+", dtype=np.float32, shape=(capacity, self.dims)
+        )
+        ids = np.lib.format.open_memmap(
+            self.ids_path.with_suffix(".tmp"), mode="w+", dtype=np.int64, shape=(capacity,)
+        )
+        ids[:] = -1
+        return vectors, ids
+
+    def _replace_storage(self, vectors: np.ndarray, ids: np.ndarray):
+        vectors.flush()
+        ids.flush()
+        os.replace(self.vectors_path.with_suffix(".tmp"), self.vectors_path)
+        os.replace(self.ids_path.with_suffix(".tmp"), self.ids_path)
+        super()._replace_storage(vectors, ids)
+
+    def open(self) -> bool:
+        """Map existing files; False if there are none or they don't fit the configured dimensions"""
+        try:
+            if not (self.synced_path.exists() and self.vectors_path.exists() and self.ids_path.exists()):
+                return False
+
+            vectors = np.load(self.vectors_path, mmap_mode="r+")
+            ids = np.load(self.ids_path, mmap_mode="r+")
+            if vectors.shape != (len(ids), self.dims):
+                return False
+
+            live_rows = np.flatnonzero(ids >= 0)
+            self._vectors, self._ids = vectors, ids
+            self._used = int(live_rows[-1]) + 1 if len(live_rows) else 0
+            self._rows = {int(ids[row]): int(row) for row in live_rows}
+            return True
+
+        except Exception as e:
+            logger.warning(f"Failed to open embedding matrix {self.vectors_path}: {e}")
+            return False
+
+class ExactIndex:
+    """Exact inner-product index over one ChromaDB collection, keyed by integer entity ID"""
+
+    def __init__(self, collection, id_field: str, store: Optional[PersistentEmbeddingMatrix] = None):
+        self.collection = collection
+        self.id_field = id_field  # Metadata key holding the entity ID ("user_id", "event_id")
+        self.store = store  # Optional on-disk copy that survives restarts
+        self._store_live = False  # This process owns the store and keeps it in step with the collection
+        self._loaded = False
+        self._metadatas: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        # FAISS backend
+        self._index = None
+
+        # NumPy backend
+        self._matrix: Optional[EmbeddingMatrix] = None
+
+    def _load(self) -> bool:
+        """Build the index on first use, from the persisted matrix when it matches the collection"""
+        if self._loaded:
+            return True
+
+        if self.collection.count() > EXACT_MAX_VECTORS:
+            return False
+
+        dims = self.collection.metadata.get("dimensions") if self.collection.metadata else None
+        if not dims:
+            return False
+
+        # The persisted matrix is only used by its single writer, and only trusted if no other write
+        # to the collection has invalidated it and it holds exactly the collection's IDs
+        owns_store = self.store is not None and self.store.acquire()
+        labels = None
+        if owns_store and self.store.open():
+            metadatas = self.collection.get(include=["metadatas"])['metadatas'] or []
+            if self.store.entity_ids() == {m[self.id_field] for m in metadatas}:
+                labels, vectors = self.store.live()
+
+        if labels is None:
+            results = self.collection.get(include=["embeddings", "metadatas"])
+            metadatas = results['metadatas'] or []
+            vectors = np.asarray(results['embeddings'], dtype=np.float32).reshape(len(metadatas), dims)
+            labels = np.array([m[self.id_field] for m in metadatas], dtype=np.int64)
+            if owns_store:
+                self.store.reset(labels, vectors)
+                self.store.mark_synced()
+
+        if faiss is not None:
+            quantizer = getattr(faiss.ScalarQuantizer, FAISS_QUANTIZER)
+            self._index = faiss.IndexIDMap2(
+                faiss.IndexScalarQuantizer(dims, quantizer, faiss.METRIC_INNER_PRODUCT)
+            )
+            if len(labels):
+                self._index.add_with_ids(np.ascontiguousarray(vectors), labels)
+        elif owns_store:
+            self._matrix = self.store
+        else:
+            self._matrix = EmbeddingMatrix(dims)
+            self._matrix.reset(labels, vectors)
+
+        self._metadatas = {m[self.id_field]: m for m in metadatas}
+        self._store_live = owns_store
+        self._loaded = True
+        logger.info(f"Loaded {len(labels)} vectors into {'FAISS' if faiss else 'NumPy'} index for '{self.collection.name}'")
+        return True
+
+    def _size(self) -> int:
+        """Number of vectors held"""
+        return self._index.ntotal if self._index is not None else len(self._matrix)
+
+    def _unload(self):
+        """Drop the in-memory copy; the next search reloads from Chroma"""
+        self._loaded = False
+        self._store_live = False
+        self._index = None
+        self._matrix = None
+        self._metadatas = {}
+
+    def _invalidate_store(self):
+        """A write this process won't mirror into the persisted matrix makes it stale"""
+        if self.store is not None and not self._store_live:
+            self.store.invalidate()
+
+    def upsert(self, entity_id: int, embedding: List[float], metadata: Dict[str, Any]):
+        """Mirror a Chroma upsert (no-op until the index has been loaded)"""
+        self.upsert_batch([entity_id], [embedding], [metadata])
+
+    def upsert_batch(self, entity_ids: List[int], embeddings: List[List[float]], metadatas: List[Dict[str, Any]]):
+        """Mirror a batched Chroma upsert (no-op until the index has been loaded)"""
+        with self._lock:
+            self._invalidate_store()
+            if not self._loaded:
+                return
+
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            if self._index is not None:
+                labels = np.array(entity_ids, dtype=np.int64)
+                self._index.remove_ids(labels)
+                self._index.add_with_ids(vectors, labels)
+            else:
+                self._matrix.upsert(entity_ids, vectors)
+            if self._store_live and self.store is not self._matrix:
+                self.store.upsert(entity_ids, vectors)
+            self._metadatas.update(zip(entity_ids, metadatas))
+
+            # Grew past the exact-search budget - hand queries back to Chroma
+            if self._size() > EXACT_MAX_VECTORS:
+                self._unload()
+
+    def delete(self, entity_id: int):
+        """Mirror a Chroma delete"""
+        self.delete_batch([entity_id])
+
+    def delete_batch(self, entity_ids: List[int]):
+        """Mirror a batched Chroma delete"""
+        with self._lock:
+            self._invalidate_store()
+            if not self._loaded:
+                return
+
+            if self._index is not None:
+                self._index.remove_ids(np.array(entity_ids, dtype=np.int64))
+            else:
+                self._matrix.delete(entity_ids)
+            if self._store_live and self.store is not self._matrix:
+                self.store.delete(entity_ids)
+            for entity_id in entity_ids:
+                self._metadatas.pop(entity_id, None)
+
+    def _search_numpy(self, queries: np.ndarray, n_results: int,
+                      include_ids: Optional[Set[int]], exclude_ids: Optional[Set[int]]):
+        """Score every row with one matrix product and select the top k with argpartition"""
+        vectors, ids = self._matrix.view()
+        scores = queries @ vectors.T
+
+        # Mask deleted rows and disallowed IDs before selection rather than filtering afterwards
+        scores[:, ids < 0] = -np.inf
+        if include_ids is not None:
+            scores[:, ~np.isin(ids, list(include_ids))] = -np.inf
+        elif exclude_ids:
+            scores[:, np.isin(ids, list(exclude_ids))] = -np.inf
+
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        labels = np.where(np.isfinite(top_scores), ids[top], -1)
+        return top_scores, labels
+
+    def _search_faiss(self, queries: np.ndarray, n_results: int,
+                      include_ids: Optional[Set[int]], exclude_ids: Optional[Set[int]]):
+        """Exact FAISS search with the ID filter applied inside the index"""
+        params = None
+        if include_ids is not None:
+            selector = faiss.IDSelectorBatch(np.array(sorted(include_ids), dtype=np.int64))
+            params = faiss.SearchParameters(sel=selector)
+        elif exclude_ids:
+            excluded = faiss.IDSelectorBatch(np.array(sorted(exclude_ids), dtype=np.int64))
+            selector = faiss.IDSelectorNot(excluded)
+            params = faiss.SearchParameters(sel=selector)
+
+        return self._index.search(queries, min(n_results, self._index.ntotal), params=params)
+
+    def search(self, query_embeddings: List[List[float]], n_results: int,
+               include_ids: Optional[Set[int]] = None,
+               exclude_ids: Optional[Set[int]] = None) -> Optional[List[List[Dict[str, Any]]]]:
+        """Exact top-k search for each query; returns None when the caller should query Chroma instead"""
+        with self._lock:
+            if not self._load():
+                return None
+
+            if self._size() == 0 or n_results <= 0:
+                return [[] for _ in query_embeddings]
+
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            if self._index is not None:
+                scores, labels = self._search_faiss(queries, n_results, include_ids, exclude_ids)
+            else:
+                scores, labels = self._search_numpy(queries, n_results, include_ids, exclude_ids)
+
+            # Unit vectors: inner product is cosine similarity, reported as Chroma's cosine distance
+            return [[{
+                "entity_id": int(label),
+                "distance": 1.0 - float(score),
+                "metadata": self._metadatas[int(label)]
+            } for score, label in zip(row_scores, row_labels) if label >= 0]
+                for row_scores, row_labels in zip(scores, labels)]
@@ -1,20 +1,166 @@
-from datetime import datetime, timedelta
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import math
+import threading
+import time
+from pathlib import Path
+from datetime import timedelta
 from typing import Optional, Union
-from jose import JWTError, jwt
+from cachetools import TTLCache
+import jwt
+from jwt import PyJWTError as JWTError
 from passlib.context import CryptContext
+from passlib.hash import argon2
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, make_transient_to_detached
 from config import settings
 from database import get_db
 from models.user import User
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# bcrypt cost calibration - the picked rounds are saved to settings.BCRYPT_ROUNDS_FILE so restarts skip the measurement
+BCRYPT_CALIBRATION_ROUNDS = 10
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 15
+BCRYPT_DEFAULT_ROUNDS = 12
+
+def _calibrated_bcrypt_rounds() -> int:
+    """Saved rounds, else rounds measured so one hash takes about BCRYPT_TARGET_MS"""
+    rounds_file = Path(settings.BCRYPT_ROUNDS_FILE)
+    try:
+        return int(rounds_file.read_text())
+    except (OSError, ValueError):
+        pass
+    
+    try:
+        import bcrypt
+        start = time.perf_counter()
+        bcrypt.hashpw(b"calibration", bcrypt.gensalt(BCRYPT_CALIBRATION_ROUNDS))
+        elapsed = time.perf_counter() - start
+        
+        # Each extra round doubles the work
+        rounds = BCRYPT_CALIBRATION_ROUNDS + round(math.log2(settings.BCRYPT_TARGET_MS / 1000 / elapsed))
+        rounds = max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, rounds))
+        logger.info(f"Calibrated bcrypt to {rounds} rounds ({elapsed * 1000:.1f}ms at {BCRYPT_CALIBRATION_ROUNDS})")
+    except Exception as e:
+        logger.error(f"Failed to calibrate bcrypt rounds, using {BCRYPT_DEFAULT_ROUNDS}: {e}")
+        return BCRYPT_DEFAULT_ROUNDS
+    
+    try:
+        rounds_file.parent.mkdir(parents=True, exist_ok=True)
+        rounds_file.write_text(str(rounds))
+    except OSError as e:
+        logger.error(f"Failed to save bcrypt rounds to {rounds_file}: {e}")
+    return rounds
+
+# Password hashing context - new hashes use Argon2id when argon2-cffi is installed (optional);
+# bcrypt hashes keep verifying and are upgraded on the user's next successful login
+ARGON2_AVAILABLE = argon2.has_backend()
+if ARGON2_AVAILABLE:
+    pwd_context = CryptContext(
+        schemes=["argon2", "bcrypt"], deprecated="auto",
+        argon2__memory_cost=65536, argon2__time_cost=3, argon2__parallelism=2
+    )
+else:
+    pwd_context = CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__rounds=settings.BCRYPT_ROUNDS or BCRYPT_DEFAULT_ROUNDS
+    )
+
+def configure_password_hashing():
+    """
+    Startup hook: when bcrypt is the only scheme and BCRYPT_ROUNDS isn't pinned, switch new
+    hashes to the calibrated cost. With Argon2 available bcrypt only verifies old hashes,
+    which carry their own cost, so there is nothing to calibrate
+    """
+    if ARGON2_AVAILABLE or settings.BCRYPT_ROUNDS:
+        return
+    pwd_context.update(bcrypt__rounds=_calibrated_bcrypt_rounds())
 
 # Bearer token security
 security = HTTPBearer()
 
+def _json_bytes(data: dict) -> bytes:
+    """Compact JSON encoding, with orjson when available (optional)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url, as used by JWT segments"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+# Token creation signs with HMAC-SHA256 directly (settings.ALGORITHM is HS256); the header
+# never changes, so it's encoded once here
+_JWT_HEADER = _b64url(_json_bytes({"alg": settings.ALGORITHM, "typ": "JWT"}))
+
+def _encode_token(payload: dict) -> str:
+    """Sign a payload as a compact HS256 JWT"""
+    signing_input = _JWT_HEADER + b"." + _b64url(_json_bytes(payload))
+    signature = hmac.new(settings.SECRET_KEY_BYTES, signing_input, hashlib.sha256).digest()
+    return (signing_input + b"." + _b64url(signature)).decode()
+
+# Decoded token payloads keyed by a hash of the token (raw tokens are never stored),
+# so repeat requests from a client skip signature verification
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 30  # seconds
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+_token_cache_lock = threading.Lock()
+
+# Column snapshots of recently authenticated users, so repeat requests skip the user SELECT
+USER_CACHE_SIZE = 5000
+USER_CACHE_TTL = 60  # seconds
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+
+async def _load_user(db: Session, user_id: int) -> Optional[User]:
+    """Get a user attached to this session, from the snapshot cache when possible"""
+    with _user_cache_lock:
+        snapshot = _user_cache.get(user_id)
+    
+    if snapshot is not None:
+        # Rebuild a clean persistent instance without a round trip; routes can modify and commit it
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+    
+    # Cache miss - run the blocking SELECT in the threadpool so the event loop keeps serving
+    user = await run_in_threadpool(db.query(User).filter(User.id == user_id).first)
+    if user is not None:
+        with _user_cache_lock:
+            _user_cache[user_id] = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+    return user
+
+def _find_user_by_login(db: Session, login: str) -> Optional[User]:
+    """Look a user up by username or email with unique-index probes instead of an OR scan"""
+    # Usernames can't contain "@", so try the likely column first
+    columns = (User.email, User.username) if "@" in login else (User.username, User.email)
+    for column in columns:
+        # Login only reads these; other columns stay deferred
+        user = db.query(User).options(
+            load_only(User.id, User.username, User.is_active, User.hashed_password)
+        ).filter(column == login).first()
+        if user:
+            return user
+    return None
+
+def invalidate_user_cache(user_id: int):
+    """Drop a user's cached snapshot after their row changes"""
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
 class AuthManager:
     """
     Authentication manager for handling JWT tokens and password operations
@@ -30,52 +176,88 @@ class AuthManager:
         """Hash a password"""
         return pwd_context.hash(password)
     
+    # bcrypt is deliberately slow CPU work, so async routes run it off the event loop
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash in the threadpool"""
+        return await run_in_threadpool(pwd_context.verify, plain_password, hashed_password)
+    
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """Hash a password in the threadpool"""
+        return await run_in_threadpool(pwd_context.hash, password)
+    
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create a JWT access token"""
-        to_encode = data.copy()
-        if expires_delta:
-            expire = datetime.utcnow() + expires_delta
-        else:
-            expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        
-        to_encode.update({"exp": expire, "type": "access"})
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        lifetime = expires_delta.total_seconds() if expires_delta else settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        encoded_jwt = _encode_token({**data, "exp": int(time.time() + lifetime), "type": "access"})
         return encoded_jwt
     
     @staticmethod
     def create_refresh_token(data: dict) -> str:
         """Create a JWT refresh token"""
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire, "type": "refresh"})
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        lifetime = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        encoded_jwt = _encode_token({**data, "exp": int(time.time() + lifetime), "type": "refresh"})
         return encoded_jwt
     
     @staticmethod
     def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
         """Verify and decode a JWT token"""
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            if payload.get("type") != token_type:
+        key = hashlib.sha256(token.encode()).digest()
+        with _token_cache_lock:
+            payload = _token_cache.get(key)
+        
+        if payload is None:
+            try:
+                payload = jwt.decode(token, settings.SECRET_KEY_BYTES, algorithms=[settings.ALGORITHM])
+            except JWTError:
                 return None
-            return payload
-        except JWTError:
+            with _token_cache_lock:
+                _token_cache[key] = payload
+        elif payload.get("exp") is not None and payload["exp"] <= time.time():
+            # Cached, but expired since it was verified
             return None
+        
+        if payload.get("type") != token_type:
+            return None
+        return payload
     
     @staticmethod
-    def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+    async def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
         """Authenticate a user with username and password"""
-        user = db.query(User).filter(
-            (User.username == username) | (User.email == username)
-        ).first()
+        user = await run_in_threadpool(_find_user_by_login, db, username)
         
         if not user:
             return None
-        if not AuthManager.verify_password(password, user.hashed_password):
+        
+        verified, new_hash = await run_in_threadpool(pwd_context.verify_and_update, password, user.hashed_password)
+        if not verified:
             return None
+        
+        # Rehash with the preferred scheme/cost now that the plaintext is at hand
+        if new_hash:
+            user.hashed_password = new_hash
+            await run_in_threadpool(db.commit)
+            invalidate_user_cache(user.id)
         return user
 
+async def _resolve_user(token: Optional[str], db: Session) -> Optional[User]:
+    """Resolve an access token to its user through the token and user caches, or None if invalid"""
+    if not token:
+        return None
+    
+    payload = AuthManager.verify_token(token, "access")
+    if payload is None:
+        return None
+    
+    try:
+        user_id = int(payload.get("sub"))
+    except (TypeError, ValueError):
+        return None
+    
+    return await _load_user(db, user_id)
+
 # Dependency to get current user from JWT token
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -84,36 +266,13 @@ async def get_current_user(
     """
     Dependency to get current authenticated user
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    try:
-        # Extract token from Bearer authorization
-        token = credentials.credentials
-        payload = AuthManager.verify_token(token, "access")
-        
-        if payload is None:
-            raise credentials_exception
-            
-        user_id_str = payload.get("sub")
-        if user_id_str is None:
-            raise credentials_exception
-        
-        try:
-            user_id = int(user_id_str)
-        except ValueError:
-            raise credentials_exception
-            
-    except JWTError:
-        raise credentials_exception
-    
-    # Get user from database
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await _resolve_user(credentials.credentials, db)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
     if not user.is_active:
         raise HTTPException(
@@ -131,30 +290,5 @@ async def get_current_user_optional(
     """
     Optional dependency to get current user (returns None if not authenticated)
     """
-    if not credentials:
-        return None
-    
-    try:
-        token = credentials.credentials
-        payload = AuthManager.verify_token(token, "access")
-        
-        if payload is None:
-            return None
-            
-        user_id_str = payload.get("sub")
-        if user_id_str is None:
-            return None
-        
-        try:
-            user_id = int(user_id_str)
-        except ValueError:
-            return None
-            
-        user = db.query(User).filter(User.id == user_id).first()
-        if user and user.is_active:
-            return user
-            
-    except JWTError:
-        pass
-    
-    return None 
\ No newline at end of file
+    user = await _resolve_user(credentials.credentials if credentials else None, db)
+    return user if user and user.is_active else None
@@ -6,6 +6,8 @@ Run this script to generate embeddings for all users and events that don't curre
 import asyncio
 import logging
 from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 
@@ -15,140 +17,189 @@ load_dotenv()
 from database import SessionLocal
 from models import User, Event
 from models.embeddings import UserEmbedding, EventEmbedding
-from ai.embedding_service import embedding_service
-from ai.chroma_client import chroma_client
+from ai.embedding_service import get_embedding_service
+from ai.chroma_client import get_chroma_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BACKFILL_BATCH_SIZE = 64
+BACKFILL_STREAM_SIZE = 500  # Rows fetched per round trip while streaming candidates
+BACKFILL_COMMIT_SIZE = 500  # Embedding rows inserted per executemany + commit
+BACKFILL_CHROMA_CONCURRENCY = 4  # Chroma batch writes in flight while later chunks are embedded
+
+def chunks(items: Iterable, size: int) -> Iterator[List]:
+    """Split items into lists of at most size"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+async def start_chroma_write(slots: asyncio.Semaphore, writes: List[asyncio.Task], write: Callable, *args):
+    """Run a Chroma batch write in a worker thread so the next chunk's embedding request overlaps it"""
+    await slots.acquire()
+    task = asyncio.create_task(asyncio.to_thread(write, *args))
+    task.add_done_callback(lambda _: slots.release())
+    writes.append(task)
+
+async def finish_chroma_writes(writes: List[asyncio.Task], kind: str):
+    """Wait for outstanding Chroma writes and report any failed batches"""
+    results = await asyncio.gather(*writes, return_exceptions=True)
+    failed = sum(1 for result in results if result is not True)
+    if failed:
+        logger.error(f"❌ {failed} of {len(results)} ChromaDB {kind} batch writes failed")
+
+def flush_records(db: Session, model, records: List[Dict[str, Any]]) -> int:
+    """Insert accumulated rows in one executemany and commit, returning how many were written"""
+    if not records:
+        return 0
+    db.bulk_insert_mappings(model, records)
+    db.commit()
+    written = len(records)
+    records.clear()
+    return written
+
 async def backfill_user_embeddings():
     """Generate embeddings for all users without embeddings"""
     logger.info("Starting user embeddings backfill...")
     
+    # Candidates stream from one session while another commits each chunk,
+    # since committing would close the streaming cursor
     db = SessionLocal()
+    write_db = SessionLocal()
     try:
-        # Get all active users
-        all_users = db.query(User).filter(User.is_active == True).all()
-        logger.info(f"Found {len(all_users)} active users")
-        
-        # Get users that already have embeddings
-        existing_embeddings = db.query(UserEmbedding).all()
-        existing_user_ids = {emb.user_id for emb in existing_embeddings}
-        
-        # Find users without embeddings
-        users_without_embeddings = [user for user in all_users if user.id not in existing_user_ids]
-        logger.info(f"Found {len(users_without_embeddings)} users without embeddings")
+        # Active users without embeddings - the database does the anti-join
+        users_without_embeddings = db.query(User).outerjoin(
+            UserEmbedding, UserEmbedding.user_id == User.id
+        ).filter(
+            User.is_active == True,
+            UserEmbedding.user_id == None
+        )
+        logger.info(f"Found {users_without_embeddings.count()} users without embeddings")
         
         created_count = 0
-        for user in users_without_embeddings:
+        records = []
+        chroma_slots = asyncio.Semaphore(BACKFILL_CHROMA_CONCURRENCY)
+        chroma_writes = []
+        for chunk in chunks(users_without_embeddings.yield_per(BACKFILL_STREAM_SIZE), BACKFILL_BATCH_SIZE):
             try:
-                logger.info(f"Creating embedding for user {user.id} ({user.username})")
+                # One batched embedding call per chunk
+                profile_embeddings = await get_embedding_service().generate_user_profile_embeddings(chunk)
+                embedded = [(user, embedding) for user, embedding in zip(chunk, profile_embeddings) if embedding]
+                failed = len(chunk) - len(embedded)
+                if failed:
+                    logger.warning(f"❌ Failed to generate {failed} of {len(chunk)} user embeddings")
+                if not embedded:
+                    continue
+                
+                # Store in ChromaDB (in the background)
+                await start_chroma_write(
+                    chroma_slots, chroma_writes, get_chroma_client().add_user_embedding_batch,
+                    [user.id for user, _ in embedded],
+                    [embedding for _, embedding in embedded],
+                    [[] for _ in embedded],  # Empty message embeddings for testing
+                    [{"username": user.username} for user, _ in embedded]
+                )
                 
-                # Generate profile embedding
-                profile_embedding = await embedding_service.generate_user_profile_embedding(user)
+                # Queue database rows, inserted BACKFILL_COMMIT_SIZE at a time
+                records.extend(
+                    {
+                        "user_id": user.id,
+                        "profile_embedding": embedding,
+                        "message_embedding": None  # Not using message embeddings for testing
+                    }
+                    for user, embedding in embedded
+                )
+                if len(records) >= BACKFILL_COMMIT_SIZE:
+                    created_count += flush_records(write_db, UserEmbedding, records)
+                    logger.info(f"✅ Created {created_count} user embeddings so far")
                 
-                if profile_embedding:
-                    # Store in database
-                    user_embedding = UserEmbedding(
-                        user_id=user.id,
-                        profile_embedding=profile_embedding,
-                        message_embedding=None  # Not using message embeddings for testing
-                    )
-                    db.add(user_embedding)
-                    
-                    # Store in ChromaDB
-                    chroma_client.add_user_embedding(
-                        user.id,
-                        profile_embedding,
-                        [],  # Empty message embedding for testing
-                        metadata={
-                            "username": user.username
-                        }
-                    )
-                    
-                    created_count += 1
-                    logger.info(f"✅ Created embedding for user {user.id}")
-                else:
-                    logger.warning(f"❌ Failed to generate embedding for user {user.id}")
-                    
             except Exception as e:
-                logger.error(f"❌ Error creating embedding for user {user.id}: {e}")
+                logger.error(f"❌ Error creating embeddings for {len(chunk)} users: {e}")
+                write_db.rollback()
+                records.clear()
                 continue
         
-        # Commit all changes
-        db.commit()
+        created_count += flush_records(write_db, UserEmbedding, records)
+        await finish_chroma_writes(chroma_writes, "user")
         logger.info(f"✅ User embeddings backfill completed. Created {created_count} embeddings.")
         
     except Exception as e:
         logger.error(f"❌ Failed to backfill user embeddings: {e}")
-        db.rollback()
+        write_db.rollback()
     finally:
+        write_db.close()
         db.close()
 
 async def backfill_event_embeddings():
     """Generate embeddings for all events without embeddings"""
     logger.info("Starting event embeddings backfill...")
     
+    # Candidates stream from one session while another commits each chunk
     db = SessionLocal()
+    write_db = SessionLocal()
     try:
-        # Get all active events
-        all_events = db.query(Event).filter(Event.is_active == True).all()
-        logger.info(f"Found {len(all_events)} active events")
-        
-        # Get events that already have embeddings
-        existing_embeddings = db.query(EventEmbedding).all()
-        existing_event_ids = {emb.event_id for emb in existing_embeddings}
-        
-        # Find events without embeddings
-        events_without_embeddings = [event for event in all_events if event.id not in existing_event_ids]
-        logger.info(f"Found {len(events_without_embeddings)} events without embeddings")
+        # Active events without embeddings - the database does the anti-join
+        events_without_embeddings = db.query(Event).outerjoin(
+            EventEmbedding, EventEmbedding.event_id == Event.id
+        ).filter(
+            Event.is_active == True,
+            EventEmbedding.event_id == None
+        )
+        logger.info(f"Found {events_without_embeddings.count()} events without embeddings")
         
         created_count = 0
-        for event in events_without_embeddings:
+        records = []
+        chroma_slots = asyncio.Semaphore(BACKFILL_CHROMA_CONCURRENCY)
+        chroma_writes = []
+        for chunk in chunks(events_without_embeddings.yield_per(BACKFILL_STREAM_SIZE), BACKFILL_BATCH_SIZE):
             try:
-                logger.info(f"Creating embedding for event {event.id} ({event.title})")
+                # One batched embedding call per chunk
+                event_embeddings = await get_embedding_service().generate_event_embeddings(chunk)
+                embedded = [(event, embedding) for event, embedding in zip(chunk, event_embeddings) if embedding]
+                failed = len(chunk) - len(embedded)
+                if failed:
+                    logger.warning(f"❌ Failed to generate {failed} of {len(chunk)} event embeddings")
+                if not embedded:
+                    continue
+                
+                # Store in ChromaDB (in the background)
+                await start_chroma_write(
+                    chroma_slots, chroma_writes, get_chroma_client().add_event_embedding_batch,
+                    [event.id for event, _ in embedded],
+                    [embedding for _, embedding in embedded],
+                    [{
+                        "title": event.title,
+                        "creator_id": event.creator_id,
+                        "visibility": event.visibility,
+                        "is_premium": event.is_premium
+                    } for event, _ in embedded]
+                )
                 
-                # Generate event embedding
-                event_embedding = await embedding_service.generate_event_embedding(event)
+                # Queue database rows, inserted BACKFILL_COMMIT_SIZE at a time
+                records.extend(
+                    {"event_id": event.id, "event_embedding": embedding}
+                    for event, embedding in embedded
+                )
+                if len(records) >= BACKFILL_COMMIT_SIZE:
+                    created_count += flush_records(write_db, EventEmbedding, records)
+                    logger.info(f"✅ Created {created_count} event embeddings so far")
                 
-                if event_embedding:
-                    # Store in database
-                    embedding_record = EventEmbedding(
-                        event_id=event.id,
-                        event_embedding=event_embedding
-                    )
-                    db.add(embedding_record)
-                    
-                    # Store in ChromaDB
-                    chroma_client.add_event_embedding(
-                        event.id,
-                        event_embedding,
-                        metadata={
-                            "title": event.title,
-                            "creator_id": event.creator_id,
-                            "visibility": event.visibility,
-                            "is_premium": event.is_premium
-                        }
-                    )
-                    
-                    created_count += 1
-                    logger.info(f"✅ Created embedding for event {event.id}")
-                else:
-                    logger.warning(f"❌ Failed to generate embedding for event {event.id}")
-                    
             except Exception as e:
-                logger.error(f"❌ Error creating embedding for event {event.id}: {e}")
+                logger.error(f"❌ Error creating embeddings for {len(chunk)} events: {e}")
+                write_db.rollback()
+                records.clear()
                 continue
         
-        # Commit all changes
-        db.commit()
+        created_count += flush_records(write_db, EventEmbedding, records)
+        await finish_chroma_writes(chroma_writes, "event")
         logger.info(f"✅ Event embeddings backfill completed. Created {created_count} embeddings.")
         
     except Exception as e:
         logger.error(f"❌ Failed to backfill event embeddings: {e}")
-        db.rollback()
+        write_db.rollback()
     finally:
+        write_db.close()
         db.close()
 
 async def get_embedding_stats():
@@ -166,7 +217,7 @@ async def get_embedding_stats():
         events_with_embeddings = db.query(EventEmbedding).count()
         
         # ChromaDB stats
-        chroma_stats = chroma_client.get_collection_stats()
+        chroma_stats = get_chroma_client().get_collection_stats()
         
         logger.info(f"📊 Embedding Statistics:")
         logger.info(f"   Users: {users_with_embeddings}/{total_users} have embeddings")
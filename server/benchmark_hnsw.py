@@ -0,0 +1,69 @@
+"""
+Benchmark HNSW search_ef settings for the ChromaDB user collection
+Measures recall@10 against exact search and per-query latency for each search_ef
+"""
+
+import argparse
+import logging
+import time
+
+import chromadb
+import numpy as np
+
+from config import settings
+from ai.chroma_client import get_chroma_client, HNSW_SETTINGS
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEARCH_EF_VALUES = [32, 64, 128]
+TOP_K = 10
+
+def load_vectors(num_synthetic: int, dims: int) -> np.ndarray:
+    """Use stored user embeddings, or synthetic unit vectors if there are too few"""
+    results = get_chroma_client().users_collection.get(include=["embeddings"])
+    if results['embeddings'] is not None and len(results['embeddings']) >= TOP_K * 10:
+        logger.info(f"Using {len(results['embeddings'])} stored user embeddings")
+        return np.asarray(results['embeddings'], dtype=np.float32)
+
+    logger.info(f"Using {num_synthetic} synthetic {dims}-dim vectors")
+    vectors = np.random.default_rng(0).normal(size=(num_synthetic, dims)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def benchmark(vectors: np.ndarray, num_queries: int):
+    """Build one throwaway collection per search_ef and compare it to exact search"""
+    client = chromadb.EphemeralClient()
+    ids = [str(i) for i in range(len(vectors))]
+    queries = vectors[np.random.default_rng(1).choice(len(vectors), num_queries, replace=False)]
+
+    # Exact top-k by cosine similarity (vectors are unit length)
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :TOP_K]
+
+    logger.info(f"{'search_ef':>10} {'recall@10':>10} {'ms/query':>10}")
+    for search_ef in SEARCH_EF_VALUES:
+        collection = client.create_collection(
+            name=f"benchmark_ef_{search_ef}",
+            metadata={**HNSW_SETTINGS, "hnsw:search_ef": search_ef}
+        )
+        for start in range(0, len(vectors), 5000):
+            collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000])
+
+        hits = 0
+        start_time = time.perf_counter()
+        for query, expected in zip(queries, exact):
+            results = collection.query(query_embeddings=[query], n_results=TOP_K)
+            hits += len(set(int(i) for i in results['ids'][0]) & set(expected.tolist()))
+        elapsed_ms = (time.perf_counter() - start_time) * 1000 / num_queries
+
+        logger.info(f"{search_ef:>10} {hits / (num_queries * TOP_K):>10.3f} {elapsed_ms:>10.2f}")
+        client.delete_collection(name=f"benchmark_ef_{search_ef}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=20000, help="Synthetic vectors when few users exist")
+    parser.add_argument("--dims", type=int, default=settings.EMBEDDING_DIMENSIONS, help="Synthetic vector dimensions")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per setting")
+    args = parser.parse_args()
+
+    benchmark(load_vectors(args.vectors, args.dims), args.queries)
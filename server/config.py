@@ -7,15 +7,27 @@ class Settings:
     """
     # JWT Configuration
     SECRET_KEY: str = config("SECRET_KEY", default=secrets.token_urlsafe(32))
+    SECRET_KEY_BYTES: bytes = SECRET_KEY.encode("utf-8")  # Encoded once for HMAC signing/verification
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int)
     REFRESH_TOKEN_EXPIRE_DAYS: int = config("REFRESH_TOKEN_EXPIRE_DAYS", default=7, cast=int)
     
     # Database
     DATABASE_URL: str = config("DATABASE_URL", default="sqlite:///./ladchat.db")
+    AUTO_CREATE_TABLES: bool = config("AUTO_CREATE_TABLES", default=True, cast=bool)  # Run create_all at startup
+    DB_POOL_SIZE: int = config("DB_POOL_SIZE", default=25, cast=int)
+    DB_MAX_OVERFLOW: int = config("DB_MAX_OVERFLOW", default=25, cast=int)
+    DB_POOL_RECYCLE: int = config("DB_POOL_RECYCLE", default=1800, cast=int)  # Seconds before a connection is replaced
+    USE_POSTGIS: bool = config("USE_POSTGIS", default=False, cast=bool)  # PostgreSQL with the postgis extension: index event locations
     
-    # Security
-    BCRYPT_ROUNDS: int = config("BCRYPT_ROUNDS", default=12, cast=int)
+    # Security - leave BCRYPT_ROUNDS unset to calibrate it to BCRYPT_TARGET_MS on this hardware
+    BCRYPT_ROUNDS: int = config("BCRYPT_ROUNDS", default=None, cast=lambda v: int(v) if v else None)
+    BCRYPT_TARGET_MS: int = config("BCRYPT_TARGET_MS", default=250, cast=int)
+    BCRYPT_ROUNDS_FILE: str = config("BCRYPT_ROUNDS_FILE", default="./.bcrypt_rounds")  # Where the calibrated rounds are saved
+    
+    # AI / embeddings
+    EMBEDDING_MODEL: str = config("EMBEDDING_MODEL", default="text-embedding-3-small")
+    EMBEDDING_DIMENSIONS: int = config("EMBEDDING_DIMENSIONS", default=512, cast=int)
     
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = config("RATE_LIMIT_REQUESTS", default=100, cast=int)
@@ -33,8 +45,9 @@ class Settings:
     ALLOWED_ORIGINS: list = [
         "http://localhost:3000",
         "http://localhost:8081",  # Expo default
-        "http://192.168.*.*:8081",  # Local network for mobile testing
     ]
+    ALLOWED_ORIGIN_REGEX: str = r"http://192\.168\.\d{1,3}\.\d{1,3}:8081"  # Local network for mobile testing
+    CORS_MAX_AGE: int = 86400  # Seconds browsers may cache a preflight response
 
 # Create settings instance
 settings = Settings()
@@ -46,6 +59,13 @@ SECRET_KEY=your-secret-key-here
 ACCESS_TOKEN_EXPIRE_MINUTES=30
 REFRESH_TOKEN_EXPIRE_DAYS=7
 DATABASE_URL=sqlite:///./ladchat.db
-BCRYPT_ROUNDS=12
+AUTO_CREATE_TABLES=true
+# DB_POOL_SIZE=25  (per process; behind PgBouncer in transaction mode this can be raised freely)
+# DB_MAX_OVERFLOW=25
+# DB_POOL_RECYCLE=1800
+# USE_POSTGIS=false  (PostgreSQL only; needs the postgis extension available on the server)
+# BCRYPT_ROUNDS=12  (unset: calibrated to BCRYPT_TARGET_MS at first startup; only used without argon2-cffi)
+BCRYPT_TARGET_MS=250
+# BCRYPT_ROUNDS_FILE=./.bcrypt_rounds
 DEBUG=true
 """ 
\ No newline at end of file
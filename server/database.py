@@ -1,29 +1,103 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import BigInteger, DateTime, Integer, create_engine, event, make_url, MetaData
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.types import TypeDecorator
+from datetime import timezone
 import os
 
+from config import settings
+
 # Database configuration
-DATABASE_URL = "sqlite:///./ladchat.db"
+DATABASE_URL = settings.DATABASE_URL
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Connection pool - sessions reuse pooled connections instead of reconnecting.
+# Connections are recycled before server/PgBouncer idle timeouts can close them underneath us
+POOL_SIZE = settings.DB_POOL_SIZE
+POOL_MAX_OVERFLOW = settings.DB_MAX_OVERFLOW
+POOL_RECYCLE = settings.DB_POOL_RECYCLE
+
+# Rows per multi-row INSERT ... VALUES when executemany inserts are batched (SQLite caps bound parameters lower)
+INSERTMANYVALUES_PAGE_SIZE = 500 if IS_SQLITE else 1000
+
+# WAL lets readers run alongside a writer; NORMAL sync is durable in WAL mode apart from
+# the last commits before a power loss. Cache/mmap sizes are per connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,  # 256 MiB
+    "cache_size": -65536,  # 64 MiB
+}
 
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False}  # Required for SQLite
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},  # Required for SQLite
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_MAX_OVERFLOW,
+    pool_pre_ping=not IS_SQLITE,  # Local SQLite files don't drop connections
+    pool_recycle=-1 if IS_SQLITE else POOL_RECYCLE,
+    insertmanyvalues_page_size=INSERTMANYVALUES_PAGE_SIZE,
+    # psycopg2 also batches plain executemany (UPDATEs, inserts without RETURNING)
+    **({"executemany_mode": "values_plus_batch"} if make_url(DATABASE_URL).get_driver_name() == "psycopg2" else {})
 )
 
+if IS_SQLITE:
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """Apply performance pragmas to each new SQLite connection"""
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Create Base class for models
 Base = declarative_base()
 
+# 64-bit ids for the high-volume tables (messages, snaps, stories). SQLite only autoincrements an
+# INTEGER PRIMARY KEY, which is already 64-bit there
+BIGINT_ID = BigInteger().with_variant(Integer, "sqlite")
+
+class UTCDateTime(TypeDecorator):
+    """
+    Timezone-aware UTC datetimes in and out, on every backend. Naive values are taken to be UTC;
+    SQLite hands back naive values, which get tzinfo attached once on load instead of on every comparison
+    """
+    impl = DateTime
+    cache_ok = True
+
+    def __init__(self):
+        super().__init__(timezone=True)
+
+    def process_bind_param(self, value, dialect):
+        if value is None or value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc)
+
+    def process_result_value(self, value, dialect):
+        if value is None or value.tzinfo is not None:
+            return value
+        return value.replace(tzinfo=timezone.utc)
+
+def upsert_insert(db, table):
+    """INSERT for the session's dialect, which supports on_conflict_do_nothing/do_update (Postgres or SQLite)"""
+    dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    return dialect_insert(table)
+
 # Metadata instance
 metadata = MetaData()
 
-def get_db():
+async def get_db():
     """
     Dependency to get database session
+    FastAPI caches it per request, so auth dependencies and the route share one session.
+    Async so it opens and closes on the event loop instead of hopping to the threadpool twice
     """
     db = SessionLocal()
     try:
@@ -5,6 +5,7 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.staticfiles import StaticFiles
 from sqlalchemy.exc import SQLAlchemyError
 import uvicorn
+import asyncio
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -12,6 +13,8 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+from config import settings
+
 # Import utilities
 from utils.logging_config import setup_logging
 from utils.error_handlers import (
@@ -37,13 +40,15 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# CORS middleware for local development
+# CORS middleware - browsers reject "*" with credentials, so origins are listed explicitly
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
+    allow_origins=settings.ALLOWED_ORIGINS,
+    allow_origin_regex=settings.ALLOWED_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.CORS_MAX_AGE,
 )
 
 # Add exception handlers
@@ -118,7 +123,7 @@ async def root():
         "health": "/health"
     }
 
-# Import models (must be imported before create_tables)
+# Import models (registers every table on Base.metadata for create_tables)
 import models
 
 # Import routes
@@ -135,10 +140,6 @@ from routes.recommendations import router as recommendations_router
 from routes.notifications import router as notifications_router
 from routes.venues import router as venues_router
 from database import create_tables, SessionLocal
-from config import settings
-
-# Create database tables on startup
-create_tables()
 
 # Include routers
 app.include_router(auth_router)
@@ -154,15 +155,73 @@ app.include_router(recommendations_router)
 app.include_router(notifications_router)
 app.include_router(venues_router)
 
+def _run_backfill(backfill, description: str):
+    """Move legacy JSON columns into their tables, in a session of its own"""
+    db = SessionLocal()
+    try:
+        created = backfill(db)
+        if created:
+            logger.info(f"Backfilled {created} {description}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to backfill {description}: {e}")
+    finally:
+        db.close()
+
+def _convert_legacy_codes():
+    """Rewrite status/type columns created as strings to their small-integer codes"""
+    from database import engine
+    from models.enums import convert_legacy_codes
+    try:
+        converted = convert_legacy_codes(engine, models._MODELS)
+        if converted:
+            logger.info(f"Converted {converted} columns to small-integer codes")
+    except Exception as e:
+        logger.error(f"Failed to convert legacy column codes: {e}")
+
+def _add_event_locations():
+    """Add the PostGIS event location column and index when USE_POSTGIS is on"""
+    from database import engine
+    from models.hangout import add_event_locations
+    try:
+        if add_event_locations(engine):
+            logger.info("PostGIS event locations ready")
+    except Exception as e:
+        logger.error(f"Failed to add PostGIS event locations: {e}")
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
     logger.info("Starting LadChat API...")
     
+    # Create missing tables in development; deployments with a managed schema turn this off
+    if settings.AUTO_CREATE_TABLES:
+        await asyncio.to_thread(create_tables)
+        await asyncio.to_thread(_convert_legacy_codes)
+        await asyncio.to_thread(_add_event_locations)
+        from models.group_chat import backfill_group_members, backfill_group_receipts
+        from models.hangout import backfill_event_rsvps
+        await asyncio.to_thread(_run_backfill, backfill_group_members, "group memberships")
+        await asyncio.to_thread(_run_backfill, backfill_group_receipts, "group message receipts")
+        await asyncio.to_thread(_run_backfill, backfill_event_rsvps, "event RSVPs")
+    
+    # Calibrate bcrypt's cost when it is the only password scheme
+    from auth import configure_password_hashing
+    await asyncio.to_thread(configure_password_hashing)
+    
     # Start background task manager
     await task_manager.start()
     
+    # Open ChromaDB and warm its indexes before the first recommendation request
+    try:
+        from ai.chroma_client import get_chroma_client
+        chroma_client = await asyncio.to_thread(get_chroma_client)
+        # Collections that came up empty are refilled from the database's embedding rows
+        await asyncio.to_thread(chroma_client.mirror_database_embeddings)
+    except Exception as e:
+        logger.warning(f"Failed to initialize ChromaDB: {e}")
+    
     # Initialize embedding tasks - DISABLED FOR TESTING
     # For testing the simplified embedding system, we create embeddings immediately
     # on user registration, profile updates, and event creation instead of using background tasks
@@ -183,6 +242,14 @@ async def shutdown_event():
     # Stop background task manager
     await task_manager.stop()
     
+    # Flush Chroma writes still queued by the recommendation engine
+    try:
+        from ai.rag_engine import get_rag_engine
+        if get_rag_engine.cache_info().currsize:
+            await get_rag_engine().stop_chroma_writer()
+    except Exception as e:
+        logger.warning(f"Failed to flush ChromaDB writes: {e}")
+    
     logger.info("LadChat API shut down complete")
 
 if __name__ == "__main__":
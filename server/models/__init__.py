@@ -5,30 +5,36 @@ Imports all database models to ensure they are registered with SQLAlchemy
 
 from .user import User
 from .story import Story
-from .snap import Snap
-from .hangout import Event, Hangout
-from .group_chat import GroupChat, GroupMessage
+from .snap import Snap, SnapGroup
+from .hangout import Event, EventRsvp, Hangout
+from .group_chat import GroupChat, GroupMember, GroupMessage, GroupMessageReceipt
 from .venue import Venue, VenueReview
 from .direct_message import DirectMessage, Conversation
 from .friendship import FriendRequest, Friendship
 from .embeddings import UserEmbedding, GroupEmbedding, EventEmbedding, ChatActivity
 
-__all__ = [
-    "User",
-    "Story", 
-    "Snap",
-    "Event",
-    "Hangout",  # Backward compatibility alias
-    "GroupChat",
-    "GroupMessage",
-    "Venue",
-    "VenueReview",
-    "DirectMessage",
-    "Conversation",
-    "FriendRequest",
-    "Friendship",
-    "UserEmbedding",
-    "GroupEmbedding", 
-    "EventEmbedding",
-    "ChatActivity"
-] 
\ No newline at end of file
+# Every mapped model, in one place - importing this package registers them all on Base.metadata
+_MODELS = (
+    User,
+    Story,
+    Snap,
+    SnapGroup,
+    Event,
+    EventRsvp,
+    GroupChat,
+    GroupMember,
+    GroupMessage,
+    GroupMessageReceipt,
+    Venue,
+    VenueReview,
+    DirectMessage,
+    Conversation,
+    FriendRequest,
+    Friendship,
+    UserEmbedding,
+    GroupEmbedding,
+    EventEmbedding,
+    ChatActivity,
+)
+
+__all__ = [model.__name__ for model in _MODELS] + ["Hangout"]  # Hangout: backward compatibility alias of Event
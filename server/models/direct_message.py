@@ -1,38 +1,58 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, ForeignKey, Index, and_, case, insert, update
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from database import Base
-from datetime import datetime, timedelta
+from sqlalchemy.orm import relationship, Session
+from database import Base, BIGINT_ID, UTCDateTime
+from .enums import IntCode, MediaType, MessageType
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# How long a new message lives, by message type
+MESSAGE_LIFETIMES = {"media": timedelta(hours=24)}  # Media messages get a 24 hour viewing window
+DEFAULT_MESSAGE_LIFETIME = timedelta(weeks=1)  # Text and everything else
+
+# Fields every serialized message carries, and the extras for viewable media
+_MSG_FIELDS = ("id", "sender_id", "recipient_id", "message_type", "is_read", "created_at", "expires_at")
+_MEDIA_FIELDS = ("media_url", "media_type", "view_duration", "is_opened", "screenshot_taken")
+
+def message_expires_at(message_type: Optional[str], now: Optional[datetime] = None) -> datetime:
+    """Expiry for a new message of the given type, counted from now"""
+    return (now or datetime.now(timezone.utc)) + MESSAGE_LIFETIMES.get(message_type, DEFAULT_MESSAGE_LIFETIME)
 
 class DirectMessage(Base):
     """
     Direct message model for private messaging between users
     """
     __tablename__ = "direct_messages"
+    # Fetch server defaults (created_at) with RETURNING on insert rather than a refresh SELECT
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # Covers "a user's most recent text messages" for message embeddings
+        Index("ix_direct_messages_sender_type_created", "sender_id", "message_type", "created_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BIGINT_ID, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Message content
     content = Column(Text, nullable=True)  # Text content (null for media-only messages)
     media_url = Column(String(500), nullable=True)  # Media file URL
-    media_type = Column(String(20), nullable=True)  # 'photo', 'video', 'audio'
+    media_type = Column(IntCode(MediaType), nullable=True)  # 'photo', 'video', 'audio'
     
     # Message type and behavior
-    message_type = Column(String(20), default="text")  # 'text', 'media', 'system'
+    message_type = Column(IntCode(MessageType), default="text")  # 'text', 'media', 'system'
     view_duration = Column(Integer, nullable=True)  # For media messages (1-60 seconds)
     
     # Ephemeral settings
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(UTCDateTime(), nullable=False, index=True)
     
     # Read status
     is_read = Column(Boolean, default=False)
-    read_at = Column(DateTime(timezone=True), nullable=True)
+    read_at = Column(UTCDateTime(), nullable=True)
     
     # Media viewing for snaps
     is_opened = Column(Boolean, default=False)  # For media messages
-    opened_at = Column(DateTime(timezone=True), nullable=True)
+    opened_at = Column(UTCDateTime(), nullable=True)
     screenshot_taken = Column(Boolean, default=False)
     
     # Status
@@ -41,37 +61,38 @@ class DirectMessage(Base):
     deleted_for_recipient = Column(Boolean, default=False)
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(UTCDateTime(), server_default=func.now(), index=True)
     
-    # Relationships
-    sender = relationship("User", foreign_keys=[sender_id])
-    recipient = relationship("User", foreign_keys=[recipient_id])
+    # Relationships - never lazy loaded, so listing code has to ask for them with selectinload()
+    sender = relationship("User", foreign_keys=[sender_id], lazy="raise")
+    recipient = relationship("User", foreign_keys=[recipient_id], lazy="raise")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # Set default expiration based on message type
         if not self.expires_at:
-            if self.message_type == "media":
-                # Media messages expire after 24 hours (viewing window)
-                self.expires_at = datetime.utcnow() + timedelta(hours=24)
-            else:
-                # Text messages expire after 1 week
-                self.expires_at = datetime.utcnow() + timedelta(weeks=1)
+            self.expires_at = message_expires_at(self.message_type)
+
+    @classmethod
+    def bulk_create(cls, db: Session, rows: List[Dict[str, Any]]) -> Dict[int, int]:
+        """Insert many messages in batched multi-row INSERTs and return {recipient_id: message id}"""
+        if not rows:
+            return {}
+        now = datetime.now(timezone.utc)  # One timestamp for the whole batch
+        rows = [
+            {**row, "expires_at": row.get("expires_at") or message_expires_at(row.get("message_type"), now)}
+            for row in rows
+        ]
+        # RETURNING order isn't guaranteed once rows are batched, so match ids back by recipient
+        result = db.execute(insert(cls).returning(cls.recipient_id, cls.id), rows)
+        return dict(result.tuples().all())
 
     def __repr__(self):
         return f"<DirectMessage(id={self.id}, from={self.sender_id}, to={self.recipient_id}, type={self.message_type})>"
 
     def to_dict(self, for_user_id: int = None):
         """Convert message to dictionary"""
-        data = {
-            "id": self.id,
-            "sender_id": self.sender_id,
-            "recipient_id": self.recipient_id,
-            "message_type": self.message_type,
-            "is_read": self.is_read,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "expires_at": self.expires_at.isoformat() if self.expires_at else None
-        }
+        data = {field: getattr(self, field) for field in _MSG_FIELDS}
         
         # Include content based on message type and user permissions
         if self.message_type == "text":
@@ -79,26 +100,23 @@ class DirectMessage(Base):
         elif self.message_type == "media":
             # Only include media info if user can view it
             if self.can_view(for_user_id or self.recipient_id):
-                data.update({
-                    "media_url": self.media_url,
-                    "media_type": self.media_type,
-                    "view_duration": self.view_duration,
-                    "is_opened": self.is_opened,
-                    "screenshot_taken": self.screenshot_taken
-                })
+                data.update({field: getattr(self, field) for field in _MEDIA_FIELDS})
         
         # Include read status for sender
         if for_user_id == self.sender_id:
-            data.update({
-                "read_at": self.read_at.isoformat() if self.read_at else None,
-                "opened_at": self.opened_at.isoformat() if self.opened_at else None
-            })
+            data["read_at"] = self.read_at
+            data["opened_at"] = self.opened_at
         
         return data
 
     def is_expired(self):
         """Check if message has expired"""
-        return datetime.utcnow() > self.expires_at
+        return datetime.now(timezone.utc) > self.expires_at
+
+    @classmethod
+    def live(cls, now: Optional[datetime] = None):
+        """SQL filter for messages that are neither deleted nor expired, so listings skip them in the query"""
+        return and_(cls.is_deleted == False, cls.expires_at > (now or datetime.now(timezone.utc)))
 
     def can_view(self, user_id: int):
         """Check if user can view this message"""
@@ -121,14 +139,28 @@ class DirectMessage(Base):
         """Mark message as read by recipient"""
         if user_id == self.recipient_id and not self.is_read:
             self.is_read = True
-            self.read_at = datetime.utcnow()
+            self.read_at = datetime.now(timezone.utc)
+
+    @classmethod
+    def mark_read_by(cls, db: Session, user_id: int, message_ids: List[int]) -> List[int]:
+        """Mark the user's unread received messages as read in one UPDATE, returning each newly read message's sender"""
+        if not message_ids:
+            return []
+        result = db.execute(
+            update(cls)
+            .where(cls.id.in_(message_ids), cls.recipient_id == user_id, cls.is_read == False)
+            .values(is_read=True, read_at=datetime.now(timezone.utc))
+            .returning(cls.sender_id)
+            .execution_options(synchronize_session=False)
+        )
+        return list(result.scalars())
 
     def mark_as_opened(self, user_id: int, screenshot_taken: bool = False):
         """Mark media message as opened by recipient"""
         if user_id == self.recipient_id and self.message_type == "media":
             if not self.is_opened:
                 self.is_opened = True
-                self.opened_at = datetime.utcnow()
+                self.opened_at = datetime.now(timezone.utc)
                 self.mark_as_read(user_id)  # Also mark as read
             
             if screenshot_taken:
@@ -145,6 +177,44 @@ class DirectMessage(Base):
         if self.deleted_for_sender and self.deleted_for_recipient:
             self.is_deleted = True
 
+# Partial index so any remaining "unread messages for a recipient" counts only touch unread rows
+_UNREAD_MESSAGE = and_(DirectMessage.is_read == False, DirectMessage.is_deleted == False)
+Index("idx_dm_unread", DirectMessage.recipient_id, postgresql_where=_UNREAD_MESSAGE, sqlite_where=_UNREAD_MESSAGE)
+
+# A message's user pair in (lower id, higher id) order, so both directions of a conversation
+# share one index range. CASE rather than least()/greatest() so the same expression works on SQLite
+_PAIR_LOW = case(
+    (DirectMessage.sender_id < DirectMessage.recipient_id, DirectMessage.sender_id),
+    else_=DirectMessage.recipient_id
+)
+_PAIR_HIGH = case(
+    (DirectMessage.sender_id < DirectMessage.recipient_id, DirectMessage.recipient_id),
+    else_=DirectMessage.sender_id
+)
+
+_NOT_DELETED = DirectMessage.is_deleted == False
+
+# A recipient's live messages by time, for unread counts since a chat was last opened.
+# now() can't appear in an index predicate, so expiry is filtered in the query instead
+Index(
+    "idx_dm_active_by_recipient", DirectMessage.recipient_id, DirectMessage.created_at,
+    postgresql_where=_NOT_DELETED, sqlite_where=_NOT_DELETED
+)
+
+# Latest messages between two users, newest first, without tombstoned rows
+Index(
+    "idx_dm_pair_time", _PAIR_LOW, _PAIR_HIGH, DirectMessage.created_at.desc(),
+    postgresql_where=_NOT_DELETED, sqlite_where=_NOT_DELETED
+)
+
+def conversation_messages_filter(user_a: int, user_b: int):
+    """Filter for live (undeleted, unexpired) messages between two users, matching idx_dm_pair_time"""
+    return and_(
+        _PAIR_LOW == min(user_a, user_b),
+        _PAIR_HIGH == max(user_a, user_b),
+        DirectMessage.live()
+    )
+
 class Conversation(Base):
     """
     Conversation model to track messaging between two users
@@ -156,8 +226,8 @@ class Conversation(Base):
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Last message info
-    last_message_id = Column(Integer, ForeignKey("direct_messages.id"), nullable=True)
-    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_message_id = Column(BIGINT_ID, ForeignKey("direct_messages.id"), nullable=True)
+    last_message_at = Column(UTCDateTime(), nullable=True)
     
     # Unread counts for each user
     unread_count_user1 = Column(Integer, default=0)
@@ -170,8 +240,8 @@ class Conversation(Base):
     muted_by_user2 = Column(Boolean, default=False)
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     user1 = relationship("User", foreign_keys=[user1_id])
@@ -185,6 +255,10 @@ class Conversation(Base):
         """Get the other participant's user ID"""
         return self.user2_id if user_id == self.user1_id else self.user1_id
 
+    def get_other_user(self, user_id: int):
+        """Get the other participant (load user1/user2 eagerly when listing)"""
+        return self.user2 if user_id == self.user1_id else self.user1
+
     def get_unread_count(self, user_id: int):
         """Get unread count for a specific user"""
         if user_id == self.user1_id:
@@ -193,13 +267,6 @@ class Conversation(Base):
             return self.unread_count_user2
         return 0
 
-    def increment_unread(self, recipient_id: int):
-        """Increment unread count for recipient"""
-        if recipient_id == self.user1_id:
-            self.unread_count_user1 = (self.unread_count_user1 or 0) + 1
-        elif recipient_id == self.user2_id:
-            self.unread_count_user2 = (self.unread_count_user2 or 0) + 1
-
     def reset_unread(self, user_id: int):
         """Reset unread count for user"""
         if user_id == self.user1_id:
@@ -207,10 +274,55 @@ class Conversation(Base):
         elif user_id == self.user2_id:
             self.unread_count_user2 = 0
 
+    @staticmethod
+    def reset_unread_with(db: Session, user_id: int, other_user_ids):
+        """Reset user's unread counts on their conversations with other_user_ids"""
+        other_user_ids = list(other_user_ids)
+        if not other_user_ids:
+            return
+        db.execute(
+            update(Conversation)
+            .where(Conversation.user1_id == user_id, Conversation.user2_id.in_(other_user_ids))
+            .values(unread_count_user1=0)
+        )
+        db.execute(
+            update(Conversation)
+            .where(Conversation.user2_id == user_id, Conversation.user1_id.in_(other_user_ids))
+            .values(unread_count_user2=0)
+        )
+
+    @staticmethod
+    def record_message(db: Session, sender_id: int, recipient_id: int, message_id: int):
+        """
+        Point the pair's conversation at a new message and bump the recipient's unread count
+        in a single UPDATE, creating the conversation with the pair's first message
+        """
+        user1_id, user2_id = min(sender_id, recipient_id), max(sender_id, recipient_id)
+        unread = Conversation.unread_count_user1 if recipient_id == user1_id else Conversation.unread_count_user2
+        now = datetime.now(timezone.utc)
+
+        result = db.execute(
+            update(Conversation)
+            .where(Conversation.user1_id == user1_id, Conversation.user2_id == user2_id)
+            .values({
+                Conversation.last_message_id: message_id,
+                Conversation.last_message_at: now,
+                unread: func.coalesce(unread, 0) + 1
+            })
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return
+
+        conversation = Conversation(user1_id=user1_id, user2_id=user2_id, last_message_id=message_id, last_message_at=now)
+        setattr(conversation, unread.key, 1)
+        db.add(conversation)
+        db.flush()  # So a later message to the same user in this transaction finds it
+
     def update_last_message(self, message_id: int):
         """Update last message info"""
         self.last_message_id = message_id
-        self.last_message_at = datetime.utcnow()
+        self.last_message_at = datetime.now(timezone.utc)
 
     def is_archived_by(self, user_id: int):
         """Check if conversation is archived by user"""
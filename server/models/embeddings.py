@@ -1,7 +1,61 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, UniqueConstraint
+import json
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Column, Integer, ForeignKey, UniqueConstraint, LargeBinary, Index, DDL
+from sqlalchemy import event as sa_event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from database import Base
+from sqlalchemy.types import TypeDecorator
+from database import Base, UTCDateTime
+from config import settings
+from .enums import ChatType, IntCode
+
+try:
+    from pgvector.sqlalchemy import HALFVEC
+except ImportError:
+    HALFVEC = None
+
+def uses_pgvector(dialect) -> bool:
+    """Whether sized PackedVector columns are native pgvector columns on this dialect"""
+    return HALFVEC is not None and dialect.name == "postgresql"
+
+class PackedVector(TypeDecorator):
+    """
+    Embedding stored as packed float16 bytes, loaded as a float32 NumPy array
+    Half the size of float32 and no JSON parsing; rows written before the switch
+    (JSON text) are still decoded. Given dimensions, it is a pgvector halfvec column on PostgreSQL
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, dimensions: Optional[int] = None):
+        super().__init__()
+        self.dimensions = dimensions
+
+    def _native(self, dialect) -> bool:
+        return self.dimensions is not None and uses_pgvector(dialect)
+
+    def load_dialect_impl(self, dialect):
+        if self._native(dialect):
+            return dialect.type_descriptor(HALFVEC(self.dimensions))
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if self._native(dialect):
+            return np.asarray(value, dtype=np.float32)
+        return np.asarray(value, dtype=np.float16).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return np.asarray(json.loads(value), dtype=np.float32)
+        if isinstance(value, (np.ndarray, list)):  # pgvector halfvec rows arrive as lists
+            return np.asarray(value, dtype=np.float32)
+        return np.frombuffer(value, dtype=np.float16).astype(np.float32)
 
 class UserEmbedding(Base):
     """
@@ -12,10 +66,19 @@ class UserEmbedding(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
-    profile_embedding = Column(JSON, nullable=True)  # From bio + interests
-    message_embedding = Column(JSON, nullable=True)  # From recent messages + snaps
-    last_updated = Column(DateTime(timezone=True), server_default=func.now())
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    profile_embedding = Column(PackedVector(settings.EMBEDDING_DIMENSIONS), nullable=True)  # From bio + interests
+    message_embedding = Column(PackedVector, nullable=True)  # From recent messages + snaps
+    last_updated = Column(UTCDateTime(), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    
+    # HNSW cosine index so friends can be ranked in SQL where pgvector is available
+    __table_args__ = (
+        Index(
+            "ix_user_embeddings_profile_hnsw", "profile_embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"profile_embedding": "halfvec_cosine_ops"}
+        ).ddl_if(callable_=lambda ddl, target, bind, **kw: uses_pgvector(bind.dialect)),
+    )
     
     # Relationships
     user = relationship("User", back_populates="embedding")
@@ -32,9 +95,9 @@ class GroupEmbedding(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("group_chats.id"), unique=True, nullable=False)
-    group_embedding = Column(JSON, nullable=False)  # From recent group messages + snaps
-    last_updated = Column(DateTime(timezone=True), server_default=func.now())
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    group_embedding = Column(PackedVector(settings.EMBEDDING_DIMENSIONS), nullable=False)  # From recent group messages + snaps
+    last_updated = Column(UTCDateTime(), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
     
     # Relationships
     group_chat = relationship("GroupChat", back_populates="embedding")
@@ -51,8 +114,17 @@ class EventEmbedding(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id"), unique=True, nullable=False)
-    event_embedding = Column(JSON, nullable=False)  # From title + description
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    event_embedding = Column(PackedVector(settings.EMBEDDING_DIMENSIONS), nullable=False)  # From title + description
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    
+    # HNSW cosine index so events can be ranked in SQL where pgvector is available
+    __table_args__ = (
+        Index(
+            "ix_event_embeddings_hnsw", "event_embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"event_embedding": "halfvec_cosine_ops"}
+        ).ddl_if(callable_=lambda ddl, target, bind, **kw: uses_pgvector(bind.dialect)),
+    )
     
     # Relationships
     event = relationship("Event", back_populates="embedding")
@@ -60,6 +132,14 @@ class EventEmbedding(Base):
     def __repr__(self):
         return f"<EventEmbedding(event_id={self.event_id}, created_at={self.created_at})>"
 
+# The vector type must exist before the embedding tables are created
+sa_event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS vector").execute_if(
+        callable_=lambda ddl, target, bind, **kw: uses_pgvector(bind.dialect)
+    )
+)
+
 class ChatActivity(Base):
     """
     Track when users last opened chats for in-app notifications
@@ -68,10 +148,10 @@ class ChatActivity(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    chat_type = Column(String(20), nullable=False)  # 'direct' or 'group'
+    chat_type = Column(IntCode(ChatType), nullable=False)  # 'direct' or 'group'
     chat_id = Column(Integer, nullable=False)  # conversation_id or group_id
-    last_opened_at = Column(DateTime(timezone=True), server_default=func.now())
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_opened_at = Column(UTCDateTime(), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="chat_activities")
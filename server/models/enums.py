@@ -0,0 +1,106 @@
+"""
+Small-integer codes for the fixed-vocabulary string columns (message types, statuses, visibility)
+"""
+
+from enum import IntEnum
+from sqlalchemy import SmallInteger, String, inspect, text
+from sqlalchemy.types import TypeDecorator
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MessageType(IntEnum):
+    TEXT = 0
+    MEDIA = 1
+    SYSTEM = 2
+    SUGGESTION = 3
+
+class MediaType(IntEnum):
+    PHOTO = 0
+    VIDEO = 1
+    AUDIO = 2
+
+class GroupVisibility(IntEnum):
+    PUBLIC = 0
+    PRIVATE = 1
+    INVITE_ONLY = 2
+
+class FriendRequestStatus(IntEnum):
+    PENDING = 0
+    ACCEPTED = 1
+    DECLINED = 2
+    CANCELLED = 3
+
+class ChatType(IntEnum):
+    DIRECT = 0
+    GROUP = 1
+
+class RsvpStatus(IntEnum):
+    YES = 0
+    MAYBE = 1
+    NO = 2
+
+class IntCode(TypeDecorator):
+    """
+    Stores an IntEnum as a SMALLINT while the application keeps using the lowercase
+    names ("text", "pending", ...), so schemas, API payloads and filters are unchanged
+    """
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class):
+        super().__init__()
+        self.enum_class = enum_class
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return self.enum_class[value.upper()].value
+        return int(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            if not value.isdigit():
+                return value  # Legacy row not converted yet
+            value = int(value)  # SQLite column still declared VARCHAR stores codes as text
+        return self.enum_class(value).name.lower()
+
+def _code_case(column: str, enum_class) -> str:
+    """SQL CASE mapping a column's legacy string values to their codes"""
+    whens = " ".join(f"WHEN '{member.name.lower()}' THEN {member.value}" for member in enum_class)
+    return f"CASE {column} {whens} END"
+
+def convert_legacy_codes(engine, models) -> int:
+    """Rewrite string values left in IntCode columns by older schemas, returning how many columns changed"""
+    converted = 0
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for model in models:
+            table = model.__table__
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"]: column["type"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if not isinstance(column.type, IntCode) or column.name not in existing:
+                    continue
+                case = _code_case(column.name, column.type.enum_class)
+                if engine.dialect.name == "postgresql":
+                    if not isinstance(existing[column.name], String):
+                        continue
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE SMALLINT USING ({case})"
+                    ))
+                else:
+                    # SQLite can't change a column's type in place, so only rewrite the rows still holding names
+                    names = ", ".join(f"'{member.name.lower()}'" for member in column.type.enum_class)
+                    result = conn.execute(text(
+                        f"UPDATE {table.name} SET {column.name} = {case} WHERE {column.name} IN ({names})"
+                    ))
+                    if not result.rowcount:
+                        continue
+                converted += 1
+                logger.info(f"Converted {table.name}.{column.name} to small-integer codes")
+    return converted
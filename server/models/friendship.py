@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, CheckConstraint, UniqueConstraint, and_
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from database import Base
+from database import Base, UTCDateTime
+from .enums import FriendRequestStatus, IntCode
 
 class FriendRequest(Base):
     __tablename__ = "friend_requests"
@@ -9,10 +10,10 @@ class FriendRequest(Base):
     id = Column(Integer, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    status = Column(String(20), default="pending")  # pending, accepted, declined, cancelled
+    status = Column(IntCode(FriendRequestStatus), default="pending")  # pending, accepted, declined, cancelled
     message = Column(String(500), nullable=True)  # Optional message with request
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_friend_requests")
@@ -22,24 +23,38 @@ class FriendRequest(Base):
     __table_args__ = (
         Index('idx_friend_request_sender', 'sender_id'),
         Index('idx_friend_request_recipient', 'recipient_id'),
-        Index('idx_friend_request_status', 'status'),
     )
 
+# Only pending requests are ever looked up by status, so index just those
+_PENDING = FriendRequest.status == "pending"  # Rendered as its small-integer code
+Index('idx_fr_pending_recipient', FriendRequest.recipient_id, postgresql_where=_PENDING, sqlite_where=_PENDING)
+Index('idx_fr_pending_sender', FriendRequest.sender_id, postgresql_where=_PENDING, sqlite_where=_PENDING)
+
 class Friendship(Base):
     __tablename__ = "friendships"
     
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     user2_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
     
     # Relationships
     user1 = relationship("User", foreign_keys=[user1_id])
     user2 = relationship("User", foreign_keys=[user2_id])
     
-    # Indexes for performance
+    # One row per pair, stored as (lower id, higher id). The unique index also serves lookups by user1_id
     __table_args__ = (
-        Index('idx_friendship_user1', 'user1_id'),
+        CheckConstraint('user1_id < user2_id', name='ck_friendship_canonical'),
+        UniqueConstraint('user1_id', 'user2_id', name='uq_friendship_pair'),
         Index('idx_friendship_user2', 'user2_id'),
-        Index('idx_friendship_users', 'user1_id', 'user2_id'),
-    ) 
\ No newline at end of file
+    )
+
+    @classmethod
+    def for_pair(cls, user_a: int, user_b: int) -> "Friendship":
+        """New friendship between two users in canonical order"""
+        return cls(user1_id=min(user_a, user_b), user2_id=max(user_a, user_b))
+
+    @classmethod
+    def between(cls, user_a: int, user_b: int):
+        """Filter for the friendship between two users - a single seek on uq_friendship_pair"""
+        return and_(cls.user1_id == min(user_a, user_b), cls.user2_id == max(user_a, user_b)) 
\ No newline at end of file
@@ -1,8 +1,33 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, ForeignKey, Index, PrimaryKeyConstraint, and_, insert, literal, null, or_, select, text, update
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from database import Base
-from datetime import datetime, timedelta
+from sqlalchemy.orm import relationship, deferred, undefer, attribute_keyed_dict, keyfunc_mapping, object_session, Session
+from database import Base, BIGINT_ID, UTCDateTime, upsert_insert
+from .direct_message import message_expires_at
+from .enums import GroupVisibility, IntCode, MediaType, MessageType
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+# GroupMessageReceipt kinds
+RECEIPT_READ = "read"
+RECEIPT_VIEW = "view"
+
+_GROUP_FIELDS = (
+    "id", "creator_id", "name", "description", "avatar_url", "member_count", "max_members",
+    "visibility", "join_approval_required", "auto_suggest_members", "auto_suggest_events",
+    "last_message_at", "message_count", "created_at", "is_active"
+)
+_MSG_FIELDS = ("id", "group_id", "sender_id", "message_type", "system_action", "created_at", "expires_at", "is_deleted")
+_MEDIA_FIELDS = ("media_url", "media_type", "view_duration")
+
+@lru_cache(maxsize=4096)
+def _top_interests(member_interests: Tuple[Tuple[str, ...], ...]) -> Tuple[str, ...]:
+    """Top 3 interests across members, memoized since stable groups recompute the same answer"""
+    # most_common(n) is a heap select, not a full sort
+    interest_counts = Counter(chain.from_iterable(member_interests))
+    return tuple(interest for interest, count in interest_counts.most_common(3))
 
 class GroupChat(Base):
     """
@@ -18,9 +43,10 @@ class GroupChat(Base):
     description = Column(Text, nullable=True)
     avatar_url = Column(String(500), nullable=True)
     
-    # Member management
-    members = Column(JSON, nullable=False)  # Array of user IDs
-    admins = Column(JSON, nullable=True)    # Array of admin user IDs
+    # Member management - membership rows live in group_members
+    # Legacy JSON arrays of user IDs, only read to backfill group_members
+    legacy_members = deferred(Column("members", JSON, nullable=False, default=list))
+    legacy_admins = deferred(Column("admins", JSON, nullable=True))
     member_count = Column(Integer, default=0)
     max_members = Column(Integer, default=50)
     
@@ -31,84 +57,91 @@ class GroupChat(Base):
     auto_suggest_events = Column(Boolean, default=True)
     
     # Privacy settings
-    visibility = Column(String(20), default="private")  # 'public', 'private', 'invite_only'
+    visibility = Column(IntCode(GroupVisibility), default="private")  # 'public', 'private', 'invite_only'
     join_approval_required = Column(Boolean, default=True)
     
     # Activity tracking
-    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    last_message_at = Column(UTCDateTime(), nullable=True)
     message_count = Column(Integer, default=0)
     
     # Status
     is_active = Column(Boolean, default=True)
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     
     # Relationships
     creator = relationship("User", back_populates="created_groups")
     embedding = relationship("GroupEmbedding", back_populates="group_chat", uselist=False)
+    # Keyed by user_id so membership checks are dict lookups
+    memberships = relationship(
+        "GroupMember",
+        back_populates="group",
+        collection_class=attribute_keyed_dict("user_id"),
+        cascade="all, delete-orphan"
+    )
 
     def __repr__(self):
         return f"<GroupChat(id={self.id}, name='{self.name}', members={self.member_count})>"
 
     def to_dict(self, include_members=False):
         """Convert group chat to dictionary"""
-        data = {
-            "id": self.id,
-            "creator_id": self.creator_id,
-            "name": self.name,
-            "description": self.description,
-            "avatar_url": self.avatar_url,
-            "member_count": self.member_count,
-            "max_members": self.max_members,
-            "group_interests": self.group_interests or [],
-            "visibility": self.visibility,
-            "join_approval_required": self.join_approval_required,
-            "auto_suggest_members": self.auto_suggest_members,
-            "auto_suggest_events": self.auto_suggest_events,
-            "last_message_at": self.last_message_at.isoformat() if self.last_message_at else None,
-            "message_count": self.message_count,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "is_active": self.is_active
-        }
+        data = {field: getattr(self, field) for field in _GROUP_FIELDS}
+        data["group_interests"] = self.group_interests or []
         
         if include_members:
-            data["members"] = self.members or []
-            data["admins"] = self.admins or []
+            data["members"] = self.member_ids
+            data["admins"] = self.admin_ids
         
         return data
 
+    @property
+    def member_ids(self):
+        """User IDs of all members"""
+        return list(self.memberships)
+
+    @property
+    def admin_ids(self):
+        """User IDs of admin members"""
+        return [user_id for user_id, membership in self.memberships.items() if membership.is_admin]
+
     def add_member(self, user_id: int, is_admin: bool = False):
         """Add a member to the group"""
-        if not self.members:
-            self.members = []
-        if not self.admins:
-            self.admins = []
-        
-        if user_id not in self.members:
-            self.members.append(user_id)
-            self.member_count = len(self.members)
-        
-        if is_admin and user_id not in self.admins:
-            self.admins.append(user_id)
+        membership = self.memberships.get(user_id)
+        if membership is None:
+            self.memberships[user_id] = GroupMember(user_id=user_id, is_admin=is_admin)
+            self.member_count = len(self.memberships)
+        elif is_admin:
+            membership.is_admin = True
 
     def remove_member(self, user_id: int):
         """Remove a member from the group"""
-        if self.members and user_id in self.members:
-            self.members.remove(user_id)
-            self.member_count = len(self.members)
-        
-        if self.admins and user_id in self.admins:
-            self.admins.remove(user_id)
+        if self.memberships.pop(user_id, None) is not None:
+            self.member_count = len(self.memberships)
+
+    def set_admin(self, user_id: int, is_admin: bool):
+        """Promote or demote an existing member"""
+        membership = self.memberships.get(user_id)
+        if membership is not None:
+            membership.is_admin = is_admin
+
+    def _membership(self, user_id: int):
+        """A user's GroupMember row, without loading every membership just to check one"""
+        db = object_session(self)
+        if "memberships" in self.__dict__ or db is None or self.id is None:
+            return self.memberships.get(user_id)
+        # Primary key lookup - served from the identity map or a single index seek
+        return db.get(GroupMember, (self.id, user_id))
 
     def is_member(self, user_id: int):
         """Check if user is a member"""
-        return user_id in (self.members or [])
+        return self._membership(user_id) is not None
 
     def is_admin(self, user_id: int):
         """Check if user is an admin"""
-        return user_id in (self.admins or [])
+        membership = self._membership(user_id)
+        return membership is not None and membership.is_admin
 
     def can_join(self, user_id: int = None):
         """Check if a user can join the group"""
@@ -125,98 +158,144 @@ class GroupChat(Base):
 
     def update_activity(self):
         """Update last activity timestamp"""
-        self.last_message_at = datetime.utcnow()
+        self.last_message_at = datetime.now(timezone.utc)
         self.message_count += 1
 
     def generate_group_vibe(self, member_interests: list):
         """Generate group vibe/interests from member data"""
-        # Simple implementation - count interest frequency
-        interest_counts = {}
-        for interests in member_interests:
-            for interest in interests:
-                interest_counts[interest] = interest_counts.get(interest, 0) + 1
-        
-        # Get top 3 most common interests
-        sorted_interests = sorted(interest_counts.items(), key=lambda x: x[1], reverse=True)
-        self.group_interests = [interest for interest, count in sorted_interests[:3]]
+        # Member order doesn't matter, so sort it to make reshuffled but identical groups share a cache entry
+        frozen = tuple(sorted(tuple(interests or ()) for interests in member_interests))
+        self.group_interests = list(_top_interests(frozen))
+
+class GroupMember(Base):
+    """
+    Group membership, one row per (group, user)
+    """
+    __tablename__ = "group_members"
+    __table_args__ = (
+        PrimaryKeyConstraint("group_id", "user_id"),
+        # "Which groups is this user in?" - the primary key already covers lookups by group
+        Index("idx_gm_user", "user_id"),
+    )
+
+    group_id = Column(Integer, ForeignKey("group_chats.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    is_admin = Column(Boolean, nullable=False, default=False)
+    joined_at = Column(UTCDateTime(), server_default=func.now())
+
+    # Relationships
+    group = relationship("GroupChat", back_populates="memberships")
+
+    def __repr__(self):
+        return f"<GroupMember(group_id={self.group_id}, user_id={self.user_id}, is_admin={self.is_admin})>"
+
+def backfill_group_members(db) -> int:
+    """
+    Create group_members rows from the legacy JSON arrays of groups that have none yet, emptying
+    the arrays in the same transaction so a group everyone has since left isn't repopulated
+    """
+    unmigrated = db.query(GroupChat).options(
+        undefer(GroupChat.legacy_members), undefer(GroupChat.legacy_admins)
+    ).filter(~GroupChat.memberships.any()).all()
+    
+    created = 0
+    for group in unmigrated:
+        admins = set(group.legacy_admins or [])
+        for user_id in dict.fromkeys(group.legacy_members or []):
+            group.add_member(user_id, user_id in admins)
+            created += 1
+        group.legacy_members = []
+        group.legacy_admins = null()
+    db.commit()
+    return created
 
 class GroupMessage(Base):
     """
     Messages within group chats (separate table for scalability)
     """
     __tablename__ = "group_messages"
+    __table_args__ = (
+        # Covers "a user's most recent text messages" for message embeddings
+        Index("ix_group_messages_sender_type_created", "sender_id", "message_type", "created_at"),
+        # Covers a group's recent text messages for group embeddings
+        Index("ix_group_messages_group_deleted_type_created", "group_id", "is_deleted", "message_type", "created_at"),
+        # A group's latest messages, newest first, without tombstoned rows
+        Index(
+            "idx_gm_group_time", "group_id", text("created_at DESC"),
+            postgresql_where=text("is_deleted = false"), sqlite_where=text("is_deleted = 0")
+        ),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BIGINT_ID, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("group_chats.id"), nullable=False, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Message content
     content = Column(Text, nullable=True)
     media_url = Column(String(500), nullable=True)
-    media_type = Column(String(20), nullable=True)  # 'photo', 'video', 'audio'
+    media_type = Column(IntCode(MediaType), nullable=True)  # 'photo', 'video', 'audio'
     
     # Message type and behavior
-    message_type = Column(String(20), default="text")  # 'text', 'media', 'system', 'suggestion'
+    message_type = Column(IntCode(MessageType), default="text")  # 'text', 'media', 'system', 'suggestion'
     view_duration = Column(Integer, nullable=True)  # For media messages (1-60 seconds)
     
     # System messages (member joins, leaves, etc.)
     system_action = Column(String(50), nullable=True)  # 'join', 'leave', 'add_member', etc.
     
     # Ephemeral settings
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
-    
-    # Read receipts - JSON array of {user_id, read_at}
-    read_receipts = Column(JSON, nullable=True)
+    expires_at = Column(UTCDateTime(), nullable=False, index=True)
     
-    # Media viewing tracking
-    view_receipts = Column(JSON, nullable=True)  # For media messages
-    screenshot_alerts = Column(JSON, nullable=True)  # Track screenshots
+    # Pre-group_message_receipts JSON arrays, only read by the backfill
+    legacy_read_receipts = deferred(Column("read_receipts", JSON, nullable=True))
+    legacy_view_receipts = deferred(Column("view_receipts", JSON, nullable=True))
+    legacy_screenshot_alerts = deferred(Column("screenshot_alerts", JSON, nullable=True))
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    created_at = Column(UTCDateTime(), server_default=func.now(), index=True)
     is_deleted = Column(Boolean, default=False)
     
     # Relationships
     group = relationship("GroupChat")
     sender = relationship("User")
+    # Read/view receipts keyed by (user_id, kind) - load with selectinload when listing messages
+    receipts = relationship(
+        "GroupMessageReceipt",
+        collection_class=keyfunc_mapping(lambda receipt: (receipt.user_id, receipt.kind)),
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         # Set default expiration based on message type
         if not self.expires_at:
-            if self.message_type == "media":
-                # Media messages expire after 24 hours (viewing window)
-                self.expires_at = datetime.utcnow() + timedelta(hours=24)
-            else:
-                # Text messages expire after 1 week
-                self.expires_at = datetime.utcnow() + timedelta(weeks=1)
+            self.expires_at = message_expires_at(self.message_type)
+
+    @classmethod
+    def bulk_create(cls, db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        """Insert many messages in batched multi-row INSERTs and return their ids (in no particular order)"""
+        if not rows:
+            return []
+        now = datetime.now(timezone.utc)  # One timestamp for the whole batch
+        rows = [
+            {**row, "expires_at": row.get("expires_at") or message_expires_at(row.get("message_type"), now)}
+            for row in rows
+        ]
+        return list(db.scalars(insert(cls).returning(cls.id), rows))
 
     def __repr__(self):
         return f"<GroupMessage(id={self.id}, group_id={self.group_id}, sender_id={self.sender_id}, type={self.message_type})>"
 
     def to_dict(self, for_user_id: int = None):
         """Convert message to dictionary"""
-        data = {
-            "id": self.id,
-            "group_id": self.group_id,
-            "sender_id": self.sender_id,
-            "message_type": self.message_type,
-            "system_action": self.system_action,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
-            "is_deleted": self.is_deleted
-        }
+        data = {field: getattr(self, field) for field in _MSG_FIELDS}
         
         # Include content based on message type
         if self.message_type == "text":
             data["content"] = self.content
         elif self.message_type == "media":
             if self.can_view(for_user_id):
-                data.update({
-                    "media_url": self.media_url,
-                    "media_type": self.media_type,
-                    "view_duration": self.view_duration
-                })
+                data.update({field: getattr(self, field) for field in _MEDIA_FIELDS})
         
         # Include read receipt info for sender
         if for_user_id and self.sender_id == for_user_id:
@@ -235,7 +314,12 @@ class GroupMessage(Base):
 
     def is_expired(self):
         """Check if message has expired"""
-        return datetime.utcnow() > self.expires_at
+        return datetime.now(timezone.utc) > self.expires_at
+
+    @classmethod
+    def live(cls, now: Optional[datetime] = None):
+        """SQL filter for messages that are neither deleted nor expired"""
+        return and_(cls.is_deleted == False, cls.expires_at > (now or datetime.now(timezone.utc)))
 
     def can_view(self, user_id: int):
         """Check if user can view this message"""
@@ -246,78 +330,176 @@ class GroupMessage(Base):
         # In a real implementation, check if user is group member
         return True
 
-    def mark_as_read(self, user_id: int):
+    @classmethod
+    def mark_read_by(cls, db: Session, user_id: int, group_id: int, message_ids: List[int]) -> int:
+        """Record read receipts for a group's messages in one statement, returning how many were new"""
+        if not message_ids:
+            return 0
+        messages = select(cls.id, literal(user_id), literal(RECEIPT_READ)).where(
+            cls.id.in_(message_ids),
+            cls.group_id == group_id
+        )
+        return _insert_receipts(db, messages)
+
+    def mark_as_read(self, db: Session, user_id: int):
         """Mark message as read by user"""
-        if not self.read_receipts:
-            self.read_receipts = []
-        
-        # Check if already marked as read by this user
-        for receipt in self.read_receipts:
-            if receipt.get('user_id') == user_id:
-                return  # Already marked as read
-        
-        # Add read receipt
-        self.read_receipts.append({
-            "user_id": user_id,
-            "read_at": datetime.utcnow().isoformat()
-        })
+        _insert_receipts(db, [{"message_id": self.id, "user_id": user_id, "kind": RECEIPT_READ}])
+        db.expire(self, ["receipts"])
 
-    def mark_as_viewed(self, user_id: int, screenshot_taken: bool = False):
+    def mark_as_viewed(self, db: Session, user_id: int, screenshot_taken: bool = False):
         """Mark media message as viewed by user"""
         if self.message_type != "media":
             return
         
-        if not self.view_receipts:
-            self.view_receipts = []
-        
-        # Check if already viewed by this user
-        for receipt in self.view_receipts:
-            if receipt.get('user_id') == user_id:
-                if screenshot_taken:
-                    self._add_screenshot_alert(user_id)
-                return
-        
-        # Add view receipt
-        self.view_receipts.append({
+        _insert_receipts(db, [{
+            "message_id": self.id,
             "user_id": user_id,
-            "viewed_at": datetime.utcnow().isoformat(),
-            "screenshot_taken": screenshot_taken
-        })
+            "kind": RECEIPT_VIEW,
+            "screenshot": screenshot_taken
+        }])
+        if screenshot_taken:
+            # Already viewed - flag the screenshot on the existing receipt
+            db.execute(
+                update(GroupMessageReceipt)
+                .where(
+                    GroupMessageReceipt.message_id == self.id,
+                    GroupMessageReceipt.user_id == user_id,
+                    GroupMessageReceipt.kind == RECEIPT_VIEW
+                )
+                .values(screenshot=True)
+                .execution_options(synchronize_session=False)
+            )
         
         # Also mark as read
-        self.mark_as_read(user_id)
-        
-        if screenshot_taken:
-            self._add_screenshot_alert(user_id)
+        self.mark_as_read(db, user_id)
 
-    def _add_screenshot_alert(self, user_id: int):
-        """Add screenshot alert"""
-        if not self.screenshot_alerts:
-            self.screenshot_alerts = []
-        
-        self.screenshot_alerts.append({
-            "user_id": user_id,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+    def _receipts_of_kind(self, kind: str):
+        """Loaded receipts of one kind"""
+        return [receipt for (_, receipt_kind), receipt in self.receipts.items() if receipt_kind == kind]
+
+    @property
+    def read_receipts(self):
+        """Read receipts as [{user_id, read_at}]"""
+        return [
+            {"user_id": receipt.user_id, "read_at": receipt.at}
+            for receipt in self._receipts_of_kind(RECEIPT_READ)
+        ]
+
+    @property
+    def view_receipts(self):
+        """View receipts as [{user_id, viewed_at, screenshot_taken}]"""
+        return [
+            {
+                "user_id": receipt.user_id,
+                "viewed_at": receipt.at,
+                "screenshot_taken": receipt.screenshot
+            }
+            for receipt in self._receipts_of_kind(RECEIPT_VIEW)
+        ]
+
+    @property
+    def screenshot_alerts(self):
+        """Screenshot alerts as [{user_id, timestamp}]"""
+        return [
+            {"user_id": receipt.user_id, "timestamp": receipt.at}
+            for receipt in self._receipts_of_kind(RECEIPT_VIEW)
+            if receipt.screenshot
+        ]
 
     def is_read_by_user(self, user_id: int):
         """Check if message is read by specific user"""
-        if not self.read_receipts:
-            return False
-        
-        return any(receipt.get('user_id') == user_id for receipt in self.read_receipts)
+        return (user_id, RECEIPT_READ) in self.receipts
 
     def is_viewed_by_user(self, user_id: int):
         """Check if media message is viewed by specific user"""
-        if self.message_type != "media" or not self.view_receipts:
-            return False
-        
-        return any(receipt.get('user_id') == user_id for receipt in self.view_receipts)
+        return self.message_type == "media" and (user_id, RECEIPT_VIEW) in self.receipts
 
     def get_read_count(self):
         """Get total read count"""
-        return len(self.read_receipts) if self.read_receipts else 0
+        return len(self._receipts_of_kind(RECEIPT_READ))
 
     def get_view_count(self):
         """Get total view count for media messages"""
-        return len(self.view_receipts) if self.view_receipts and self.message_type == "media" else 0 
\ No newline at end of file
+        return len(self._receipts_of_kind(RECEIPT_VIEW)) if self.message_type == "media" else 0
+
+class GroupMessageReceipt(Base):
+    """
+    Per-user read/view receipts for group messages
+    """
+    __tablename__ = "group_message_receipts"
+    __table_args__ = (
+        PrimaryKeyConstraint("message_id", "user_id", "kind"),
+    )
+
+    message_id = Column(BIGINT_ID, ForeignKey("group_messages.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(10), nullable=False)  # 'read', 'view'
+    at = Column(UTCDateTime(), server_default=func.now())
+    screenshot = Column(Boolean, nullable=False, default=False)  # View receipts only
+
+    def __repr__(self):
+        return f"<GroupMessageReceipt(message_id={self.message_id}, user_id={self.user_id}, kind={self.kind})>"
+
+def _insert_receipts(db: Session, receipts) -> int:
+    """Insert receipt rows (or a select of message_id, user_id, kind), skipping ones that already exist"""
+    # ON CONFLICT DO NOTHING on Postgres, INSERT OR IGNORE semantics on SQLite
+    stmt = upsert_insert(db, GroupMessageReceipt)
+    if isinstance(receipts, list):
+        stmt = stmt.values(receipts)
+    else:
+        stmt = stmt.from_select(["message_id", "user_id", "kind"], receipts)
+    return db.execute(stmt.on_conflict_do_nothing()).rowcount
+
+RECEIPT_BACKFILL_BATCH_SIZE = 500  # Receipt rows per INSERT when backfilling
+
+def _legacy_receipt_time(value) -> datetime:
+    """Timestamp of a legacy JSON receipt (naive ISO strings in UTC), or now if it has none"""
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=timezone.utc) if value else datetime.now(timezone.utc)
+    except (TypeError, ValueError):
+        return datetime.now(timezone.utc)
+
+def backfill_group_receipts(db) -> int:
+    """
+    Create group_message_receipts rows from the legacy JSON receipt arrays, clearing the arrays
+    in the same transaction so each message is only migrated once
+    """
+    legacy_messages = db.query(GroupMessage).options(
+        undefer(GroupMessage.legacy_read_receipts),
+        undefer(GroupMessage.legacy_view_receipts),
+        undefer(GroupMessage.legacy_screenshot_alerts)
+    ).filter(or_(
+        GroupMessage.legacy_read_receipts.isnot(None),
+        GroupMessage.legacy_view_receipts.isnot(None),
+        GroupMessage.legacy_screenshot_alerts.isnot(None)
+    )).all()
+    
+    # Keyed like the table's primary key; the first entry per user wins, as it did in the arrays
+    receipts = {}
+    for message in legacy_messages:
+        for receipt in message.legacy_read_receipts or []:
+            if receipt.get("user_id") is not None:
+                receipts.setdefault((message.id, receipt["user_id"], RECEIPT_READ), {
+                    "message_id": message.id, "user_id": receipt["user_id"], "kind": RECEIPT_READ,
+                    "at": _legacy_receipt_time(receipt.get("read_at")), "screenshot": False
+                })
+        
+        # A screenshot after the first view only added an alert, so both sources set the flag
+        screenshot_users = {alert.get("user_id") for alert in message.legacy_screenshot_alerts or []}
+        for receipt in message.legacy_view_receipts or []:
+            if receipt.get("user_id") is not None:
+                view = receipts.setdefault((message.id, receipt["user_id"], RECEIPT_VIEW), {
+                    "message_id": message.id, "user_id": receipt["user_id"], "kind": RECEIPT_VIEW,
+                    "at": _legacy_receipt_time(receipt.get("viewed_at")), "screenshot": False
+                })
+                view["screenshot"] |= bool(receipt.get("screenshot_taken")) or receipt["user_id"] in screenshot_users
+        
+        message.legacy_read_receipts = null()
+        message.legacy_view_receipts = null()
+        message.legacy_screenshot_alerts = null()
+    
+    rows = list(receipts.values())
+    for start in range(0, len(rows), RECEIPT_BACKFILL_BATCH_SIZE):
+        _insert_receipts(db, rows[start:start + RECEIPT_BACKFILL_BATCH_SIZE])
+    db.commit()
+    return len(rows)
@@ -1,9 +1,41 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey, Float, Numeric
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, ForeignKey, Float, Numeric, Index, PrimaryKeyConstraint, literal_column, null, select, text, update
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from database import Base
+from sqlalchemy.orm import relationship, validates, deferred, undefer, attribute_keyed_dict, object_session, raiseload, selectinload, Session
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.ext.hybrid import hybrid_method
+from database import Base, UTCDateTime, upsert_insert
+from utils.responses import isoformat_utc
+from config import settings
+from .enums import IntCode, RsvpStatus
 from datetime import datetime, timedelta, timezone
 import geohash
+import numpy as np
+
+MAX_ACTIVE_EVENTS = 3  # Active events a user may have at once
+GEOHASH_PRECISION = 7  # ~150m cells
+EARTH_RADIUS_KM = 6371
+
+def uses_postgis(dialect) -> bool:
+    """Whether events carry the PostGIS location column on this dialect"""
+    return settings.USE_POSTGIS and dialect.name == "postgresql"
+
+def _default_expires_at(context):
+    """Column default: events expire 1 hour after they end (7 days out if no end time was given)"""
+    end_time = context.get_current_parameters()["end_time"]
+    if end_time is None:
+        return datetime.now(timezone.utc) + timedelta(days=7)
+    return end_time + timedelta(hours=1)
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive datetimes as UTC"""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+def _encode_geohash(context):
+    """Column default: encode an event's coordinates once, when its row is inserted"""
+    params = context.get_current_parameters()
+    return geohash.encode(params["latitude"], params["longitude"], precision=GEOHASH_PRECISION)
 
 class Event(Base):
     """
@@ -24,7 +56,7 @@ class Event(Base):
     location_name = Column(String(200), nullable=False)  # Required for events
     latitude = Column(Float, nullable=False)  # Required for location validation
     longitude = Column(Float, nullable=False)  # Required for location validation
-    geohash = Column(String(20), nullable=False, index=True)  # For location-based queries
+    geohash = Column(String(20), nullable=False, index=True, default=_encode_geohash)  # For location-based queries
     creator_latitude = Column(Float, nullable=False)  # Creator's location when creating
     creator_longitude = Column(Float, nullable=False)  # Creator's location when creating
     location_privacy = Column(String(20), default="approximate")  # 'exact', 'approximate', 'hidden'
@@ -47,13 +79,14 @@ class Event(Base):
     view_count = Column(Integer, default=0)  # Analytics for premium events
     
     # Timing
-    start_time = Column(DateTime(timezone=True), nullable=False)  # Required for events
-    end_time = Column(DateTime(timezone=True), nullable=False)    # Required for events
-    rsvp_deadline = Column(DateTime(timezone=True), nullable=True)
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Auto-expire after end_time
+    # UTCDateTime loads these tz-aware on every backend, so comparisons need no tzinfo patch-up
+    start_time = Column(UTCDateTime(), nullable=False)  # Required for events
+    end_time = Column(UTCDateTime(), nullable=False)    # Required for events
+    rsvp_deadline = Column(UTCDateTime(), nullable=True)
+    expires_at = Column(UTCDateTime(), nullable=False, index=True, default=_default_expires_at)  # Auto-expire after end_time
     
-    # RSVP tracking with enhanced privacy
-    rsvps = Column(JSON, nullable=True)  # Array of {user_id, status, comment, timestamp, is_friend}
+    # RSVP tracking with enhanced privacy - RSVPs live in event_rsvps, counts are kept here
+    legacy_rsvps = deferred(Column("rsvps", JSON, nullable=True))  # Pre-event_rsvps JSON array, only read by the backfill
     attendee_count = Column(Integer, default=0)
     maybe_count = Column(Integer, default=0)
     declined_count = Column(Integer, default=0)
@@ -65,11 +98,20 @@ class Event(Base):
     is_ongoing = Column(Boolean, default=False)  # Currently happening
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     
-    # Legacy alias for backward compatibility
-    __table_args__ = ()
+    __table_args__ = (
+        # Covers the "active public events that haven't expired" recommendation scan
+        Index("ix_events_active_visibility_expires", "is_active", "visibility", "expires_at"),
+        # Latitude range scans for the bounding-box prefilter of radius searches without PostGIS
+        Index("ix_events_lat_lng", "latitude", "longitude"),
+        # A creator's active events by end time, for the active event cap
+        Index(
+            "ix_events_active_by_creator", "creator_id", "end_time",
+            postgresql_where=text("is_active = true"), sqlite_where=text("is_active = 1")
+        ),
+    )
     
     # Create alias for backward compatibility
     Hangout = None
@@ -77,34 +119,20 @@ class Event(Base):
     # Relationships
     creator = relationship("User", back_populates="created_events")
     embedding = relationship("EventEmbedding", back_populates="event", uselist=False)
-
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        
-        # Generate geohash if coordinates provided
-        if self.latitude and self.longitude and not self.geohash:
-            try:
-                self.geohash = geohash.encode(float(self.latitude), float(self.longitude), precision=7)
-            except Exception:
-                # If geohash fails, create a fallback geohash based on coordinates
-                self.geohash = f"{int(self.latitude*100)}_{int(self.longitude*100)}"
-        
-        # Set expiration to end_time if not specified
-        if not self.expires_at and self.end_time:
-            # Events expire 1 hour after end_time
-            self.expires_at = self.end_time + timedelta(hours=1)
-        elif not self.expires_at:
-            # Fallback: expire in 7 days (max advance time)
-            self.expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-        
-        # Validate creation constraints
-        self._validate_creation_constraints()
+    # Keyed by user_id so a user's RSVP is a dict lookup once loaded
+    rsvps = relationship(
+        "EventRsvp",
+        back_populates="event",
+        collection_class=attribute_keyed_dict("user_id"),
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     def __repr__(self):
         return f"<Event(id={self.id}, title='{self.title}', creator_id={self.creator_id}, is_premium={self.is_premium})>"
 
-    def to_dict(self, include_location=True, user_id=None, is_friend=False):
-        """Convert event to dictionary with privacy controls"""
+    def to_dict(self, include_location=True, user_id=None, is_friend=False, now: datetime = None):
+        """Convert event to dictionary with privacy controls (pass now to share one clock read across a list)"""
         data = {
             "id": self.id,
             "creator_id": self.creator_id,
@@ -124,14 +152,14 @@ class Event(Base):
             "story_media": self.story_media or [],
             "media_url": self.media_url,
             "media_type": self.media_type,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "start_time": self.start_time.isoformat() if self.start_time else None,
-            "end_time": self.end_time.isoformat() if self.end_time else None,
-            "rsvp_deadline": self.rsvp_deadline.isoformat() if self.rsvp_deadline else None,
-            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "rsvp_deadline": self.rsvp_deadline,
+            "expires_at": self.expires_at,
             "is_active": self.is_active,
-            "can_rsvp": self.can_rsvp(user_id),
+            "can_rsvp": self.can_rsvp(user_id, now),
             "user_rsvp": self.get_user_rsvp(user_id) if user_id else None
         }
         
@@ -160,92 +188,101 @@ class Event(Base):
         
         return data
 
-    def is_expired(self):
+    @hybrid_method
+    def is_expired(self, now: datetime = None):
         """Check if event has expired"""
-        now = datetime.now(timezone.utc)
-        # Ensure expires_at is timezone-aware for comparison
-        expires_at = self.expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        return now > expires_at
+        return (now or datetime.now(timezone.utc)) > self.expires_at
+
+    @is_expired.expression
+    def is_expired(cls, now: datetime = None):
+        return cls.expires_at < (now if now is not None else func.now())
 
-    def is_happening_now(self):
+    @hybrid_method
+    def is_happening_now(self, now: datetime = None):
         """Check if event is currently happening"""
-        now = datetime.now(timezone.utc)
-        # Ensure start_time and end_time are timezone-aware for comparison
-        start_time = self.start_time
-        end_time = self.end_time
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        return start_time <= now <= end_time
-
-    def add_rsvp(self, user_id: int, status: str, comment: str = None, is_friend: bool = False):
-        """Add or update RSVP for a user with friend tracking"""
-        if not self.rsvps:
-            self.rsvps = []
-        
-        # Remove existing RSVP from same user
-        self.rsvps = [r for r in self.rsvps if r.get('user_id') != user_id]
+        now = now or datetime.now(timezone.utc)
+        return self.start_time <= now <= self.end_time
+
+    @is_happening_now.expression
+    def is_happening_now(cls, now: datetime = None):
+        now = now if now is not None else func.now()
+        return (cls.start_time <= now) & (cls.end_time >= now)
+
+    def add_rsvp(self, db: Session, user_id: int, status: str, comment: str = None, is_friend: bool = False):
+        """Add or update RSVP for a user with friend tracking (one upsert, then one recount)"""
+        stmt = upsert_insert(db, EventRsvp).values(
+            event_id=self.id,
+            user_id=user_id,
+            status=status,  # 'yes', 'maybe', 'no'
+            comment=comment,
+            is_friend=is_friend,
+            timestamp=datetime.now(timezone.utc)
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["event_id", "user_id"],
+            set_={column: stmt.excluded[column] for column in ("status", "comment", "is_friend", "timestamp")}
+        ))
         
-        # Add new RSVP
-        rsvp_data = {
-            "user_id": user_id,
-            "status": status,  # 'yes', 'maybe', 'no'
-            "comment": comment,
-            "is_friend": is_friend,
-            "timestamp": datetime.now(timezone.utc).isoformat()
-        }
-        self.rsvps.append(rsvp_data)
+        # The upsert bypassed the ORM, so drop any copy of this RSVP the session already holds
+        existing = db.identity_map.get(identity_key(EventRsvp, (self.id, user_id)))
+        if existing is not None:
+            db.expire(existing)
+        db.expire(self, ["rsvps"])
         
         # Update counts
-        self._update_rsvp_counts()
+        self._update_rsvp_counts(db)
 
-    def _update_rsvp_counts(self):
-        """Update RSVP counts based on current RSVPs"""
-        if not self.rsvps:
-            self.attendee_count = self.maybe_count = self.declined_count = self.friend_attendee_count = 0
-            return
+    def _update_rsvp_counts(self, db: Session):
+        """Recount RSVPs from event_rsvps in a single UPDATE"""
+        def rsvp_count(*conditions):
+            return select(func.count()).where(EventRsvp.event_id == Event.id, *conditions).scalar_subquery()
         
-        self.attendee_count = sum(1 for r in self.rsvps if r.get('status') == 'yes')
-        self.maybe_count = sum(1 for r in self.rsvps if r.get('status') == 'maybe')
-        self.declined_count = sum(1 for r in self.rsvps if r.get('status') == 'no')
-        self.friend_attendee_count = sum(1 for r in self.rsvps if r.get('status') == 'yes' and r.get('is_friend', False))
+        db.execute(
+            update(Event)
+            .where(Event.id == self.id)
+            .values(
+                attendee_count=rsvp_count(EventRsvp.status == "yes"),
+                maybe_count=rsvp_count(EventRsvp.status == "maybe"),
+                declined_count=rsvp_count(EventRsvp.status == "no"),
+                friend_attendee_count=rsvp_count(EventRsvp.status == "yes", EventRsvp.is_friend == True)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.expire(self, ["attendee_count", "maybe_count", "declined_count", "friend_attendee_count"])
+
+    def _rsvp(self, user_id: int):
+        """A user's EventRsvp row, without loading every RSVP just to find one"""
+        db = object_session(self)
+        if "rsvps" in self.__dict__ or db is None or self.id is None:
+            return self.rsvps.get(user_id)
+        return db.get(EventRsvp, (self.id, user_id))
 
     def get_user_rsvp(self, user_id: int):
         """Get RSVP status for a specific user"""
-        if not self.rsvps or not user_id:
+        if not user_id:
             return None
         
-        return next((r for r in self.rsvps if r.get('user_id') == user_id), None)
+        rsvp = self._rsvp(user_id)
+        return rsvp.to_dict() if rsvp is not None else None
 
-    def can_rsvp(self, user_id: int = None):
+    def can_rsvp(self, user_id: int = None, now: datetime = None):
         """Check if RSVPs are still allowed"""
-        if not self.is_active or self.is_expired():
+        now = now or datetime.now(timezone.utc)
+        if not self.is_active or self.is_expired(now):
             return False
         
-        now = datetime.now(timezone.utc)
-        
         # Check if event has already ended
-        end_time = self.end_time
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-        if now > end_time:
+        if now > self.end_time:
             return False
         
         # Check RSVP deadline
-        if self.rsvp_deadline:
-            deadline = self.rsvp_deadline
-            if deadline.tzinfo is None:
-                deadline = deadline.replace(tzinfo=timezone.utc)
-            if now > deadline:
-                return False
+        if self.rsvp_deadline and now > self.rsvp_deadline:
+            return False
         
         # Check attendee limit
         if self.max_attendees and self.attendee_count >= self.max_attendees:
             # Allow if user already has an RSVP
-            if user_id and self.get_user_rsvp(user_id):
+            if user_id and self._rsvp(user_id) is not None:
                 return True
             return False
         
@@ -265,7 +302,7 @@ class Event(Base):
             "url": media_url,
             "type": media_type,
             "caption": caption,
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": isoformat_utc(datetime.now(timezone.utc))
         }
         self.story_media.append(media_item)
 
@@ -278,64 +315,183 @@ class Event(Base):
         dlat = lat2 - lat1
         dlng = lng2 - lng1
         a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        distance_km = 2 * asin(sqrt(a)) * 6371  # Earth's radius in km
+        distance_km = 2 * asin(sqrt(a)) * EARTH_RADIUS_KM
         
         return distance_km <= max_distance_km
 
-    def _validate_creation_constraints(self):
-        """Validate event creation constraints"""
-        now = datetime.now(timezone.utc)
-        
-        # Ensure times are timezone-aware for comparison
-        start_time = self.start_time
-        end_time = self.end_time
+    @staticmethod
+    def near(lat: float, lng: float, radius_km: float):
+        """PostGIS filter for events within radius_km of a point, answered from the GiST index"""
+        point = func.geography(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326))
+        return func.ST_DWithin(literal_column("events.location"), point, radius_km * 1000)
+
+    @classmethod
+    def bounding_box(cls, lat: float, lng: float, radius_km: float) -> tuple:
+        """Filter criteria for the lat/lng box enclosing a radius_km circle, to prefilter a radius search"""
+        lat_span = np.degrees(radius_km / EARTH_RADIUS_KM)
+        criteria = [cls.latitude.between(lat - lat_span, lat + lat_span)]
         
-        if start_time and start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time and end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
+        # Degrees of longitude shrink with cos(latitude); near the poles or across the
+        # antimeridian the box would wrap, so only latitude is bounded there
+        cos_lat = np.cos(np.radians(min(abs(lat) + lat_span, 90.0)))
+        if cos_lat > 0:
+            lng_span = lat_span / cos_lat
+            if -180.0 <= lng - lng_span and lng + lng_span <= 180.0:
+                criteria.append(cls.longitude.between(lng - lng_span, lng + lng_span))
+        return tuple(criteria)
+
+    @staticmethod
+    def validate_location_proximity_batch(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray,
+                                          max_distance_km: float = 0.1) -> np.ndarray:
+        """validate_location_proximity over many points at once: a bool mask of those within range"""
+        lat0, lng0 = np.radians(lat), np.radians(lng)
+        lats, lngs = np.radians(lats), np.radians(lngs)
+        a = np.sin((lats - lat0) * 0.5) ** 2 + np.cos(lat0) * np.cos(lats) * np.sin((lngs - lng0) * 0.5) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a)) <= max_distance_km
+
+    @validates("start_time")
+    def _validate_start_time(self, key, start_time):
+        """Validate event creation constraints (only runs when the attribute is set, never on load)"""
+        start_time = _as_utc(start_time)
+        if start_time is None:
+            return start_time
+        now = datetime.now(timezone.utc)
         
         # Cannot create events more than 1 week in advance
-        if start_time and start_time > now + timedelta(weeks=1):
+        if start_time > now + timedelta(weeks=1):
             raise ValueError("Events cannot be created more than 1 week in advance")
         
-        # End time must be after start time
-        if start_time and end_time and end_time <= start_time:
-            raise ValueError("End time must be after start time")
-        
         # Events cannot be created in the past
-        if start_time and start_time < now:
+        if start_time < now:
             raise ValueError("Events cannot be created in the past")
+        
+        if self.end_time is not None and self.end_time <= start_time:
+            raise ValueError("End time must be after start time")
+        return start_time
+
+    @validates("end_time")
+    def _validate_end_time(self, key, end_time):
+        """End time must be after start time"""
+        end_time = _as_utc(end_time)
+        if end_time is not None and self.start_time is not None and end_time <= self.start_time:
+            raise ValueError("End time must be after start time")
+        return end_time
 
     @classmethod
-    def get_user_active_event_count(cls, db_session, user_id: int):
-        """Get count of active events created by user"""
-        return db_session.query(cls).filter(
+    def get_user_active_event_count(cls, db_session, user_id: int, limit: int = None):
+        """Get count of active events created by user (stopping at limit, if given)"""
+        active = select(cls.id).where(
             cls.creator_id == user_id,
             cls.is_active == True,
             cls.end_time > datetime.now(timezone.utc)
-        ).count()
+        ).limit(limit).subquery()
+        return db_session.execute(select(func.count()).select_from(active)).scalar()
 
     @classmethod
     def can_user_create_event(cls, db_session, user_id: int):
         """Check if user can create a new event (max 3 active events)"""
-        active_count = cls.get_user_active_event_count(db_session, user_id)
-        return active_count < 3
+        active_count = cls.get_user_active_event_count(db_session, user_id, limit=MAX_ACTIVE_EVENTS)
+        return active_count < MAX_ACTIVE_EVENTS
+
+    @classmethod
+    def listing_options(cls, viewer_id: int):
+        """
+        Loader options for queries that serialize many events: load only the viewer's RSVP
+        up front and raise on any other lazy load, so to_dict can't turn into one query per event
+        """
+        return (
+            selectinload(cls.rsvps.and_(EventRsvp.user_id == viewer_id)),
+            raiseload("*"),
+        )
 
-    def update_ongoing_status(self):
+    def update_ongoing_status(self, now: datetime = None):
         """Update is_ongoing status based on current time"""
-        now = datetime.now(timezone.utc)
-        
-        # Ensure times are timezone-aware for comparison
-        start_time = self.start_time
-        end_time = self.end_time
-        
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=timezone.utc)
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-            
-        self.is_ongoing = start_time <= now <= end_time
+        self.is_ongoing = self.is_happening_now(now)
+
+class EventRsvp(Base):
+    """
+    A user's RSVP to an event, one row per (event, user)
+    """
+    __tablename__ = "event_rsvps"
+    __table_args__ = (
+        PrimaryKeyConstraint("event_id", "user_id"),
+        # Per-status counts for an event
+        Index("idx_event_rsvps_event_status", "event_id", "status"),
+        # Events a user is attending or has declined
+        Index("idx_event_rsvps_user_status", "user_id", "status"),
+    )
+
+    event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    status = Column(IntCode(RsvpStatus), nullable=False)  # 'yes', 'maybe', 'no'
+    comment = Column(Text, nullable=True)
+    is_friend = Column(Boolean, nullable=False, default=False)  # Friends with the creator when they RSVP'd
+    timestamp = Column(UTCDateTime(), server_default=func.now())
+
+    # Relationships
+    event = relationship("Event", back_populates="rsvps")
+
+    def __repr__(self):
+        return f"<EventRsvp(event_id={self.event_id}, user_id={self.user_id}, status={self.status})>"
+
+    def to_dict(self):
+        """Convert RSVP to dictionary"""
+        return {
+            "user_id": self.user_id,
+            "status": self.status,
+            "comment": self.comment,
+            "is_friend": self.is_friend,
+            "timestamp": self.timestamp
+        }
+
+def backfill_event_rsvps(db) -> int:
+    """
+    Create event_rsvps rows from the legacy JSON arrays of events that have none yet, clearing
+    the arrays in the same transaction so an event whose RSVPs were all withdrawn isn't repopulated
+    """
+    unmigrated = db.query(Event).options(undefer(Event.legacy_rsvps)).filter(
+        Event.legacy_rsvps.isnot(None),
+        ~Event.rsvps.any()
+    ).all()
+    
+    created = 0
+    for event in unmigrated:
+        for rsvp in event.legacy_rsvps or []:
+            user_id, status = rsvp.get("user_id"), rsvp.get("status")
+            if user_id is None or status not in ("yes", "maybe", "no"):
+                continue
+            try:
+                timestamp = datetime.fromisoformat(rsvp["timestamp"]) if rsvp.get("timestamp") else None
+            except (TypeError, ValueError):
+                timestamp = None
+            # Later entries win, as they did in the JSON array
+            event.rsvps[user_id] = EventRsvp(
+                user_id=user_id,
+                status=status,
+                comment=rsvp.get("comment"),
+                is_friend=bool(rsvp.get("is_friend", False)),
+                timestamp=timestamp
+            )
+        created += len(event.rsvps)
+        event.legacy_rsvps = null()
+    db.commit()
+    return created
+
+def add_event_locations(engine) -> bool:
+    """
+    Give events a generated PostGIS geography column and GiST index (when USE_POSTGIS is on),
+    returning whether the DDL ran. Idempotent, so it is safe on every startup
+    """
+    if not uses_postgis(engine.dialect):
+        return False
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+        conn.execute(text(
+            "ALTER TABLE events ADD COLUMN IF NOT EXISTS location geography(Point, 4326) "
+            "GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED"
+        ))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_events_location_gist ON events USING GIST (location)"))
+    return True
 
 # Create backward-compatible alias
-Hangout = Event 
\ No newline at end of file
+Hangout = Event 
@@ -1,8 +1,19 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, ForeignKey, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
-from database import Base
-from datetime import datetime, timedelta
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.orm.attributes import flag_modified
+from database import Base, BIGINT_ID, UTCDateTime
+from utils.responses import isoformat_utc
+from datetime import datetime, timedelta, timezone
+
+_SNAP_FIELDS = (
+    "id", "sender_id", "media_url", "media_type", "caption", "view_duration", "total_views",
+    "total_screenshots", "is_opened", "created_at", "expires_at", "is_active"
+)
+
+def _default_expires_at():
+    """Snaps expire 24 hours after they are sent unless told otherwise"""
+    return datetime.now(timezone.utc) + timedelta(hours=24)
 
 class Snap(Base):
     """
@@ -10,7 +21,7 @@ class Snap(Base):
     """
     __tablename__ = "snaps"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BIGINT_ID, primary_key=True, index=True)
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Recipients (can be individuals, groups, or circles)
@@ -25,7 +36,7 @@ class Snap(Base):
     
     # Ephemeral settings
     view_duration = Column(Integer, default=10)  # Duration in seconds (1-60) for viewing
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # When snap expires completely
+    expires_at = Column(UTCDateTime(), nullable=False, index=True, default=_default_expires_at)  # When snap expires completely
     
     # Viewing tracking
     views = Column(JSON, nullable=True)  # Array of {user_id, viewed_at, screenshot_taken}
@@ -37,16 +48,19 @@ class Snap(Base):
     is_active = Column(Boolean, default=True)
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
     
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id])
+    group_links = relationship("SnapGroup", cascade="all, delete-orphan")
+    
+    _views_index = None  # (views list, {user_id: view}) built on first lookup
 
-    def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        # Set expiration to 24 hours from creation if not specified
-        if not self.expires_at:
-            self.expires_at = datetime.utcnow() + timedelta(hours=24)
+    @validates("group_ids")
+    def _mirror_group_ids(self, key, group_ids):
+        """Mirror group recipients into the indexed join table"""
+        self.group_links = [SnapGroup(group_id=group_id) for group_id in group_ids or []]
+        return group_ids
 
     def __repr__(self):
         total_recipients = len(self.recipient_ids or []) + len(self.group_ids or [])
@@ -54,22 +68,9 @@ class Snap(Base):
 
     def to_dict(self, for_user_id: int = None):
         """Convert snap to dictionary"""
-        data = {
-            "id": self.id,
-            "sender_id": self.sender_id,
-            "recipient_ids": self.recipient_ids or [],
-            "group_ids": self.group_ids or [],
-            "media_url": self.media_url,
-            "media_type": self.media_type,
-            "caption": self.caption,
-            "view_duration": self.view_duration,
-            "total_views": self.total_views,
-            "total_screenshots": self.total_screenshots,
-            "is_opened": self.is_opened,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
-            "is_active": self.is_active
-        }
+        data = {field: getattr(self, field) for field in _SNAP_FIELDS}
+        data["recipient_ids"] = self.recipient_ids or []
+        data["group_ids"] = self.group_ids or []
         
         # Include view info if user has access
         if for_user_id and self.can_view(for_user_id):
@@ -81,7 +82,14 @@ class Snap(Base):
 
     def is_expired(self):
         """Check if snap has expired"""
-        return datetime.utcnow() > self.expires_at
+        return datetime.now(timezone.utc) > self.expires_at
+
+    def _view_index(self) -> dict:
+        """Views keyed by user_id, rebuilt only when the views list itself is replaced (e.g. reloaded)"""
+        views = self.views or []
+        if self._views_index is None or self._views_index[0] is not views:
+            self._views_index = (views, {v.get('user_id'): v for v in views})
+        return self._views_index[1]
 
     def add_view(self, viewer_id: int, screenshot_taken: bool = False):
         """Add a view to the snap"""
@@ -89,23 +97,27 @@ class Snap(Base):
             self.views = []
         
         # Check if user already viewed
-        existing_view = next((v for v in self.views if v.get('user_id') == viewer_id), None)
+        views_by_user = self._view_index()
+        existing_view = views_by_user.get(viewer_id)
         
         if not existing_view:
             view_data = {
                 "user_id": viewer_id,
-                "viewed_at": datetime.utcnow().isoformat(),
+                "viewed_at": isoformat_utc(datetime.now(timezone.utc)),
                 "screenshot_taken": screenshot_taken
             }
             self.views.append(view_data)
+            views_by_user[viewer_id] = view_data
             self.total_views = len(self.views)
             self.is_opened = True
         
-        # Update screenshot count
-        if screenshot_taken:
+        # Update screenshot count (a viewer's first screenshot bumps it, later ones don't)
+        if screenshot_taken and not (existing_view and existing_view.get("screenshot_taken", False)):
             if existing_view:
                 existing_view["screenshot_taken"] = True
-            self.total_screenshots = sum(1 for v in self.views if v.get("screenshot_taken", False))
+            self.total_screenshots = (self.total_screenshots or 0) + 1
+        
+        flag_modified(self, "views")  # In-place JSON changes aren't tracked otherwise
 
     def can_view(self, user_id: int):
         """Check if user can view this snap"""
@@ -130,4 +142,20 @@ class Snap(Base):
         if not self.views:
             return None
         
-        return next((v for v in self.views if v.get('user_id') == user_id), None) 
\ No newline at end of file
+        return self._view_index().get(user_id)
+
+class SnapGroup(Base):
+    """
+    Snap-to-group recipient link (indexed lookup of a group's snaps)
+    """
+    __tablename__ = "snap_groups"
+    __table_args__ = (
+        Index("ix_snap_groups_group_snap", "group_id", "snap_id"),
+    )
+
+    id = Column(BIGINT_ID, primary_key=True, index=True)
+    snap_id = Column(BIGINT_ID, ForeignKey("snaps.id", ondelete="CASCADE"), nullable=False, index=True)
+    group_id = Column(Integer, ForeignKey("group_chats.id", ondelete="CASCADE"), nullable=False)
+
+    def __repr__(self):
+        return f"<SnapGroup(snap_id={self.snap_id}, group_id={self.group_id})>"
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from database import Base
-from datetime import datetime, timedelta
+from database import Base, BIGINT_ID, UTCDateTime
+from datetime import datetime, timedelta, timezone
+
+_STORY_FIELDS = (
+    "id", "user_id", "media_url", "media_type", "caption", "visibility",
+    "view_count", "created_at", "expires_at", "is_active"
+)
 
 class Story(Base):
     """
@@ -10,7 +15,7 @@ class Story(Base):
     """
     __tablename__ = "stories"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(BIGINT_ID, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     
     # Content information
@@ -23,14 +28,14 @@ class Story(Base):
     circles = Column(JSON, nullable=True)  # Array of circle IDs for targeted sharing
     
     # Ephemeral settings
-    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    expires_at = Column(UTCDateTime(), nullable=False, index=True)
     
     # Engagement
     view_count = Column(Integer, default=0)
     viewers = Column(JSON, nullable=True)  # Array of user IDs who viewed
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
     is_active = Column(Boolean, default=True)
     
     # Relationships
@@ -40,29 +45,18 @@ class Story(Base):
         super().__init__(**kwargs)
         # Set expiration to 24 hours from creation
         if not self.expires_at:
-            self.expires_at = datetime.utcnow() + timedelta(hours=24)
+            self.expires_at = datetime.now(timezone.utc) + timedelta(hours=24)
 
     def __repr__(self):
         return f"<Story(id={self.id}, user_id={self.user_id}, active={self.is_active})>"
 
     def to_dict(self):
         """Convert story to dictionary"""
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "media_url": self.media_url,
-            "media_type": self.media_type,
-            "caption": self.caption,
-            "visibility": self.visibility,
-            "view_count": self.view_count,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
-            "is_active": self.is_active
-        }
+        return {field: getattr(self, field) for field in _STORY_FIELDS}
 
     def is_expired(self):
         """Check if story has expired"""
-        return datetime.utcnow() > self.expires_at
+        return datetime.now(timezone.utc) > self.expires_at
 
     def add_view(self, viewer_id: int):
         """Add a view to the story"""
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
-from database import Base
+from database import Base, UTCDateTime
+
+_USER_FIELDS = ("id", "username", "bio", "profile_photo_url", "open_to_friends", "is_verified", "created_at")
 
 class User(Base):
     """
@@ -29,9 +31,9 @@ class User(Base):
     is_verified = Column(Boolean, default=False)
     
     # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
-    last_active = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
+    last_active = Column(UTCDateTime(), server_default=func.now())
     
     # Relationships
     stories = relationship("Story", back_populates="user", lazy="dynamic")
@@ -54,16 +56,9 @@ class User(Base):
         """
         Convert user to dictionary (excluding sensitive information)
         """
-        return {
-            "id": self.id,
-            "username": self.username,
-            "bio": self.bio,
-            "interests": self.interests or [],
-            "profile_photo_url": self.profile_photo_url,
-            "open_to_friends": self.open_to_friends,
-            "is_verified": self.is_verified,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-        }
+        data = {field: getattr(self, field) for field in _USER_FIELDS}
+        data["interests"] = self.interests or []
+        return data
 
     def to_public_dict(self):
         """
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, JSON, Text, Float
 from sqlalchemy.sql import func
-from database import Base
+from database import Base, UTCDateTime
 
 class Venue(Base):
     """
@@ -48,19 +48,19 @@ class Venue(Base):
     # Sponsorship and promotion
     is_sponsored = Column(Boolean, default=False)
     sponsor_tier = Column(String(20), nullable=True)  # 'basic', 'premium', 'featured'
-    sponsor_expires_at = Column(DateTime(timezone=True), nullable=True)
+    sponsor_expires_at = Column(UTCDateTime(), nullable=True)
     
     # Activity tracking
     hangout_count = Column(Integer, default=0)  # Number of hangouts hosted here
-    last_hangout_at = Column(DateTime(timezone=True), nullable=True)
+    last_hangout_at = Column(UTCDateTime(), nullable=True)
     
     # Status
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)  # Verified by LadChat team
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now())
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     added_by = Column(Integer, nullable=True)  # User ID who added this venue (for user submissions)
 
     def __repr__(self):
@@ -86,7 +86,7 @@ class Venue(Base):
             "sponsor_tier": self.sponsor_tier,
             "hangout_count": self.hangout_count,
             "is_verified": self.is_verified,
-            "created_at": self.created_at.isoformat() if self.created_at else None
+            "created_at": self.created_at
         }
         
         if include_details:
@@ -98,7 +98,7 @@ class Venue(Base):
                 "hours": self.hours or {},
                 "photos": self.photos or [],
                 "features": self.features or [],
-                "last_hangout_at": self.last_hangout_at.isoformat() if self.last_hangout_at else None
+                "last_hangout_at": self.last_hangout_at
             })
         
         return data
@@ -158,8 +158,8 @@ class Venue(Base):
             return False
         
         if self.sponsor_expires_at:
-            from datetime import datetime
-            return datetime.utcnow() < self.sponsor_expires_at
+            from datetime import datetime, timezone
+            return datetime.now(timezone.utc) < self.sponsor_expires_at
         
         return True
 
@@ -185,8 +185,8 @@ class VenueReview(Base):
     photos = Column(JSON, nullable=True)  # Array of photo URLs
     
     # Metadata
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    created_at = Column(UTCDateTime(), server_default=func.now(), index=True)
+    updated_at = Column(UTCDateTime(), server_default=func.now(), onupdate=func.now())
     is_verified = Column(Boolean, default=False)  # Verified review
     
     # Moderation
@@ -207,6 +207,6 @@ class VenueReview(Base):
             "content": self.content,
             "lad_friendly_rating": self.lad_friendly_rating,
             "photos": self.photos or [],
-            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "created_at": self.created_at,
             "is_verified": self.is_verified
         } 
\ No newline at end of file
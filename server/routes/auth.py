@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
 import os
@@ -13,10 +13,11 @@ from schemas import (
     UserRegistration, UserLogin, TokenResponse, TokenRefresh,
     UserResponse, UserUpdate, PasswordChange, SuccessResponse
 )
-from auth import AuthManager, get_current_user
+from auth import AuthManager, get_current_user, invalidate_user_cache
 from config import settings
-from ai.embedding_service import embedding_service
-from ai.chroma_client import chroma_client
+from ai.embedding_service import get_embedding_service
+from ai.chroma_client import get_chroma_client
+from ai.rag_engine import invalidate_recommendations
 import logging
 
 logger = logging.getLogger(__name__)
@@ -48,7 +49,7 @@ async def register_user(user_data: UserRegistration, db: Session = Depends(get_d
                 )
         
         # Hash the password
-        hashed_password = AuthManager.get_password_hash(user_data.password)
+        hashed_password = await AuthManager.get_password_hash_async(user_data.password)
         
         # Create new user
         new_user = User(
@@ -65,7 +66,7 @@ async def register_user(user_data: UserRegistration, db: Session = Depends(get_d
         
         # Create user embedding immediately for testing
         try:
-            profile_embedding = await embedding_service.generate_user_profile_embedding(new_user)
+            profile_embedding = await get_embedding_service().generate_user_profile_embedding(new_user)
             if profile_embedding:
                 # Store in database
                 user_embedding = UserEmbedding(
@@ -77,7 +78,7 @@ async def register_user(user_data: UserRegistration, db: Session = Depends(get_d
                 db.commit()
                 
                 # Store in ChromaDB with single embedding
-                chroma_client.add_user_embedding(
+                get_chroma_client().add_user_embedding(
                     new_user.id, 
                     profile_embedding, 
                     [],  # Empty message embedding for testing
@@ -115,7 +116,7 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
     """
     Authenticate user and return JWT tokens
     """
-    user = AuthManager.authenticate_user(
+    user = await AuthManager.authenticate_user(
         db, user_credentials.username, user_credentials.password
     )
     
@@ -132,13 +133,15 @@ async def login_user(user_credentials: UserLogin, db: Session = Depends(get_db))
             detail="Inactive user account"
         )
     
+    # Claims are read before the commit below expires the user's loaded columns
+    token_data = {"sub": str(user.id), "username": user.username}
+    
     # Update last active timestamp
     from sqlalchemy import func
     user.last_active = func.now()
     db.commit()
     
     # Create JWT tokens
-    token_data = {"sub": str(user.id), "username": user.username}
     access_token = AuthManager.create_access_token(token_data)
     refresh_token = AuthManager.create_refresh_token(token_data)
     
@@ -176,7 +179,10 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
             detail="Invalid refresh token"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Only the columns the new token needs
+    user = db.query(User).options(
+        load_only(User.id, User.username, User.is_active)
+    ).filter(User.id == user_id).first()
     
     if not user or not user.is_active:
         raise HTTPException(
@@ -185,8 +191,7 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
         )
     
     # Create new access token
-    token_data = {"sub": str(user.id), "username": user.username}
-    access_token = AuthManager.create_access_token(token_data)
+    access_token = AuthManager.create_access_token({"sub": str(user.id), "username": user.username})
     
     return TokenResponse(
         access_token=access_token,
@@ -246,11 +251,12 @@ async def update_user_profile(
     
     db.commit()
     db.refresh(current_user)
+    invalidate_user_cache(current_user.id)
     
     # Update embeddings immediately if profile data changed
     if profile_changed:
         try:
-            profile_embedding = await embedding_service.generate_user_profile_embedding(current_user)
+            profile_embedding = await get_embedding_service().generate_user_profile_embedding(current_user)
             if profile_embedding:
                 # Update database
                 user_embedding = db.query(UserEmbedding).filter(UserEmbedding.user_id == current_user.id).first()
@@ -267,7 +273,7 @@ async def update_user_profile(
                 db.commit()
                 
                 # Update ChromaDB
-                chroma_client.add_user_embedding(
+                get_chroma_client().add_user_embedding(
                     current_user.id,
                     profile_embedding,
                     [],  # Empty message embedding for testing
@@ -275,6 +281,7 @@ async def update_user_profile(
                         "username": current_user.username
                     }
                 )
+                invalidate_recommendations(current_user.id, friends=True, events=True)
                 logger.info(f"Updated embedding for user {current_user.id}")
             else:
                 logger.warning(f"Failed to update embedding for user {current_user.id}")
@@ -303,14 +310,14 @@ async def change_password(
     Change user's password
     """
     # Verify current password
-    if not AuthManager.verify_password(password_data.current_password, current_user.hashed_password):
+    if not await AuthManager.verify_password_async(password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
     # Hash new password
-    new_hashed_password = AuthManager.get_password_hash(password_data.new_password)
+    new_hashed_password = await AuthManager.get_password_hash_async(password_data.new_password)
     current_user.hashed_password = new_hashed_password
     
     # Update timestamp
@@ -318,6 +325,7 @@ async def change_password(
     current_user.updated_at = func.now()
     
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return SuccessResponse(message="Password changed successfully")
 
@@ -340,6 +348,7 @@ async def delete_user_account(
     current_user.username = f"deleted_{current_user.id}"
     
     db.commit()
+    invalidate_user_cache(current_user.id)
     
     return SuccessResponse(message="Account deleted successfully")
 
@@ -412,6 +421,7 @@ async def upload_profile_picture(
         
         db.commit()
         db.refresh(current_user)
+        invalidate_user_cache(current_user.id)
         
         return {
             "success": True,
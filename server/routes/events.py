@@ -5,23 +5,27 @@ Handles event creation, management, RSVPs, and premium features
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile, Form
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 import json
 
 from database import get_db
 from auth import get_current_user
-from models import User, Event, Friendship
+from models import User, Event, EventRsvp, Friendship
 from models.embeddings import EventEmbedding
+from models.hangout import uses_postgis
 from schemas import (
     EventCreate, EventUpdate, EventRSVP, EventResponse, EventListResponse,
     EventStatsResponse, PremiumEventPayment, SuccessResponse, ErrorResponse
 )
 from utils.media_storage import media_storage
+from utils.responses import json_response
 from utils.logging_config import log_database_operation
-from ai.embedding_service import embedding_service
-from ai.chroma_client import chroma_client
-import geohash
+from ai.embedding_service import get_embedding_service
+from ai.chroma_client import get_chroma_client
+from ai.rag_engine import invalidate_recommendations
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,10 +35,7 @@ router = APIRouter(prefix="/events", tags=["events"])
 # Helper functions
 def check_friendship(db: Session, user1_id: int, user2_id: int) -> bool:
     """Check if two users are friends"""
-    friendship = db.query(Friendship).filter(
-        ((Friendship.user1_id == user1_id) & (Friendship.user2_id == user2_id)) |
-        ((Friendship.user1_id == user2_id) & (Friendship.user2_id == user1_id))
-    ).first()
+    friendship = db.query(Friendship).filter(Friendship.between(user1_id, user2_id)).first()
     return friendship is not None
 
 def get_user_friends_ids(db: Session, user_id: int) -> List[int]:
@@ -147,10 +148,11 @@ async def create_event(
         db.add(event)
         db.commit()
         db.refresh(event)
+        invalidate_recommendations(events=True)  # New event is a candidate for everyone
         
         # Create event embedding immediately for testing
         try:
-            event_embedding = await embedding_service.generate_event_embedding(event)
+            event_embedding = await get_embedding_service().generate_event_embedding(event)
             if event_embedding:
                 # Store in database
                 embedding_record = EventEmbedding(
@@ -161,7 +163,7 @@ async def create_event(
                 db.commit()
                 
                 # Store in ChromaDB
-                chroma_client.add_event_embedding(
+                get_chroma_client().add_event_embedding(
                     event.id,
                     event_embedding,
                     metadata={
@@ -238,20 +240,21 @@ async def get_events(
         
         # Location-based filtering for public events
         if latitude and longitude and filter_type in ["all", "public"]:
-            try:
-                # Generate geohash for location-based queries
-                user_geohash = geohash.encode(latitude, longitude, precision=5)  # ~5km precision
-                
-                # Filter by geohash prefix for performance
-                query = query.filter(Event.geohash.like(f"{user_geohash[:5]}%"))
-            except Exception:
-                # If geohash fails, fall back to simple distance filtering
-                # This ensures events endpoint still works even if geohash has issues
-                radius_deg = radius_km / 111.0  # Rough conversion: 1 degree ≈ 111 km
-                query = query.filter(
-                    Event.latitude.between(latitude - radius_deg, latitude + radius_deg),
-                    Event.longitude.between(longitude - radius_deg, longitude + radius_deg)
-                )
+            if uses_postgis(db.get_bind().dialect):
+                # Radius search inside the GiST index
+                query = query.filter(Event.near(latitude, longitude, radius_km))
+            else:
+                # Lat/lng box enclosing the search circle, sized from radius_km
+                query = query.filter(*Event.bounding_box(latitude, longitude, radius_km))
+            
+                # Exact radius check over the prefiltered candidates, in one vectorized pass
+                candidates = query.with_entities(Event.id, Event.latitude, Event.longitude).all()
+                if candidates:
+                    ids = np.fromiter((row.id for row in candidates), dtype=np.int64, count=len(candidates))
+                    lats = np.fromiter((row.latitude for row in candidates), dtype=np.float64, count=len(candidates))
+                    lngs = np.fromiter((row.longitude for row in candidates), dtype=np.float64, count=len(candidates))
+                    in_range = Event.validate_location_proximity_batch(latitude, longitude, lats, lngs, radius_km)
+                    query = query.filter(Event.id.in_(ids[in_range].tolist()))
         
         # Apply sorting
         if sort_by == "start_time":
@@ -268,22 +271,28 @@ async def get_events(
         total_count = query.count()
         
         # Apply pagination
-        events = query.offset(offset).limit(limit).all()
+        events = query.options(*Event.listing_options(current_user.id)).offset(offset).limit(limit).all()
         
         # Convert to response format with friend status
         friend_ids = get_user_friends_ids(db, current_user.id)
         event_responses = []
+        viewed_premium = False
+        now = datetime.now(timezone.utc)
         
         for event in events:
             # Increment view count for premium events
             if event.is_premium and event.creator_id != current_user.id:
                 event.increment_view_count()
-                db.commit()
+                viewed_premium = True
             
             is_friend = event.creator_id in friend_ids or event.creator_id == current_user.id
-            event_dict = event.to_dict(user_id=current_user.id, is_friend=is_friend)
+            event_dict = event.to_dict(user_id=current_user.id, is_friend=is_friend, now=now)
             event_responses.append(EventResponse(**event_dict))
         
+        # One commit for all view counts, after serializing (committing expires every event in the page)
+        if viewed_premium:
+            db.commit()
+        
         return EventListResponse(
             events=event_responses,
             total_count=total_count,
@@ -353,11 +362,7 @@ async def update_event(
         )
     
     # Cannot edit past events
-    now = datetime.now(timezone.utc)
-    start_time = event.start_time
-    if start_time.tzinfo is None:
-        start_time = start_time.replace(tzinfo=timezone.utc)
-    if start_time < now:
+    if event.start_time < datetime.now(timezone.utc):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot edit past events"
@@ -371,12 +376,13 @@ async def update_event(
     if event_update.story is not None:
         event.story = event_update.story
     if event_update.end_time is not None:
-        if event_update.end_time <= event.start_time:
+        try:
+            event.end_time = event_update.end_time  # Event validates it against start_time
+        except ValueError as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="End time must be after start time"
+                detail=str(e)
             )
-        event.end_time = event_update.end_time
     if event_update.rsvp_deadline is not None:
         event.rsvp_deadline = event_update.rsvp_deadline
     if event_update.max_attendees is not None:
@@ -387,6 +393,7 @@ async def update_event(
     event.updated_at = datetime.now(timezone.utc)
     db.commit()
     db.refresh(event)
+    invalidate_recommendations(events=True)
     
     log_database_operation("update", "events", event.id, user_id=current_user.id)
     
@@ -421,6 +428,7 @@ async def delete_event(
     event.is_active = False
     event.updated_at = datetime.now(timezone.utc)
     db.commit()
+    invalidate_recommendations(events=True)
     
     log_database_operation("delete", "events", event.id, user_id=current_user.id)
     
@@ -456,6 +464,7 @@ async def rsvp_to_event(
     
     # Add RSVP
     event.add_rsvp(
+        db,
         user_id=current_user.id,
         status=rsvp_data.status,
         comment=rsvp_data.comment,
@@ -463,6 +472,7 @@ async def rsvp_to_event(
     )
     
     db.commit()
+    invalidate_recommendations(current_user.id, events=True)
     
     log_database_operation("rsvp", "events", event.id, user_id=current_user.id)
     
@@ -492,25 +502,25 @@ async def get_event_rsvps(
     
     # Only creator can see detailed RSVP list
     if event.creator_id == current_user.id:
-        # Return full RSVP details
-        rsvps = event.rsvps or []
+        # Return full RSVP details, with user info joined in the same query
+        rsvps = db.query(EventRsvp, User).join(User, User.id == EventRsvp.user_id).filter(
+            EventRsvp.event_id == event.id
+        ).order_by(EventRsvp.timestamp).all()
         
-        # Enhance with user info
-        detailed_rsvps = []
-        for rsvp in rsvps:
-            user = db.query(User).filter(User.id == rsvp.get('user_id')).first()
-            if user:
-                detailed_rsvps.append({
-                    "user_id": user.id,
-                    "username": user.username,
-                    "profile_photo_url": user.profile_photo_url,
-                    "status": rsvp.get('status'),
-                    "comment": rsvp.get('comment'),
-                    "is_friend": rsvp.get('is_friend', False),
-                    "timestamp": rsvp.get('timestamp')
-                })
+        detailed_rsvps = [
+            {
+                "user_id": user.id,
+                "username": user.username,
+                "profile_photo_url": user.profile_photo_url,
+                "status": rsvp.status,
+                "comment": rsvp.comment,
+                "is_friend": rsvp.is_friend,
+                "timestamp": rsvp.timestamp
+            }
+            for rsvp, user in rsvps
+        ]
         
-        return {
+        return json_response({
             "rsvps": detailed_rsvps,
             "counts": {
                 "attendee_count": event.attendee_count,
@@ -518,7 +528,7 @@ async def get_event_rsvps(
                 "declined_count": event.declined_count,
                 "friend_attendee_count": event.friend_attendee_count
             }
-        }
+        })
     else:
         # Return only counts for non-creators
         friend_ids = get_user_friends_ids(db, current_user.id)
@@ -610,19 +620,17 @@ async def get_event_stats(
             detail="Statistics are only available for premium events"
         )
     
-    # Generate RSVP breakdown
-    rsvps = event.rsvps or []
+    # Generate RSVP breakdown from one grouped count
     rsvp_breakdown = {
-        "by_status": {
-            "yes": len([r for r in rsvps if r.get('status') == 'yes']),
-            "maybe": len([r for r in rsvps if r.get('status') == 'maybe']),
-            "no": len([r for r in rsvps if r.get('status') == 'no'])
-        },
-        "by_friend_status": {
-            "friends": len([r for r in rsvps if r.get('is_friend', False)]),
-            "non_friends": len([r for r in rsvps if not r.get('is_friend', False)])
-        }
+        "by_status": {"yes": 0, "maybe": 0, "no": 0},
+        "by_friend_status": {"friends": 0, "non_friends": 0}
     }
+    counts = db.query(EventRsvp.status, EventRsvp.is_friend, func.count()).filter(
+        EventRsvp.event_id == event.id
+    ).group_by(EventRsvp.status, EventRsvp.is_friend).all()
+    for rsvp_status, is_friend, count in counts:
+        rsvp_breakdown["by_status"][rsvp_status] += count
+        rsvp_breakdown["by_friend_status"]["friends" if is_friend else "non_friends"] += count
     
     return EventStatsResponse(
         event_id=event.id,
@@ -643,22 +651,23 @@ async def get_my_active_events(
     """
     Get user's active events (created events)
     """
+    now = datetime.now(timezone.utc)
     events = db.query(Event).filter(
         Event.creator_id == current_user.id,
         Event.is_active == True,
-        Event.end_time > datetime.now(timezone.utc)
-    ).order_by(Event.start_time).all()
+        Event.end_time > now
+    ).options(*Event.listing_options(current_user.id)).order_by(Event.start_time).all()
     
     event_responses = []
     for event in events:
-        event_dict = event.to_dict(user_id=current_user.id, is_friend=True)
+        event_dict = event.to_dict(user_id=current_user.id, is_friend=True, now=now)
         event_responses.append(EventResponse(**event_dict))
     
-    return {
+    return json_response({
         "events": event_responses,
         "active_count": len(event_responses),
         "can_create_more": len(event_responses) < 3
-    }
+    })
 
 @router.get("/attending/upcoming")
 async def get_attending_events(
@@ -669,21 +678,21 @@ async def get_attending_events(
     Get events user is attending (RSVP'd yes)
     """
     now = datetime.now(timezone.utc)
-    events = db.query(Event).filter(
+    events = db.query(Event).join(EventRsvp, EventRsvp.event_id == Event.id).filter(
+        EventRsvp.user_id == current_user.id,
+        EventRsvp.status == "yes",
         Event.is_active == True,
         Event.start_time > now
-    ).all()
+    ).options(*Event.listing_options(current_user.id)).all()
     
+    friend_ids = set(get_user_friends_ids(db, current_user.id))
     attending_events = []
     for event in events:
-        user_rsvp = event.get_user_rsvp(current_user.id)
-        if user_rsvp and user_rsvp.get('status') == 'yes':
-            friend_ids = get_user_friends_ids(db, current_user.id)
-            is_friend = event.creator_id in friend_ids or event.creator_id == current_user.id
-            event_dict = event.to_dict(user_id=current_user.id, is_friend=is_friend)
-            attending_events.append(EventResponse(**event_dict))
+        is_friend = event.creator_id in friend_ids or event.creator_id == current_user.id
+        event_dict = event.to_dict(user_id=current_user.id, is_friend=is_friend, now=now)
+        attending_events.append(EventResponse(**event_dict))
     
-    return {
+    return json_response({
         "events": attending_events,
         "count": len(attending_events)
-    } 
\ No newline at end of file
+    }) 
\ No newline at end of file
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import or_, and_, func
 from typing import List, Optional
 from database import get_db
 from models import User, FriendRequest, Friendship
 from auth import get_current_user
+from ai.rag_engine import invalidate_recommendations
 from utils.api_models import BaseResponse, UserPublicResponse
+from utils.responses import json_response
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/friends", tags=["friends"])
@@ -65,12 +67,7 @@ async def search_users(
         user_list = []
         for user in users:
             # Check if already friends or has pending request
-            existing_friendship = db.query(Friendship).filter(
-                or_(
-                    and_(Friendship.user1_id == current_user.id, Friendship.user2_id == user.id),
-                    and_(Friendship.user1_id == user.id, Friendship.user2_id == current_user.id)
-                )
-            ).first()
+            existing_friendship = db.query(Friendship).filter(Friendship.between(current_user.id, user.id)).first()
             
             pending_request = db.query(FriendRequest).filter(
                 and_(
@@ -138,12 +135,7 @@ async def send_friend_request(
             raise HTTPException(status_code=400, detail="Cannot send friend request to yourself")
         
         # Check if already friends
-        existing_friendship = db.query(Friendship).filter(
-            or_(
-                and_(Friendship.user1_id == current_user.id, Friendship.user2_id == recipient.id),
-                and_(Friendship.user1_id == recipient.id, Friendship.user2_id == current_user.id)
-            )
-        ).first()
+        existing_friendship = db.query(Friendship).filter(Friendship.between(current_user.id, recipient.id)).first()
         
         if existing_friendship:
             raise HTTPException(status_code=400, detail="Already friends with this user")
@@ -173,6 +165,7 @@ async def send_friend_request(
         db.add(friend_request)
         db.commit()
         db.refresh(friend_request)
+        invalidate_recommendations(current_user.id, recipient.id, friends=True)
         
         return {
             "success": True,
@@ -202,7 +195,9 @@ async def get_friend_requests(
     try:
         # Use join to eagerly load the sender information
         requests = db.query(FriendRequest).join(
-            User, FriendRequest.sender_id == User.id
+            FriendRequest.sender
+        ).options(
+            contains_eager(FriendRequest.sender)
         ).filter(
             and_(
                 FriendRequest.recipient_id == current_user.id,
@@ -219,24 +214,24 @@ async def get_friend_requests(
         
         request_list = []
         for req in requests:
-            sender = db.query(User).filter(User.id == req.sender_id).first()
+            sender = req.sender
             if sender:
                 request_list.append({
                     "id": req.id,
                     "sender_id": req.sender_id,
                     "sender": sender.to_public_dict(),
                     "message": req.message,
-                    "created_at": req.created_at.isoformat()
+                    "created_at": req.created_at
                 })
                 print(f"    ✅ Added request from: {sender.username}")
         
         print(f"  📤 RESPONSE: {len(request_list)} requests in final result")
         
-        return {
+        return json_response({
             "success": True,
             "data": request_list,
             "message": f"Found {len(request_list)} pending requests"
-        }
+        })
         
     except Exception as e:
         print(f"❌ FRIEND REQUESTS ERROR: {str(e)}")
@@ -268,16 +263,14 @@ async def respond_to_friend_request(
         
         if action == "accept":
             # Create friendship
-            friendship = Friendship(
-                user1_id=min(current_user.id, friend_request.sender_id),
-                user2_id=max(current_user.id, friend_request.sender_id)
-            )
+            friendship = Friendship.for_pair(current_user.id, friend_request.sender_id)
             db.add(friendship)
             
             # Update request status
             friend_request.status = "accepted"
             
             db.commit()
+            invalidate_recommendations(current_user.id, friend_request.sender_id, friends=True)
             
             return {
                 "success": True,
@@ -330,14 +323,14 @@ async def get_friends_list(
                 friends_list.append({
                     "friendship_id": friendship.id,
                     "friend": friend.to_public_dict(),
-                    "created_at": friendship.created_at.isoformat()
+                    "created_at": friendship.created_at
                 })
         
-        return {
+        return json_response({
             "success": True,
             "data": friends_list,
             "message": f"Found {len(friends_list)} friends"
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get friends list: {str(e)}")
@@ -353,18 +346,14 @@ async def remove_friend(
     Remove a friend (delete the friendship)
     """
     try:
-        friendship = db.query(Friendship).filter(
-            or_(
-                and_(Friendship.user1_id == current_user.id, Friendship.user2_id == friend_id),
-                and_(Friendship.user1_id == friend_id, Friendship.user2_id == current_user.id)
-            )
-        ).first()
+        friendship = db.query(Friendship).filter(Friendship.between(current_user.id, friend_id)).first()
         
         if not friendship:
             raise HTTPException(status_code=404, detail="Friendship not found")
         
         db.delete(friendship)
         db.commit()
+        invalidate_recommendations(current_user.id, friend_id, friends=True)
         
         return {
             "success": True,
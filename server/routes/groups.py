@@ -1,11 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager, selectinload
 from sqlalchemy import desc
 from typing import List, Optional
 import logging
 
 from database import get_db
-from models import User, GroupChat, GroupMessage
+from models import User, GroupChat, GroupMember, GroupMessage
 from schemas import (
     GroupMessageCreate, GroupMessageResponse, MessageReadUpdate, 
     MediaViewUpdate, SuccessResponse, GroupChatCreate, GroupChatUpdate,
@@ -15,6 +15,7 @@ from schemas import (
 from auth import get_current_user
 from utils.error_handlers import raise_not_found, raise_forbidden, raise_bad_request
 from utils.media_storage import save_uploaded_file, media_storage
+from utils.responses import json_response
 from utils.logging_config import log_api_request, log_database_operation
 
 logger = logging.getLogger(__name__)
@@ -46,11 +47,9 @@ async def create_group(
         name=group_data.name,
         description=group_data.description,
         visibility=group_data.visibility,
-        max_members=group_data.max_members,
-        members=[current_user.id],  # Creator is always a member
-        admins=[current_user.id],   # Creator is always an admin
-        member_count=1
+        max_members=group_data.max_members
     )
+    group.add_member(current_user.id, is_admin=True)  # Creator is always a member and an admin
     
     # Add initial members
     if group_data.initial_member_ids:
@@ -64,17 +63,12 @@ async def create_group(
     
     # Create system messages for member additions
     if group_data.initial_member_ids:
-        for member_id in group_data.initial_member_ids:
-            if member_id != current_user.id:
-                system_message = GroupMessage(
-                    group_id=group.id,
-                    sender_id=member_id,
-                    message_type="system",
-                    system_action="added"
-                )
-                db.add(system_message)
-    
-    db.commit()
+        GroupMessage.bulk_create(db, [
+            {"group_id": group.id, "sender_id": member_id, "message_type": "system", "system_action": "added"}
+            for member_id in group_data.initial_member_ids
+            if member_id != current_user.id
+        ])
+        db.commit()
     
     log_database_operation("create", "group_chats", group.id, current_user.id)
     log_api_request("POST", "/groups", current_user.id)
@@ -89,17 +83,13 @@ async def get_user_groups(
     """Get all groups the current user is a member of"""
     
     # Get all groups where user is a member
-    # For JSON arrays, we need to check if the user_id is IN the members array
-    groups = db.query(GroupChat).filter(
+    user_groups = db.query(GroupChat).join(
+        GroupMember, GroupMember.group_id == GroupChat.id
+    ).filter(
+        GroupMember.user_id == current_user.id,
         GroupChat.is_active == True
     ).all()
     
-    # Filter groups where user is a member (in-memory filtering since JSON queries are DB-specific)
-    user_groups = []
-    for group in groups:
-        if group.is_member(current_user.id):
-            user_groups.append(group)
-    
     # Sort by last message time
     user_groups.sort(key=lambda g: g.last_message_at or g.created_at, reverse=True)
     
@@ -132,7 +122,7 @@ async def get_group_members(
         raise_forbidden("You are not a member of this group")
     
     # Get member details
-    member_users = db.query(User).filter(User.id.in_(group.members or [])).all()
+    member_users = db.query(User).filter(User.id.in_(group.member_ids)).all()
     
     # Format response
     members_response = []
@@ -141,7 +131,7 @@ async def get_group_members(
             user_id=user.id,
             user=UserResponse.from_orm(user),
             is_admin=group.is_admin(user.id),
-            joined_at=group.created_at  # TODO: Track individual join dates
+            joined_at=group.memberships[user.id].joined_at or group.created_at
         ))
     
     log_api_request("GET", f"/groups/{group_id}/members", current_user.id)
@@ -177,26 +167,23 @@ async def add_group_members(
         raise_bad_request("One or more specified users not found")
     
     # Add members
-    added_count = 0
+    added_ids = []
     for user_id in member_data.user_ids:
         if not group.is_member(user_id):
             group.add_member(user_id, member_data.make_admin)
-            added_count += 1
-            
-            # Create system message
-            system_message = GroupMessage(
-                group_id=group_id,
-                sender_id=user_id,
-                message_type="system",
-                system_action="added"
-            )
-            db.add(system_message)
+            added_ids.append(user_id)
+    
+    # Create system messages
+    GroupMessage.bulk_create(db, [
+        {"group_id": group_id, "sender_id": user_id, "message_type": "system", "system_action": "added"}
+        for user_id in added_ids
+    ])
     
     db.commit()
     
     log_database_operation("add_members", "group_chats", group_id, current_user.id)
     
-    return SuccessResponse(message=f"Added {added_count} members to the group")
+    return SuccessResponse(message=f"Added {len(added_ids)} members to the group")
 
 @router.delete("/{group_id}/members/{user_id}", response_model=SuccessResponse)
 async def remove_group_member(
@@ -278,13 +265,11 @@ async def update_group_member(
     # Update admin status
     if member_update.is_admin and not group.is_admin(user_id):
         # Promote to admin
-        if not group.admins:
-            group.admins = []
-        group.admins.append(user_id)
+        group.set_admin(user_id, True)
         action = "promoted"
     elif not member_update.is_admin and group.is_admin(user_id):
         # Demote from admin
-        group.admins.remove(user_id)
+        group.set_admin(user_id, False)
         action = "demoted"
     else:
         # No change needed
@@ -466,10 +451,10 @@ async def get_group_messages(
     if not group.is_member(current_user.id):
         raise_forbidden("You are not a member of this group")
     
-    # Build query
+    # Build query - expired messages are dropped by the database rather than after fetching
     query = db.query(GroupMessage).filter(
         GroupMessage.group_id == group_id,
-        GroupMessage.is_deleted == False
+        GroupMessage.live()
     )
     
     # Add before_id filter for pagination
@@ -477,7 +462,10 @@ async def get_group_messages(
         query = query.filter(GroupMessage.id < before_id)
     
     # Get messages with sender information
-    messages = query.join(GroupMessage.sender).order_by(desc(GroupMessage.created_at)).limit(limit).all()
+    messages = query.join(GroupMessage.sender).options(
+        contains_eager(GroupMessage.sender),  # Fill sender from the join instead of one SELECT per sender
+        selectinload(GroupMessage.receipts)
+    ).order_by(desc(GroupMessage.created_at)).limit(limit).all()
     
     # Format response
     response_data = []
@@ -486,7 +474,7 @@ async def get_group_messages(
             response_data.append(_format_group_message_response(message, current_user.id))
     
     log_api_request("GET", f"/groups/{group_id}/messages", current_user.id)
-    return response_data
+    return json_response(response_data, model=List[GroupMessageResponse])
 
 @router.post("/{group_id}/messages/read", response_model=SuccessResponse)
 async def mark_group_messages_as_read(
@@ -505,18 +493,8 @@ async def mark_group_messages_as_read(
     if not group.is_member(current_user.id):
         raise_forbidden("You are not a member of this group")
     
-    # Get messages
-    messages = db.query(GroupMessage).filter(
-        GroupMessage.id.in_(read_data.message_ids),
-        GroupMessage.group_id == group_id
-    ).all()
-    
-    read_count = 0
-    for message in messages:
-        if not message.is_read_by_user(current_user.id):
-            message.mark_as_read(current_user.id)
-            read_count += 1
-    
+    # One INSERT ... SELECT for the group's messages, skipping ones already read
+    read_count = GroupMessage.mark_read_by(db, current_user.id, group_id, read_data.message_ids)
     db.commit()
     
     return SuccessResponse(message=f"Marked {read_count} messages as read")
@@ -552,7 +530,7 @@ async def mark_group_media_as_viewed(
     if not message.can_view(current_user.id):
         raise_forbidden("Cannot view this message")
     
-    message.mark_as_viewed(current_user.id, view_data.screenshot_taken)
+    message.mark_as_viewed(db, current_user.id, view_data.screenshot_taken)
     db.commit()
     
     # Log screenshot if taken
@@ -626,7 +604,7 @@ async def get_group_info(
     group_data["user_is_admin"] = group.is_admin(current_user.id)
     
     log_api_request("GET", f"/groups/{group_id}/info", current_user.id)
-    return group_data
+    return json_response(group_data)
 
 @router.post("/{group_id}/join", response_model=SuccessResponse)
 async def join_group(
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import or_, desc
 from typing import List, Optional
 import logging
 
 from database import get_db
 from models import User, DirectMessage, Conversation
+from models.direct_message import conversation_messages_filter
 from schemas import (
     DirectMessageCreate, DirectMessageResponse, ConversationResponse,
     MessageReadUpdate, MediaViewUpdate, SuccessResponse
@@ -13,6 +14,7 @@ from schemas import (
 from auth import get_current_user
 from utils.error_handlers import raise_not_found, raise_forbidden, raise_bad_request
 from utils.media_storage import save_uploaded_file, media_storage
+from utils.responses import json_response
 from utils.logging_config import log_api_request, log_database_operation
 
 logger = logging.getLogger(__name__)
@@ -44,16 +46,17 @@ async def send_direct_message(
     )
     
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    db.flush()
     
-    # Update or create conversation
-    await _update_conversation(db, current_user.id, message_data.recipient_id, message.id)
+    # Update or create conversation, committed together with the message
+    Conversation.record_message(db, current_user.id, message_data.recipient_id, message.id)
+    response_data = _format_message_response(message, current_user.id)
+    db.commit()
     
-    log_database_operation("create", "direct_messages", message.id, current_user.id)
-    log_api_request("POST", "/messages/send", current_user.id)
+    log_database_operation("create", "direct_messages", response_data["id"], response_data["sender_id"])
+    log_api_request("POST", "/messages/send", response_data["sender_id"])
     
-    return _format_message_response(message, current_user.id)
+    return json_response(response_data, status_code=status.HTTP_201_CREATED)
 
 @router.post("/send-media", status_code=status.HTTP_201_CREATED)
 async def send_media_message(
@@ -90,15 +93,16 @@ async def send_media_message(
     )
     
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    db.flush()
     
-    # Update conversation
-    await _update_conversation(db, current_user.id, recipient_id, message.id)
+    # Update conversation, committed together with the message
+    Conversation.record_message(db, current_user.id, recipient_id, message.id)
+    response_data = _format_message_response(message, current_user.id)
+    db.commit()
     
-    log_database_operation("create", "direct_messages", message.id, current_user.id)
+    log_database_operation("create", "direct_messages", response_data["id"], response_data["sender_id"])
     
-    return _format_message_response(message, current_user.id)
+    return json_response(response_data, status_code=status.HTTP_201_CREATED)
 
 @router.get("/conversations")
 async def get_conversations(
@@ -110,8 +114,13 @@ async def get_conversations(
 ):
     """Get user's conversations"""
     
-    # Get conversations where user is participant
-    conversations = db.query(Conversation).filter(
+    # Get conversations where user is participant, with both users and the last message
+    # loaded up front rather than queried once per conversation
+    conversations = db.query(Conversation).options(
+        selectinload(Conversation.user1),
+        selectinload(Conversation.user2),
+        joinedload(Conversation.last_message)
+    ).filter(
         or_(
             Conversation.user1_id == current_user.id,
             Conversation.user2_id == current_user.id
@@ -127,14 +136,13 @@ async def get_conversations(
         
         # Get other user info
         other_user_id = conv.get_other_user_id(current_user.id)
-        other_user = db.query(User).filter(User.id == other_user_id).first()
+        other_user = conv.get_other_user(current_user.id)
         
         # Get last message
         last_message = None
-        if conv.last_message_id:
-            last_msg = db.query(DirectMessage).filter(DirectMessage.id == conv.last_message_id).first()
-            if last_msg and last_msg.can_view(current_user.id):
-                last_message = _format_message_response(last_msg, current_user.id)
+        last_msg = conv.last_message
+        if last_msg and last_msg.can_view(current_user.id):
+            last_message = _format_message_response(last_msg, current_user.id)
         
         response_data.append({
             "id": conv.id,
@@ -144,11 +152,11 @@ async def get_conversations(
             "unread_count": conv.get_unread_count(current_user.id),
             "is_archived": is_archived,
             "is_muted": conv.is_muted_by(current_user.id),
-            "updated_at": conv.updated_at.isoformat() if conv.updated_at else None
+            "updated_at": conv.updated_at
         })
     
     log_api_request("GET", "/messages/conversations", current_user.id)
-    return response_data
+    return json_response(response_data)
 
 @router.get("/{user_id}")
 async def get_conversation_messages(
@@ -165,13 +173,8 @@ async def get_conversation_messages(
     if not other_user:
         raise_not_found("User", user_id)
     
-    # Build query for messages between users
-    query = db.query(DirectMessage).filter(
-        or_(
-            and_(DirectMessage.sender_id == current_user.id, DirectMessage.recipient_id == user_id),
-            and_(DirectMessage.sender_id == user_id, DirectMessage.recipient_id == current_user.id)
-        )
-    )
+    # Build query for messages between users (served by idx_dm_pair_time)
+    query = db.query(DirectMessage).filter(conversation_messages_filter(current_user.id, user_id))
     
     # Add before_id filter for pagination
     if before_id:
@@ -187,7 +190,7 @@ async def get_conversation_messages(
             response_data.append(_format_message_response(message, current_user.id))
     
     log_api_request("GET", f"/messages/{user_id}", current_user.id)
-    return response_data
+    return json_response(response_data)
 
 @router.post("/read", response_model=SuccessResponse)
 async def mark_messages_as_read(
@@ -197,34 +200,15 @@ async def mark_messages_as_read(
 ):
     """Mark messages as read"""
     
-    messages = db.query(DirectMessage).filter(
-        DirectMessage.id.in_(read_data.message_ids),
-        DirectMessage.recipient_id == current_user.id
-    ).all()
-    
-    read_count = 0
-    for message in messages:
-        if not message.is_read:
-            message.mark_as_read(current_user.id)
-            read_count += 1
-    
-    db.commit()
+    # One UPDATE for the whole batch, skipping messages already read
+    sender_ids = DirectMessage.mark_read_by(db, current_user.id, read_data.message_ids)
     
     # Update conversation unread counts
-    for message in messages:
-        conversation = db.query(Conversation).filter(
-            or_(
-                and_(Conversation.user1_id == current_user.id, Conversation.user2_id == message.sender_id),
-                and_(Conversation.user1_id == message.sender_id, Conversation.user2_id == current_user.id)
-            )
-        ).first()
-        
-        if conversation:
-            conversation.reset_unread(current_user.id)
+    Conversation.reset_unread_with(db, current_user.id, set(sender_ids))
     
     db.commit()
     
-    return SuccessResponse(message=f"Marked {read_count} messages as read")
+    return SuccessResponse(message=f"Marked {len(sender_ids)} messages as read")
 
 @router.post("/view", response_model=SuccessResponse)
 async def mark_media_as_viewed(
@@ -281,34 +265,6 @@ async def delete_message(
     return SuccessResponse(message="Message deleted successfully")
 
 # Helper functions
-async def _update_conversation(db: Session, user1_id: int, user2_id: int, message_id: int):
-    """Update or create conversation between two users"""
-    
-    # Ensure user1_id is smaller for consistent ordering
-    if user1_id > user2_id:
-        user1_id, user2_id = user2_id, user1_id
-    
-    conversation = db.query(Conversation).filter(
-        Conversation.user1_id == user1_id,
-        Conversation.user2_id == user2_id
-    ).first()
-    
-    if not conversation:
-        conversation = Conversation(
-            user1_id=user1_id,
-            user2_id=user2_id
-        )
-        db.add(conversation)
-    
-    conversation.update_last_message(message_id)
-    
-    # Increment unread count for recipient
-    message = db.query(DirectMessage).filter(DirectMessage.id == message_id).first()
-    if message:
-        conversation.increment_unread(message.recipient_id)
-    
-    db.commit()
-
 def _format_message_response(message: DirectMessage, user_id: int) -> dict:
     """Format message for API response"""
     data = {
@@ -5,15 +5,17 @@ Handles in-app notifications for chat messages and activity tracking
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import or_, func
 from typing import List, Dict, Any
 from datetime import datetime, timezone
 from pydantic import BaseModel
 
 from database import get_db
-from models import User, DirectMessage, GroupMessage, GroupChat, Conversation
+from models import User, DirectMessage, GroupMessage, GroupChat, GroupMember, Conversation
+from models.direct_message import conversation_messages_filter
 from models.embeddings import ChatActivity
 from auth import get_current_user
+from utils.responses import json_response
 from schemas import SuccessResponse
 
 class MarkChatOpenedRequest(BaseModel):
@@ -60,7 +62,7 @@ async def get_chat_summary(
                 DirectMessage.sender_id == other_user_id,
                 DirectMessage.recipient_id == current_user.id,
                 DirectMessage.created_at > last_opened,
-                DirectMessage.is_deleted == False
+                DirectMessage.live()
             ).count()
             
             if unread_count > 0:  # Only include chats with unread messages
@@ -68,10 +70,7 @@ async def get_chat_summary(
                 
                 # Get most recent message for preview
                 last_message = db.query(DirectMessage).filter(
-                    or_(
-                        and_(DirectMessage.sender_id == current_user.id, DirectMessage.recipient_id == other_user_id),
-                        and_(DirectMessage.sender_id == other_user_id, DirectMessage.recipient_id == current_user.id)
-                    )
+                    conversation_messages_filter(current_user.id, other_user_id)
                 ).order_by(DirectMessage.created_at.desc()).first()
                 
                 chat_summary.append({
@@ -80,17 +79,17 @@ async def get_chat_summary(
                     "other_user": other_user.to_dict() if other_user else None,
                     "unread_count": unread_count,
                     "last_message_preview": last_message.content[:50] + "..." if last_message and last_message.content and len(last_message.content) > 50 else (last_message.content if last_message else None),
-                    "last_message_at": conv.last_message_at.isoformat() if conv.last_message_at else None
+                    "last_message_at": conv.last_message_at
                 })
         
         # Get group chats where user is a member
-        groups = db.query(GroupChat).filter(
+        user_groups = db.query(GroupChat).join(
+            GroupMember, GroupMember.group_id == GroupChat.id
+        ).filter(
+            GroupMember.user_id == current_user.id,
             GroupChat.is_active == True
         ).all()
         
-        # Filter to groups where user is actually a member
-        user_groups = [group for group in groups if group.is_member(current_user.id)]
-        
         for group in user_groups:
             # Get chat activity to determine last opened time
             activity = db.query(ChatActivity).filter(
@@ -107,14 +106,14 @@ async def get_chat_summary(
                 GroupMessage.group_id == group.id,
                 GroupMessage.created_at > last_opened,
                 GroupMessage.sender_id != current_user.id,  # Don't count own messages
-                GroupMessage.is_deleted == False
+                GroupMessage.live()
             ).count()
             
             if unread_count > 0:  # Only include chats with unread messages
                 # Get most recent message for preview
                 last_message = db.query(GroupMessage).filter(
                     GroupMessage.group_id == group.id,
-                    GroupMessage.is_deleted == False
+                    GroupMessage.live()
                 ).order_by(GroupMessage.created_at.desc()).first()
                 
                 chat_summary.append({
@@ -125,18 +124,18 @@ async def get_chat_summary(
                     "member_count": group.member_count,
                     "unread_count": unread_count,
                     "last_message_preview": last_message.content[:50] + "..." if last_message and last_message.content and len(last_message.content) > 50 else (last_message.content if last_message else None),
-                    "last_message_at": group.last_message_at.isoformat() if group.last_message_at else None
+                    "last_message_at": group.last_message_at
                 })
         
         # Sort by most recent activity
-        chat_summary.sort(key=lambda x: x.get('last_message_at') or '', reverse=True)
+        chat_summary.sort(key=lambda x: x.get('last_message_at') or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
         
-        return {
+        return json_response({
             "success": True,
             "data": chat_summary,
             "total_unread_chats": len(chat_summary),
             "message": f"Found {len(chat_summary)} chats with unread messages"
-        }
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -263,7 +262,7 @@ async def get_total_unread_count(
                 DirectMessage.sender_id == other_user_id,
                 DirectMessage.recipient_id == current_user.id,
                 DirectMessage.created_at > last_opened,
-                DirectMessage.is_deleted == False
+                DirectMessage.live()
             ).count()
             
             if unread_count > 0:
@@ -271,8 +270,12 @@ async def get_total_unread_count(
                 unread_chats += 1
         
         # Count unread group messages
-        groups = db.query(GroupChat).filter(GroupChat.is_active == True).all()
-        user_groups = [group for group in groups if group.is_member(current_user.id)]
+        user_groups = db.query(GroupChat).join(
+            GroupMember, GroupMember.group_id == GroupChat.id
+        ).filter(
+            GroupMember.user_id == current_user.id,
+            GroupChat.is_active == True
+        ).all()
         
         for group in user_groups:
             activity = db.query(ChatActivity).filter(
@@ -287,7 +290,7 @@ async def get_total_unread_count(
                 GroupMessage.group_id == group.id,
                 GroupMessage.created_at > last_opened,
                 GroupMessage.sender_id != current_user.id,
-                GroupMessage.is_deleted == False
+                GroupMessage.live()
             ).count()
             
             if unread_count > 0:
@@ -10,7 +10,8 @@ from typing import List, Dict, Any, Optional
 from database import get_db
 from models import User, GroupChat
 from auth import get_current_user
-from ai.rag_engine import rag_engine
+from ai.rag_engine import get_rag_engine
+from utils.responses import json_response
 from utils.logging_config import log_api_request
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
@@ -26,12 +27,12 @@ async def get_friend_recommendations(
         return {"success": False, "message": "User not open to friends", "data": []}
     
     try:
-        recommendations = await rag_engine.recommend_friends(current_user.id, limit)
-        return {
+        recommendations = await get_rag_engine().recommend_friends(current_user.id, db, limit)
+        return json_response({
             "success": True,
             "data": recommendations,
             "message": f"Found {len(recommendations)} recommendations"
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -46,14 +47,14 @@ async def get_event_recommendations(
     """Get AI-powered event recommendations (location optional for testing)"""
     try:
         # For testing: location is optional, will be used for distance calculation only
-        recommendations = await rag_engine.recommend_events_to_user(
-            current_user.id, latitude or 0.0, longitude or 0.0, limit
+        recommendations = await get_rag_engine().recommend_events_to_user(
+            current_user.id, latitude or 0.0, longitude or 0.0, db, limit
         )
-        return {
+        return json_response({
             "success": True,
             "data": recommendations,
             "message": f"Found {len(recommendations)} event recommendations"
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -73,14 +74,14 @@ async def get_group_event_recommendations(
     
     try:
         # For testing: location is optional, will be used for distance calculation only
-        recommendations = await rag_engine.recommend_events_to_group(
-            group_id, admin_latitude or 0.0, admin_longitude or 0.0, limit
+        recommendations = await get_rag_engine().recommend_events_to_group(
+            group_id, admin_latitude or 0.0, admin_longitude or 0.0, db, limit
         )
-        return {
+        return json_response({
             "success": True,
             "data": recommendations,
             "message": f"Found {len(recommendations)} events for group"
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
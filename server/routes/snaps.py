@@ -1,21 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, raiseload, selectinload
 from sqlalchemy import desc, or_, and_
 from typing import List, Optional
 import logging
 import json
 
 from database import get_db
-from models import User, Snap, GroupChat, DirectMessage, Conversation
+from models import User, Snap, GroupChat, GroupMember, DirectMessage, Conversation
 from schemas import SnapCreate, SuccessResponse, MediaViewUpdate
 from auth import get_current_user
 from utils.error_handlers import raise_not_found, raise_forbidden, raise_bad_request
 from utils.media_storage import save_uploaded_file, media_storage
+from utils.responses import json_response
 from utils.logging_config import log_api_request, log_database_operation
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/snaps", tags=["snaps"])
 
+# Snap lists load senders in one batch and refuse any other lazy load
+_SNAP_LIST_OPTIONS = (selectinload(Snap.sender), raiseload("*"))
+
 @router.post("/send", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def send_snap(
     recipient_ids: Optional[str] = Form(None),  # JSON string of user IDs
@@ -44,6 +48,10 @@ async def send_snap(
         except json.JSONDecodeError:
             raise_bad_request("Invalid group_ids format")
     
+    # Repeated ids would fail the existence checks below and send the snap twice
+    parsed_recipient_ids = list(dict.fromkeys(parsed_recipient_ids))
+    parsed_group_ids = list(dict.fromkeys(parsed_group_ids))
+    
     # Validate at least one recipient
     if not parsed_recipient_ids and not parsed_group_ids:
         raise_bad_request("At least one recipient must be specified")
@@ -87,24 +95,23 @@ async def send_snap(
     db.refresh(snap)
     
     # Also create DirectMessage records for individual recipients to appear in conversations
-    for recipient_id in parsed_recipient_ids:
-        # Create a DirectMessage record for this snap
-        direct_message = DirectMessage(
-            sender_id=current_user.id,
-            recipient_id=recipient_id,
-            content=caption,
-            media_url=media_url,
-            media_type=media_type,
-            message_type="media",
-            view_duration=view_duration
-        )
-        
-        db.add(direct_message)
-        db.commit()
-        db.refresh(direct_message)
-        
-        # Update conversation (avoid circular import by defining inline)
-        await _update_snap_conversation(db, current_user.id, recipient_id, direct_message.id)
+    message_ids_by_recipient = DirectMessage.bulk_create(db, [
+        {
+            "sender_id": current_user.id,
+            "recipient_id": recipient_id,
+            "content": caption,
+            "media_url": media_url,
+            "media_type": media_type,
+            "message_type": "media",
+            "view_duration": view_duration
+        }
+        for recipient_id in parsed_recipient_ids
+    ])
+    
+    # Update conversations
+    for recipient_id, message_id in message_ids_by_recipient.items():
+        Conversation.record_message(db, current_user.id, recipient_id, message_id)
+    db.commit()
     
     log_database_operation("create", "snaps", snap.id, current_user.id)
     log_api_request("POST", "/snaps/send", current_user.id)
@@ -131,13 +138,13 @@ async def get_received_snaps(
     direct_snaps = db.query(Snap).filter(
         Snap.recipient_ids.contains([current_user.id]),
         Snap.is_active == True
-    )
+    ).options(*_SNAP_LIST_OPTIONS)
     
     # Query for snaps sent to groups user is member of
-    # TODO: This is a simplified version - in production, you'd want to
-    # properly join with group membership
-    user_groups = db.query(GroupChat).filter(
-        GroupChat.members.contains([current_user.id]),
+    user_groups = db.query(GroupChat).join(
+        GroupMember, GroupMember.group_id == GroupChat.id
+    ).filter(
+        GroupMember.user_id == current_user.id,
         GroupChat.is_active == True
     ).all()
     
@@ -148,7 +155,7 @@ async def get_received_snaps(
             Snap.group_ids.op('?|')(group_ids),  # PostgreSQL jsonb operator
             Snap.is_active == True,
             Snap.sender_id != current_user.id  # Don't include own snaps
-        ).all()
+        ).options(*_SNAP_LIST_OPTIONS).all()
     
     # Combine and sort all snaps
     all_snaps = list(direct_snaps.all()) + group_snaps
@@ -182,7 +189,7 @@ async def get_sent_snaps(
     snaps = db.query(Snap).filter(
         Snap.sender_id == current_user.id,
         Snap.is_active == True
-    ).order_by(desc(Snap.created_at)).offset(offset).limit(limit).all()
+    ).options(*_SNAP_LIST_OPTIONS).order_by(desc(Snap.created_at)).offset(offset).limit(limit).all()
     
     response_data = []
     for snap in snaps:
@@ -217,7 +224,7 @@ async def get_snap(
     snap_data = _format_snap_response(snap, current_user.id, db)
     
     log_api_request("GET", f"/snaps/{snap_id}", current_user.id)
-    return snap_data
+    return json_response(snap_data)
 
 @router.post("/{snap_id}/view", response_model=SuccessResponse)
 async def view_snap(
@@ -331,8 +338,7 @@ async def get_snap_views(
 def _format_snap_response(snap: Snap, user_id: int, db: Session, include_recipients: bool = False) -> dict:
     """Format snap for API response"""
     
-    # Get sender info
-    sender = db.query(User).filter(User.id == snap.sender_id).first()
+    sender = snap.sender
     
     data = {
         "id": snap.id,
@@ -379,32 +385,4 @@ def _format_snap_response(snap: Snap, user_id: int, db: Session, include_recipie
     if view_info:
         data["user_view_info"] = view_info
     
-    return data 
-
-async def _update_snap_conversation(db: Session, user1_id: int, user2_id: int, message_id: int):
-    """Update or create conversation between two users for snap"""
-    
-    # Ensure user1_id is smaller for consistent ordering
-    if user1_id > user2_id:
-        user1_id, user2_id = user2_id, user1_id
-    
-    conversation = db.query(Conversation).filter(
-        Conversation.user1_id == user1_id,
-        Conversation.user2_id == user2_id
-    ).first()
-    
-    if not conversation:
-        conversation = Conversation(
-            user1_id=user1_id,
-            user2_id=user2_id
-        )
-        db.add(conversation)
-    
-    conversation.update_last_message(message_id)
-    
-    # Increment unread count for recipient
-    message = db.query(DirectMessage).filter(DirectMessage.id == message_id).first()
-    if message:
-        conversation.increment_unread(message.recipient_id)
-    
-    db.commit()
\ No newline at end of file
+    return data 
\ No newline at end of file
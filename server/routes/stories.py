@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import desc, and_, or_
 from typing import List, Optional
 import logging
@@ -117,15 +117,16 @@ async def get_story_feed(
         )
     
     # Get stories ordered by creation time (newest first)
-    stories = query.order_by(desc(Story.created_at)).offset(offset).limit(limit).all()
+    stories = query.options(
+        selectinload(Story.user)  # All owners in one IN (...) query rather than one per story
+    ).order_by(desc(Story.created_at)).offset(offset).limit(limit).all()
     
     print(f"📱 STORY FEED DEBUG - Found {len(stories)} stories in feed")
     
     # Format response
     response_data = []
     for story in stories:
-        # Get story owner info
-        owner = db.query(User).filter(User.id == story.user_id).first()
+        owner = story.user
         if owner:
             # Check if user has viewed this story
             has_viewed = bool(story.viewers and current_user.id in (story.viewers or []))
@@ -302,12 +303,7 @@ def _can_view_story(story: Story, user_id: int, db: Session = None) -> bool:
         # Check if users are friends
         if db:
             from models.friendship import Friendship
-            friendship = db.query(Friendship).filter(
-                or_(
-                    and_(Friendship.user1_id == user_id, Friendship.user2_id == story.user_id),
-                    and_(Friendship.user1_id == story.user_id, Friendship.user2_id == user_id)
-                )
-            ).first()
+            friendship = db.query(Friendship).filter(Friendship.between(user_id, story.user_id)).first()
             return friendship is not None
         return False
     
@@ -334,7 +330,7 @@ def _format_story_response(story: Story, owner: User, viewer_id: int, has_viewed
             "profile_photo_url": owner.profile_photo_url,
             "is_verified": owner.is_verified,
             "open_to_friends": getattr(owner, 'open_to_friends', False),
-            "created_at": getattr(owner, 'created_at', None).isoformat() if getattr(owner, 'created_at', None) else None
+            "created_at": getattr(owner, 'created_at', None)
         },
         "media_url": media_storage.get_media_url(story.media_url),
         "media_type": story.media_type,
@@ -342,6 +338,6 @@ def _format_story_response(story: Story, owner: User, viewer_id: int, has_viewed
         "visibility": story.visibility,
         "view_count": story.view_count,
         "has_viewed": bool(has_viewed),
-        "created_at": story.created_at.isoformat(),
-        "expires_at": story.expires_at.isoformat()
+        "created_at": story.created_at,
+        "expires_at": story.expires_at
     } 
\ No newline at end of file
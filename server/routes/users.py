@@ -33,10 +33,7 @@ async def get_user_profile(
         )
     
     # Check if users are friends
-    friendship = db.query(Friendship).filter(
-        ((Friendship.user1_id == current_user.id) & (Friendship.user2_id == user_id)) |
-        ((Friendship.user1_id == user_id) & (Friendship.user2_id == current_user.id))
-    ).first()
+    friendship = db.query(Friendship).filter(Friendship.between(current_user.id, user_id)).first()
     
     if not friendship:
         raise HTTPException(
@@ -101,7 +98,7 @@ async def get_user_profile(
         "open_to_friends": target_user.open_to_friends,
         "is_verified": target_user.is_verified,
         "created_at": target_user.created_at,
-        "friend_since": friend_since.isoformat() if friend_since else None,
+        "friend_since": friend_since,
         "mutual_friends_count": mutual_friends_count,
         "friends_count": friends_count,
         "stories_count": stories_count,
@@ -1,7 +1,12 @@
-from pydantic import BaseModel, EmailStr, validator
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, PlainSerializer, validator
+from typing import Annotated, Optional, List
 from datetime import datetime
 
+from utils.responses import isoformat_utc
+
+# Datetimes parse as usual and are written in the shared UTC wire format
+UTCDatetime = Annotated[datetime, PlainSerializer(isoformat_utc, when_used="json")]
+
 # Authentication Schemas
 class UserRegistration(BaseModel):
     """Schema for user registration"""
@@ -77,7 +82,7 @@ class UserResponse(BaseModel):
     profile_photo_url: Optional[str]
     open_to_friends: bool
     is_verified: bool
-    created_at: datetime
+    created_at: UTCDatetime
 
     class Config:
         from_attributes = True
@@ -247,14 +252,22 @@ class DirectMessageResponse(BaseModel):
     is_read: bool
     is_opened: Optional[bool] = None
     screenshot_taken: Optional[bool] = None
-    created_at: datetime
-    expires_at: datetime
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
+
+class MessageSender(BaseModel):
+    """Sender summary shown next to group messages"""
+    id: int
+    username: str
+    profile_photo_url: Optional[str] = None
+    is_verified: bool = False
 
 class GroupMessageResponse(BaseModel):
     """Group message response schema"""
     id: int
     group_id: int
     sender_id: int
+    sender: MessageSender
     content: Optional[str] = None
     message_type: str
     media_url: Optional[str] = None
@@ -264,8 +277,8 @@ class GroupMessageResponse(BaseModel):
     view_count: int = 0
     is_read_by_user: bool = False
     system_action: Optional[str] = None
-    created_at: datetime
-    expires_at: datetime
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
 
 class ConversationResponse(BaseModel):
     """Conversation response schema"""
@@ -276,7 +289,7 @@ class ConversationResponse(BaseModel):
     unread_count: int
     is_archived: bool
     is_muted: bool
-    updated_at: datetime
+    updated_at: UTCDatetime
 
 class StoryResponse(BaseModel):
     """Story response schema"""
@@ -289,8 +302,8 @@ class StoryResponse(BaseModel):
     visibility: str
     view_count: int
     has_viewed: bool
-    created_at: datetime
-    expires_at: datetime
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
 
 # Generic response schemas
 class SuccessResponse(BaseModel):
@@ -413,9 +426,9 @@ class GroupChatResponse(BaseModel):
     join_approval_required: bool
     auto_suggest_members: bool
     auto_suggest_events: bool
-    last_message_at: Optional[datetime]
+    last_message_at: Optional[UTCDatetime]
     message_count: int
-    created_at: datetime
+    created_at: UTCDatetime
     is_active: bool
     user_is_member: bool
     user_is_admin: bool
@@ -428,7 +441,7 @@ class GroupMemberResponse(BaseModel):
     user_id: int
     user: UserResponse
     is_admin: bool
-    joined_at: datetime
+    joined_at: UTCDatetime
     
     class Config:
         from_attributes = True
@@ -449,9 +462,9 @@ class EventCreate(BaseModel):
     longitude: float
     creator_latitude: float  # Creator's current location for validation
     creator_longitude: float  # Creator's current location for validation
-    start_time: datetime
-    end_time: datetime
-    rsvp_deadline: Optional[datetime] = None
+    start_time: UTCDatetime
+    end_time: UTCDatetime
+    rsvp_deadline: Optional[UTCDatetime] = None
     max_attendees: Optional[int] = None
     visibility: str = "friends"  # 'public', 'friends', 'private', 'groups'
     shared_with_friends: Optional[List[int]] = []
@@ -545,8 +558,8 @@ class EventUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     story: Optional[str] = None
-    end_time: Optional[datetime] = None
-    rsvp_deadline: Optional[datetime] = None
+    end_time: Optional[UTCDatetime] = None
+    rsvp_deadline: Optional[UTCDatetime] = None
     max_attendees: Optional[int] = None
     location_privacy: Optional[str] = None
     
@@ -587,10 +600,10 @@ class EventResponse(BaseModel):
     location_name: Optional[str]  # Based on privacy settings
     latitude: Optional[float]  # Based on privacy settings
     longitude: Optional[float]  # Based on privacy settings
-    start_time: datetime
-    end_time: datetime
-    rsvp_deadline: Optional[datetime]
-    expires_at: datetime
+    start_time: UTCDatetime
+    end_time: UTCDatetime
+    rsvp_deadline: Optional[UTCDatetime]
+    expires_at: UTCDatetime
     visibility: str
     max_attendees: Optional[int]
     attendee_count: int
@@ -607,8 +620,8 @@ class EventResponse(BaseModel):
     media_type: Optional[str]
     can_rsvp: bool
     user_rsvp: Optional[dict]
-    created_at: datetime
-    updated_at: datetime
+    created_at: UTCDatetime
+    updated_at: UTCDatetime
     
     class Config:
         from_attributes = True
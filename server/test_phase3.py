@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 
 # Import models and utilities
 from models import User, Story, Snap, Hangout, GroupChat, Venue
+from models.group_chat import backfill_group_members
 from database import create_tables, SessionLocal, drop_tables
 from utils.logging_config import setup_logging, log_security_event, log_database_operation
 from utils.background_tasks import task_manager, cleanup_all_expired
@@ -72,11 +73,9 @@ def test_database_models():
         test_group = GroupChat(
             creator_id=test_user.id,
             name="Test Lads Group",
-            description="Testing Phase 3 group creation",
-            members=[test_user.id],
-            admins=[test_user.id]
+            description="Testing Phase 3 group creation"
         )
-        test_group.member_count = 1
+        test_group.add_member(test_user.id, is_admin=True)
         db.add(test_group)
         db.commit()
         db.refresh(test_group)
@@ -106,6 +105,46 @@ def test_database_models():
     finally:
         db.close()
 
+def test_group_member_backfill():
+    """Test that the legacy group membership backfill only runs once per group"""
+    print("\n=== Testing Group Membership Backfill ===")
+    
+    db = SessionLocal()
+    try:
+        lads = [
+            User(username=f"backfill_lad{i}", email=f"backfill{i}@ladchat.com", hashed_password="hashed_password_here")
+            for i in range(2)
+        ]
+        db.add_all(lads)
+        db.commit()
+        
+        # A pre-migration group: members only in the legacy JSON arrays
+        legacy_group = GroupChat(
+            creator_id=lads[0].id,
+            name="Legacy Lads Group",
+            legacy_members=[lad.id for lad in lads],
+            legacy_admins=[lads[0].id]
+        )
+        db.add(legacy_group)
+        db.commit()
+        
+        created = backfill_group_members(db)
+        print(f"✓ First backfill created {created} memberships (expected 2)")
+        
+        # Everyone leaves, then the next startup runs the backfill again
+        for lad in lads:
+            legacy_group.remove_member(lad.id)
+        db.commit()
+        created = backfill_group_members(db)
+        db.refresh(legacy_group)
+        print(f"✓ Second backfill created {created} memberships (expected 0), group has {legacy_group.member_count} members")
+        
+    except Exception as e:
+        print(f"✗ Group membership backfill test failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
 def test_logging_system():
     """Test logging configuration"""
     print("\n=== Testing Logging System ===")
@@ -198,6 +237,7 @@ async def run_all_tests():
     
     # Run tests
     test_database_models()
+    test_group_member_backfill()
     test_logging_system()
     test_error_handling()
     await test_background_tasks()
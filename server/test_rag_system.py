@@ -19,10 +19,10 @@ async def test_rag_system():
     # Test 1: ChromaDB Client
     print("\n1. Testing ChromaDB Client...")
     try:
-        from ai.chroma_client import chroma_client
+        from ai.chroma_client import get_chroma_client
         
         # Test collection initialization
-        stats = chroma_client.get_collection_stats()
+        stats = get_chroma_client().get_collection_stats()
         print(f"   ✅ ChromaDB initialized: {stats}")
         
     except Exception as e:
@@ -32,9 +32,9 @@ async def test_rag_system():
     # Test 2: Embedding Service (without OpenAI for now)
     print("\n2. Testing Embedding Service...")
     try:
-        from ai.embedding_service import embedding_service
+        from ai.embedding_service import get_embedding_service
         
-        if embedding_service.client is None:
+        if get_embedding_service().client is None:
             print("   ⚠️  OpenAI client not initialized (OPENAI_API_KEY not set)")
             print("   ℹ️  This is expected in development - add your API key to test embeddings")
         else:
@@ -47,7 +47,8 @@ async def test_rag_system():
     # Test 3: RAG Engine
     print("\n3. Testing RAG Engine...")
     try:
-        from ai.rag_engine import rag_engine
+        from ai.rag_engine import get_rag_engine
+        get_rag_engine()
         print("   ✅ RAG engine initialized successfully")
         
     except Exception as e:
@@ -11,7 +11,7 @@ load_dotenv()
 from database import SessionLocal
 from models import User
 from models.embeddings import UserEmbedding
-from ai.chroma_client import chroma_client
+from ai.chroma_client import get_chroma_client
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -38,7 +38,7 @@ def update_chromadb_users():
                 logger.info(f"Updating ChromaDB for user {user.id} ({user.username})")
                 
                 # Add to ChromaDB with fixed metadata
-                success = chroma_client.add_user_embedding(
+                success = get_chroma_client().add_user_embedding(
                     user.id,
                     user_embedding.profile_embedding,
                     [],  # Empty message embedding for testing
@@ -60,7 +60,7 @@ def update_chromadb_users():
         logger.info(f"✅ ChromaDB update completed. Updated {updated_count} users.")
         
         # Get final stats
-        chroma_stats = chroma_client.get_collection_stats()
+        chroma_stats = get_chroma_client().get_collection_stats()
         logger.info(f"📊 Final ChromaDB stats - Users: {chroma_stats['users']}, Events: {chroma_stats['events']}")
         
     except Exception as e:
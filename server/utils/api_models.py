@@ -4,9 +4,11 @@ API response models and versioning utilities for LadChat
 
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List, Union
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
 
+from schemas import UTCDatetime
+
 class APIVersion(str, Enum):
     """API version enumeration"""
     V1 = "v1"
@@ -22,7 +24,7 @@ class ResponseStatus(str, Enum):
 class BaseResponse(BaseModel):
     """Base response model for all API responses"""
     success: bool = True
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: UTCDatetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     version: APIVersion = APIVersion.V1
     request_id: Optional[str] = None
 
@@ -139,8 +141,8 @@ class StoryResponse(BaseModel):
     visibility: str
     view_count: int
     has_viewed: bool = False
-    created_at: datetime
-    expires_at: datetime
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
 
 class SnapResponse(BaseModel):
     """Snap response model"""
@@ -150,8 +152,8 @@ class SnapResponse(BaseModel):
     caption: Optional[str] = None
     view_duration: int
     is_opened: bool
-    created_at: datetime
-    expires_at: datetime
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
 
 class HangoutResponse(BaseModel):
     """Hangout response model"""
@@ -165,9 +167,9 @@ class HangoutResponse(BaseModel):
     attendee_count: int
     maybe_count: int
     user_rsvp: Optional[str] = None  # 'yes', 'maybe', 'no'
-    start_time: Optional[datetime] = None
-    created_at: datetime
-    expires_at: datetime
+    start_time: Optional[UTCDatetime] = None
+    created_at: UTCDatetime
+    expires_at: UTCDatetime
 
 class GroupChatResponse(BaseModel):
     """Group chat response model"""
@@ -179,8 +181,8 @@ class GroupChatResponse(BaseModel):
     group_interests: List[str] = []
     is_member: bool = False
     is_admin: bool = False
-    last_message_at: Optional[datetime] = None
-    created_at: datetime
+    last_message_at: Optional[UTCDatetime] = None
+    created_at: UTCDatetime
 
 class VenueResponse(BaseModel):
     """Venue response model"""
@@ -135,9 +135,10 @@ class BackgroundTaskManager:
                 log_database_operation("expire", "events", event.id)
             
             # Also update ongoing status for active events
-            ongoing_events = db.query(Event).filter(Event.is_active == True).all()
-            for event in ongoing_events:
-                event.update_ongoing_status()
+            db.query(Event).filter(Event.is_active == True).update(
+                {Event.is_ongoing: Event.is_happening_now(current_time)},
+                synchronize_session=False
+            )
             
             # Clean up expired direct messages
             expired_direct_messages = db.query(DirectMessage).filter(
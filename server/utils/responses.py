@@ -0,0 +1,60 @@
+"""
+JSON responses for LadChat's routes: fast encoding for the hot listing routes, and the one
+datetime wire format for routes returning plain dicts (which FastAPI would otherwise encode
+with its own isoformat).
+
+Model to_dict methods leave datetime columns as datetimes; they are formatted here, or by the
+UTCDatetime fields of the response schemas, when the response is written.
+"""
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from typing import Any
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+    # Same wire format as isoformat_utc: naive timestamps are UTC, and UTC is written as "Z"
+    ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def isoformat_utc(value: datetime) -> str:
+    """The one datetime wire format for every route: ISO 8601 in UTC with a "Z" suffix (naive values are UTC)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+# jsonable_encoder with the wire datetime format, for values orjson can't encode itself
+_encode = partial(jsonable_encoder, custom_encoder={datetime: isoformat_utc})
+
+@lru_cache(maxsize=None)
+def _adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+def json_response(content: Any, status_code: int = 200, model: Any = None) -> Response:
+    """
+    Serialize a route's result in one pass, skipping FastAPI's jsonable_encoder walk.
+    With a model (the route's response_model), the content is validated against it and
+    pydantic-core writes the JSON, so the declared schema is still enforced. Otherwise
+    orjson (optional) encodes it, with anything it can't handle going through jsonable_encoder;
+    without orjson it falls back to a plain JSONResponse. Either way datetimes use isoformat_utc.
+    """
+    if model is not None:
+        adapter = _adapter(model)
+        return Response(
+            content=adapter.dump_json(adapter.validate_python(content)),
+            status_code=status_code,
+            media_type="application/json"
+        )
+    if ORJSON_AVAILABLE:
+        return Response(
+            content=orjson.dumps(content, default=_encode, option=ORJSON_OPTIONS),
+            status_code=status_code,
+            media_type="application/json"
+        )
+    return JSONResponse(content=_encode(content), status_code=status_code)